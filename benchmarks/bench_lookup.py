@@ -0,0 +1,72 @@
+"""
+Compara los backends de `buscar_rucs` sobre un padrón sintético, con entradas
+de 1k, 100k y 1M documentos con ~45% de duplicados.
+Uso: python ./benchmarks/bench_lookup.py [filas_padron]
+"""
+
+import sqlite3
+import sys
+import tempfile
+import time
+from os import path
+
+import numpy as np
+from synthetic_padron import rucs_aleatorios
+
+from massruc import ruc_index
+from massruc.ruc_utils import buscar_rucs
+
+ESCALAS = [1_000, 100_000, 1_000_000]
+RATIO_DUPLICADOS = 0.45
+RATIO_INEXISTENTES = 0.2
+BACKENDS = ["sqlite", "sqlite_join", "mmap"]
+
+
+def crear_padron(path_db, filas, rng):
+    rucs = np.unique(rucs_aleatorios(rng, filas))
+    con = sqlite3.connect(path_db)
+    con.execute(
+        "CREATE TABLE padron (ruc INTEGER, nombre_o_razón_social TEXT, "
+        "estado_del_contribuyente TEXT, condición_de_domicilio TEXT)"
+    )
+    con.executemany(
+        "INSERT INTO padron VALUES (?, ?, 'ACTIVO', 'HABIDO')",
+        ((ruc, f"EMPRESA {ruc}") for ruc in rucs.tolist()),
+    )
+    con.execute("CREATE UNIQUE INDEX idx_ruc ON padron(ruc)")
+    con.commit()
+    con.close()
+    return rucs
+
+
+def crear_entrada(rucs_padron, cantidad, rng):
+    unicos = int(cantidad * (1 - RATIO_DUPLICADOS))
+    existentes = rng.choice(rucs_padron, int(unicos * (1 - RATIO_INEXISTENTES)))
+    inexistentes = rucs_aleatorios(rng, unicos - len(existentes))
+    base = np.concatenate([existentes, inexistentes])
+    return rng.choice(base, cantidad).astype(str).tolist()
+
+
+def main():
+    filas_padron = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        path_db = path.join(carpeta, "padron.db")
+        print(f"Generando padrón sintético de {filas_padron} filas...")
+        rucs_padron = crear_padron(path_db, filas_padron, rng)
+        ruc_index.construir_indice(path_db, "padron")
+
+        print(f"{'entradas':>10} " + " ".join(f"{b:>12}" for b in BACKENDS))
+        for cantidad in ESCALAS:
+            entrada = crear_entrada(rucs_padron, cantidad, rng)
+            tiempos = []
+            for backend in BACKENDS:
+                start_time = time.perf_counter()
+                buscar_rucs(entrada, path_db, "padron", backend)
+                tiempos.append(time.perf_counter() - start_time)
+            print(f"{cantidad:>10} " + " ".join(f"{t:>11.3f}s" for t in tiempos))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,183 @@
-import random
+import argparse
 import sqlite3
 import time
 from os import mkdir, path
 
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook
+
+from massruc.txt_to_db import es_compacta
 
 TEST_FOLDER = "./.tests_files"
+TIPOS_CAOS = ["letra", "espacios", "corto", "formato dni", "inexistente"]
+CHUNK_ESCRITURA = 50000
 
 
-def extraer_muestras(path_db, cantidad=1000, table_name="main_table"):
+def extraer_muestras(path_db, cantidad=1000, table_name="main_table", semilla=None):
+    """
+    Extrae RUCs únicos al azar. Los rowid se sortean por lotes con numpy y se
+    consultan juntos con una tabla temporal, en lugar de uno por uno.
+    """
+    rng = np.random.default_rng(semilla)
     con = sqlite3.connect(path_db)
     cursor = con.cursor()
 
-    # Consultar rowid máximo
-    cursor.execute(f"SELECT MAX(rowid) FROM {table_name}")
-    max_id = cursor.fetchone()[0]
-
-    import random
-
-    muestras_unicas = set()
+    if es_compacta(con, table_name):
+        muestras = _muestras_compacta(con, f"{table_name}_datos", cantidad, rng)
+        con.close()
+        return rng.permutation(muestras)
 
-    cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-    total_reales = cursor.fetchone()[0]
+    # Consultar rowid máximo
+    cursor.execute(f"SELECT MAX(rowid), COUNT(*) FROM {table_name}")
+    max_id, total_reales = cursor.fetchone()
     objetivo = min(cantidad, total_reales)
 
-    while len(muestras_unicas) < objetivo:
-        random_id = random.randint(1, max_id)
-        cursor.execute(f"SELECT ruc FROM {table_name} WHERE rowid = ?", (random_id,))
-        res = cursor.fetchone()
-        if res:
-            muestras_unicas.add(res[0])
-
+    cursor.execute("CREATE TEMP TABLE sorteo (id INTEGER PRIMARY KEY)")
+    usados = None
+    lotes = []
+    encontrados = 0
+
+    while encontrados < objetivo:
+        # se sortean de más según la densidad de rowid, por los huecos
+        faltan = int((objetivo - encontrados) * max_id / total_reales * 1.1) + 16
+        if usados is None:
+            # sorteo sin reemplazo sobre todo el rango de rowid
+            ids = rng.choice(max_id, min(faltan, max_id), replace=False) + 1
+            usados = ids
+        else:
+            # quedaron huecos de rowid: se sortea entre los no usados
+            candidatos = np.setdiff1d(
+                np.arange(1, max_id + 1), usados, assume_unique=True
+            )
+            ids = rng.choice(candidatos, min(faltan, len(candidatos)), replace=False)
+            usados = np.concatenate([usados, ids])
+
+        cursor.execute("DELETE FROM sorteo")
+        cursor.executemany(
+            "INSERT INTO sorteo VALUES (?)", ((i,) for i in ids.tolist())
+        )
+        cursor.execute(
+            f"SELECT t.ruc FROM sorteo s JOIN {table_name} t ON t.rowid = s.id"
+        )
+        lote = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1)
+        lotes.append(lote)
+        encontrados += len(lote)
+
+    muestras = np.concatenate(lotes) if lotes else np.empty(0, dtype=np.int64)
     con.close()
-    return muestras_unicas
+    return rng.permutation(muestras)[:objetivo]
+
+
+def _muestras_compacta(con, tabla, cantidad, rng):
+    """
+    La tabla WITHOUT ROWID no tiene rowid: se sortean posiciones en el orden
+    de la clave y se llega a cada una desde el RUC anterior con OFFSET, así
+    SQLite salta las filas intermedias sin pasarlas a Python.
+    """
+    (total,) = con.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()
+    posiciones = np.sort(rng.choice(total, min(cantidad, total), replace=False))
+
+    muestras = np.empty(len(posiciones), dtype=np.int64)
+    ultimo, previa = None, -1
+    for i, posicion in enumerate(posiciones.tolist()):
+        salto = posicion - previa - 1
+        if ultimo is None:
+            consulta = f"SELECT ruc FROM {tabla} ORDER BY ruc LIMIT 1 OFFSET ?"
+            (ultimo,) = con.execute(consulta, (salto,)).fetchone()
+        else:
+            consulta = (
+                f"SELECT ruc FROM {tabla} WHERE ruc > ? ORDER BY ruc LIMIT 1 OFFSET ?"
+            )
+            (ultimo,) = con.execute(consulta, (ultimo, salto)).fetchone()
+        muestras[i] = ultimo
+        previa = posicion
+    return muestras
 
 
-def generar_dataset_normal(path_db, cantidad, table_name):
+def guardar_dataset(documentos, nombre, formato="xlsx"):
+    """Escribe la columna `Documento` por bloques, sin armar el archivo en memoria"""
+    if not path.exists(TEST_FOLDER):
+        mkdir(TEST_FOLDER)
+    filename = path.join(TEST_FOLDER, f"{nombre}.{formato}")
+
+    if formato == "csv":
+        with open(filename, "w", encoding="utf-8", newline="") as f:
+            f.write("Documento\n")
+            for i in range(0, len(documentos), CHUNK_ESCRITURA):
+                bloque = pd.Series(
+                    documentos[i : i + CHUNK_ESCRITURA], name="Documento"
+                )
+                bloque.to_csv(f, index=False, header=False)
+    else:
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        worksheet.append(["Documento"])
+        for documento in documentos:
+            worksheet.append([documento])
+        workbook.save(filename)
+
+    return filename
+
+
+def generar_dataset_normal(path_db, cantidad, table_name, formato="xlsx"):
     print("Iniciando generación...")
     start_time = time.time()
     muestras = extraer_muestras(path_db, cantidad, table_name)
 
-    df = pd.DataFrame(muestras, columns=["Documento"], dtype=str)
-    if not path.exists(TEST_FOLDER):
-        mkdir(TEST_FOLDER)
-    filename = path.join(TEST_FOLDER, f"test_dataset_{cantidad}.xlsx")
-
-    df.to_excel(filename, index=False)
+    filename = guardar_dataset(
+        muestras.astype(str).tolist(), f"test_dataset_{cantidad}", formato
+    )
     print(f"Dataset generado en {round(time.time()-start_time,2)}s")
     print(f"✅ Dataset guardado en: {filename}")
 
 
-def generar_dataset_stress(path_db, cantidad, table_name, ratio_error):
+def inyectar_caos(rucs, ratio_error, rng):
+    """Aplica errores a una parte de los RUCs, vectorizado con operaciones de texto"""
+    dataset = pd.Series(rucs.astype(str), dtype=object)
+    num_errores = int(len(dataset) * ratio_error)
+
+    caos = dataset.iloc[:num_errores]
+    tipos = rng.choice(TIPOS_CAOS, num_errores)
+    dataset.iloc[:num_errores] = np.select(
+        [tipos == tipo for tipo in TIPOS_CAOS],
+        [
+            (caos.str[:-1] + "X").to_numpy(),
+            ("  " + caos + "  ").to_numpy(),
+            caos.str[:5].to_numpy(),
+            caos.str[:8].to_numpy(),
+            np.full(num_errores, "99000000000", dtype=object),
+        ],
+        default=caos.to_numpy(),
+    )
+    return dataset.iloc[rng.permutation(len(dataset))].tolist()
+
+
+def generar_dataset_stress(path_db, cantidad, table_name, ratio_error, formato="xlsx"):
     print("Generando dataset con errores...")
     start_time = time.time()
+    rng = np.random.default_rng()
 
     muestras = extraer_muestras(path_db, cantidad, table_name)
-    num_errores = int(cantidad * ratio_error)
-    dataset = []
-
-    print(f"Inyectando {num_errores} errores...")
-    for i, ruc in enumerate(muestras):
-        ruc = str(ruc)
-
-        if i < num_errores:  # Aplicar caos solo a una parte
-            tipo_caos = random.choice(
-                ["letra", "espacios", "corto", "formato dni", "inexistente"]
-            )
-
-            if tipo_caos == "letra":
-                ruc = ruc[:-1] + "X"
-
-            elif tipo_caos == "espacios":
-                ruc = f"  {ruc}  "
-
-            elif tipo_caos == "corto":
-                ruc = ruc[:5]
-
-            elif tipo_caos == "formato dni":
-                ruc = ruc[:8]
-
-            elif tipo_caos == "inexistente":
-                ruc = "99000000000"
-
-        dataset.append(ruc)
-    random.shuffle(dataset)
-
-    df = pd.DataFrame(dataset, columns=["Documento"])
-    output_name = path.join(TEST_FOLDER, f"TEST_STRESS_{cantidad}.xlsx")
-    if not path.exists(TEST_FOLDER):
-        mkdir(TEST_FOLDER)
-    df.to_excel(output_name, index=False)
+    print(f"Inyectando {int(cantidad * ratio_error)} errores...")
+    dataset = inyectar_caos(muestras, ratio_error, rng)
 
+    output_name = guardar_dataset(dataset, f"TEST_STRESS_{cantidad}", formato)
     print(f"Dataset generado en {round(time.time()-start_time,2)}s")
     print(f"✅ ¡Dataset de estrés listo!: {output_name}")
 
 
 def main():
-    PATH_DB = "./.sunat-datos/padron_ruc_sunat.db"
-    cantidad = int(input("Inserte cantidad de muestras: "))
-    generar_dataset_normal(PATH_DB, cantidad, "padron")
-    generar_dataset_stress(PATH_DB, cantidad, "padron", 0.15)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cantidad", type=int, nargs="?")
+    parser.add_argument("--formato", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--db", default="./.sunat-datos/padron_ruc_sunat.db")
+    parser.add_argument("--ratio-error", type=float, default=0.15)
+    args = parser.parse_args()
+
+    cantidad = args.cantidad or int(input("Inserte cantidad de muestras: "))
+    generar_dataset_normal(args.db, cantidad, "padron", args.formato)
+    generar_dataset_stress(args.db, cantidad, "padron", args.ratio_error, args.formato)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+"""
+Suite de benchmarks reproducible y sin conexión: genera un padrón sintético
+y mide cada etapa (sanitize_csv, sanitize_csv_paralelo, convert_txt_to_sql,
+convert_zip_to_sql, buscar_rucs, exportación a Excel, CSV y Parquet y
+procesar_archivo completo con sus etapas en pipeline) a varias escalas; la
+conversión y la búsqueda se miden también con el esquema compacto, y la
+búsqueda con el prefiltro de bitmap.
+Guarda los resultados en JSON y falla si alguna etapa baja de su umbral.
+Uso: python ./benchmarks/run_benchmarks.py --escalas 10000,100000
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from os import path
+
+import numpy as np
+import pandas as pd
+from synthetic_padron import generar_padron_txt, generar_padron_zip, rucs_aleatorios
+
+from massruc import ruc_index, txt_to_db
+from massruc.columnar_export import ExportadorCsv, ExportadorParquet
+from massruc.excel_export import ExportadorExcel
+from massruc.processing import procesar_archivo
+from massruc.ruc_utils import buscar_rucs
+
+CARPETA = path.dirname(path.abspath(__file__))
+UMBRALES = path.join(CARPETA, "thresholds.json")
+RATIO_ERRORES_ENTRADA = 0.15
+
+
+@contextlib.contextmanager
+def medir(resultados, etapa, filas, escala):
+    """Mide una etapa, silenciando los print de la librería"""
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+    segundos = time.perf_counter() - start_time
+    resultados.append(
+        {
+            "etapa": etapa,
+            "escala": escala,
+            "filas": filas,
+            "segundos": round(segundos, 4),
+            "filas_por_segundo": round(filas / segundos) if segundos else None,
+        }
+    )
+    print(
+        f"{etapa:>22} {escala:>10} {segundos:>9.3f}s {filas / segundos:>12.0f} filas/s"
+    )
+
+
+def crear_entrada(path_db, cantidad, rng):
+    """Documentos de clientes: RUCs del padrón con una parte de errores"""
+    con = sqlite3.connect(path_db)
+    rucs = np.array([r for (r,) in con.execute("SELECT ruc FROM padron")])
+    con.close()
+
+    documentos = rng.choice(rucs, cantidad).astype(str)
+    errores = rng.random(cantidad) < RATIO_ERRORES_ENTRADA
+    documentos[errores] = rucs_aleatorios(rng, int(errores.sum()), (15, 17)).astype(str)
+    return documentos.tolist()
+
+
+def ejecutar_escala(escala, carpeta, corrupcion, resultados):
+    rng = np.random.default_rng(escala)
+    txt = path.join(carpeta, f"padron_{escala}.txt")
+    limpio = path.join(carpeta, f"limpio_{escala}.txt")
+    zip_padron = path.join(carpeta, f"padron_{escala}.zip")
+    db_txt = path.join(carpeta, f"padron_txt_{escala}.db")
+    db_zip = path.join(carpeta, f"padron_zip_{escala}.db")
+    db_compacta = path.join(carpeta, f"padron_compacta_{escala}.db")
+
+    generar_padron_txt(txt, escala, corrupcion, semilla=escala)
+    generar_padron_zip(zip_padron, escala, corrupcion, semilla=escala)
+
+    with medir(resultados, "sanitize_csv", escala, escala):
+        txt_to_db.sanitize_csv(txt, limpio)
+    with medir(resultados, "sanitize_csv_paralelo", escala, escala):
+        txt_to_db.sanitize_csv_paralelo(txt, limpio, tamano_rango=4 * 1024**2)
+    with medir(resultados, "convert_txt_to_sql", escala, escala):
+        txt_to_db.convert_txt_to_sql(limpio, db_txt, "padron", chunk_size=10000)
+    with medir(resultados, "convert_zip_to_sql", escala, escala):
+        txt_to_db.convert_zip_to_sql(zip_padron, db_zip, "padron")
+    with medir(resultados, "convert_zip_to_sql_compacto", escala, escala):
+        txt_to_db.convert_zip_to_sql(zip_padron, db_compacta, "padron", compacto=True)
+
+    documentos = crear_entrada(db_zip, escala, rng)
+    with medir(resultados, "buscar_rucs", escala, escala):
+        filas = buscar_rucs(documentos, db_zip, "padron")
+    with medir(resultados, "buscar_rucs_compacto", escala, escala):
+        buscar_rucs(documentos, db_compacta, "padron")
+    ruc_index.construir_bitmap(db_zip, "padron")
+    with medir(resultados, "buscar_rucs_prefiltro", escala, escala):
+        buscar_rucs(documentos, db_zip, "padron")
+    with medir(resultados, "exportar_excel", escala, escala):
+        with ExportadorExcel(path.join(carpeta, f"salida_{escala}.xlsx")) as exportador:
+            exportador.escribir_filas(filas)
+    with medir(resultados, "exportar_csv", escala, escala):
+        with ExportadorCsv(path.join(carpeta, f"salida_{escala}.csv")) as exportador:
+            exportador.escribir_filas(filas)
+    if importlib.util.find_spec("pyarrow"):
+        salida = path.join(carpeta, f"salida_{escala}.parquet")
+        with medir(resultados, "exportar_parquet", escala, escala):
+            with ExportadorParquet(salida) as exportador:
+                exportador.escribir_filas(filas)
+
+    # lectura, limpieza, consulta y escritura solapadas, de CSV a CSV
+    entrada = path.join(carpeta, f"clientes_{escala}.csv")
+    pd.DataFrame({"documento": documentos}).to_csv(entrada, index=False)
+    with medir(resultados, "procesar_archivo", escala, escala):
+        procesar_archivo(
+            entrada,
+            db_zip,
+            "padron",
+            columna="documento",
+            log=lambda _: None,
+            formato="csv",
+        )
+
+
+def verificar(resultados, umbrales, baseline=None, tolerancia=0.25):
+    """Devuelve la lista de regresiones encontradas"""
+    regresiones = []
+    anteriores = {
+        (r["etapa"], r["escala"]): r["filas_por_segundo"]
+        for r in (baseline or {}).get("resultados", [])
+    }
+    for r in resultados:
+        minimo = umbrales.get(r["etapa"])
+        if minimo and r["filas_por_segundo"] < minimo:
+            regresiones.append(
+                f"{r['etapa']} ({r['escala']}): {r['filas_por_segundo']} filas/s, "
+                f"umbral {minimo}"
+            )
+
+        anterior = anteriores.get((r["etapa"], r["escala"]))
+        if anterior and r["filas_por_segundo"] < anterior * (1 - tolerancia):
+            regresiones.append(
+                f"{r['etapa']} ({r['escala']}): {r['filas_por_segundo']} filas/s, "
+                f"antes {anterior}"
+            )
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--escalas", default="10000,100000")
+    parser.add_argument("--corrupcion", type=float, default=0.001)
+    parser.add_argument("--salida", default=None)
+    parser.add_argument("--umbrales", default=UMBRALES)
+    parser.add_argument("--baseline", default=None, help="Resultados previos (JSON)")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    escalas = [int(e) for e in args.escalas.split(",")]
+    resultados = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        for escala in escalas:
+            ejecutar_escala(escala, carpeta, args.corrupcion, resultados)
+
+    reporte = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    salida = args.salida or path.join(
+        CARPETA, f"resultados_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, indent=2)
+    print(f"Resultados guardados en {salida}")
+
+    with open(args.umbrales, encoding="utf-8") as f:
+        umbrales = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    regresiones = verificar(resultados, umbrales, baseline, args.tolerancia)
+    for regresion in regresiones:
+        print(f"❌ Regresión: {regresion}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
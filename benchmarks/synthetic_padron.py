@@ -0,0 +1,98 @@
+"""
+Genera un padrón sintético con el mismo formato que el de SUNAT: texto
+separado por "|", codificado en latin-1 y con RUCs de dígito verificador válido.
+Uso: python ./benchmarks/synthetic_padron.py salida.zip [filas] [ratio_corrupcion]
+"""
+
+import sys
+import zipfile
+
+import numpy as np
+
+from massruc.ruc_utils import FACTORES_RUC
+
+ENCABEZADO = (
+    "RUC|NOMBRE O RAZÓN SOCIAL|ESTADO DEL CONTRIBUYENTE|CONDICIÓN DE DOMICILIO|"
+    "UBIGEO|TIPO DE VÍA|NOMBRE DE VÍA|CÓDIGO DE ZONA|TIPO DE ZONA|NÚMERO|"
+    "INTERIOR|LOTE|DEPARTAMENTO|MANZANA|KILÓMETRO|"
+)
+ESTADOS = ["ACTIVO"] * 8 + ["BAJA DE OFICIO", "BAJA DEFINITIVA", "SUSPENSION TEMPORAL"]
+CONDICIONES = ["HABIDO"] * 8 + ["NO HALLADO", "NO HABIDO", "PENDIENTE"]
+PALABRAS = ["COMERCIAL", "SERVICIOS", "PERÚ", "ANDINA", "ÑUSTA", "INVERSIONES"]
+SUFIJOS = ["S.A.C.", "E.I.R.L.", "S.A.", "S.R.L."]
+
+
+def rucs_aleatorios(rng, cantidad, prefijos=(10, 20)):
+    """RUCs con dígito verificador válido"""
+    prefijos = rng.choice(prefijos, cantidad).astype(np.int64)
+    bases = prefijos * 10**8 + rng.integers(0, 10**8, cantidad)
+    digitos_base = (bases[:, None] // 10 ** np.arange(9, -1, -1)) % 10
+    diferencia = 11 - (digitos_base @ FACTORES_RUC) % 11
+    return bases * 10 + np.where(diferencia >= 10, diferencia - 10, diferencia)
+
+
+def iter_lineas_padron(filas, ratio_corrupcion=0.001, semilla=0, bloque=100_000):
+    """Genera las líneas del padrón (sin encabezado) por bloques, sin duplicados"""
+    rng = np.random.default_rng(semilla)
+    vistos = set()
+    generadas = 0
+
+    while generadas < filas:
+        cantidad = min(bloque, filas - generadas)
+        rucs = [
+            r for r in rucs_aleatorios(rng, cantidad * 2).tolist() if r not in vistos
+        ]
+        rucs = list(dict.fromkeys(rucs))[:cantidad]
+        vistos.update(rucs)
+
+        estados = rng.choice(ESTADOS, len(rucs))
+        condiciones = rng.choice(CONDICIONES, len(rucs))
+        palabras = rng.choice(PALABRAS, (len(rucs), 2))
+        sufijos = rng.choice(SUFIJOS, len(rucs))
+        corruptas = rng.random(len(rucs)) < ratio_corrupcion
+
+        for i, ruc in enumerate(rucs):
+            if corruptas[i]:
+                # línea cortada, como las que el sanitizador debe descartar
+                yield f"{ruc}|{palabras[i][0]}"
+                continue
+            yield (
+                f"{ruc}|{palabras[i][0]} {palabras[i][1]} {sufijos[i]}|{estados[i]}|"
+                f"{condiciones[i]}|150101|AV.|LOS OLIVOS|-|-|123|-|-|-|-|-|"
+            )
+        generadas += len(rucs)
+
+
+def _iter_bloques_texto(filas, ratio_corrupcion, semilla, fin_linea, bloque=10_000):
+    lineas = [ENCABEZADO]
+    for linea in iter_lineas_padron(filas, ratio_corrupcion, semilla):
+        lineas.append(linea)
+        if len(lineas) >= bloque:
+            yield (fin_linea.join(lineas) + fin_linea).encode("latin-1")
+            lineas = []
+    if lineas:
+        yield (fin_linea.join(lineas) + fin_linea).encode("latin-1")
+
+
+def generar_padron_txt(ruta, filas, ratio_corrupcion=0.001, semilla=0):
+    with open(ruta, "wb") as f:
+        for bloque in _iter_bloques_texto(filas, ratio_corrupcion, semilla, "\r\n"):
+            f.write(bloque)
+    return ruta
+
+
+def generar_padron_zip(ruta, filas, ratio_corrupcion=0.001, semilla=0):
+    with zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED) as z:
+        with z.open("padron_reducido_ruc.txt", "w", force_zip64=True) as miembro:
+            for bloque in _iter_bloques_texto(filas, ratio_corrupcion, semilla, "\r\n"):
+                miembro.write(bloque)
+    return ruta
+
+
+if __name__ == "__main__":
+    salida = sys.argv[1]
+    filas = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.001
+    generar = generar_padron_zip if salida.endswith(".zip") else generar_padron_txt
+    generar(salida, filas, ratio)
+    print(f"✅ Padrón sintético de {filas} filas: {salida}")
@@ -0,0 +1,3 @@
+from massruc.validator import Validator
+
+__all__ = ["Validator"]
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import pandas as pd
+
+from massruc import snapshots
+
+# filas promedio por entrada de la caché: una edición solo invalida su propio bloque
+BLOQUE_CACHE = 5000
+MAX_BYTES_CACHE = 512 * 1024 * 1024
+MAX_EDAD_CACHE = 7 * 24 * 3600
+
+
+def identidad_padron(path_db, table_name="main_table"):
+    """
+    Identifica la versión del padrón: el checksum del ZIP de origen si es un
+    snapshot, o el tamaño y la fecha de modificación para una DB sin metadatos.
+    """
+    info = snapshots.leer_info(path_db)
+    if info.get("sha256_zip"):
+        return f"{table_name}:{info['sha256_zip']}"
+    stat = os.stat(path_db)
+    return f"{table_name}:{os.path.abspath(path_db)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def partir_bloque(documentos, bloque=BLOQUE_CACHE):
+    """
+    Corta una Series de documentos en sub-bloques según su contenido: un bloque
+    termina en el documento cuyo hash es múltiplo de `bloque`, con un mínimo de
+    `bloque // 4` y un máximo de `4 * bloque` filas. Al insertar o borrar una
+    fila solo cambia el sub-bloque que la contiene y los siguientes se
+    mantienen, a diferencia de cortar cada `bloque` filas.
+    """
+    minimo = max(bloque // 4, 1)
+    divisor = max(bloque - minimo, 1)
+    partes = []
+    inicio = 0
+    for i, documento in enumerate(documentos):
+        texto = "\x00" if pd.isna(documento) else str(documento)
+        largo = i + 1 - inicio
+        if largo >= 4 * bloque or (
+            largo >= minimo and zlib.crc32(texto.encode()) % divisor == 0
+        ):
+            partes.append(documentos.iloc[inicio : i + 1])
+            inicio = i + 1
+    if inicio < len(documentos):
+        partes.append(documentos.iloc[inicio:])
+    return partes
+
+
+def clave_bloque(identidad, documentos):
+    """Hash del contenido de un bloque de documentos junto con la versión del padrón"""
+    digest = hashlib.sha256(identidad.encode())
+    for documento in documentos:
+        texto = "\x00" if pd.isna(documento) else str(documento)
+        digest.update(texto.encode() + b"\x1f")
+    return digest.hexdigest()
+
+
+class CacheResultados:
+    """
+    Resultados de consultas ya hechas, guardados en una DB SQLite por bloque de
+    documentos. Al cerrar se eliminan las entradas sin usar hace más de
+    `max_edad` segundos y, si se supera `max_bytes`, las usadas hace más tiempo.
+    """
+
+    def __init__(self, ruta, max_bytes=MAX_BYTES_CACHE, max_edad=MAX_EDAD_CACHE):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.max_edad = max_edad
+        carpeta = os.path.dirname(os.fspath(ruta))
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        # varios procesos del CLI pueden compartir la caché, y dentro de un
+        # proceso la usan las etapas del pipeline desde hilos distintos
+        self.con = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS resultados (clave TEXT PRIMARY KEY, "
+            "filas BLOB NOT NULL, bytes INTEGER NOT NULL, usado REAL NOT NULL)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+
+    def obtener(self, claves):
+        """Devuelve {clave: filas} de las claves que están en la caché"""
+        with self._lock:
+            encontrados = {}
+            for clave in claves:
+                fila = self.con.execute(
+                    "SELECT filas FROM resultados WHERE clave = ?", (clave,)
+                ).fetchone()
+                if fila:
+                    encontrados[clave] = [
+                        tuple(f) for f in json.loads(zlib.decompress(fila[0]))
+                    ]
+            if encontrados:
+                with self.con:
+                    self.con.executemany(
+                        "UPDATE resultados SET usado = ? WHERE clave = ?",
+                        [(time.time(), clave) for clave in encontrados],
+                    )
+            return encontrados
+
+    def guardar(self, entradas):
+        """Guarda {clave: filas}; las filas deben poder serializarse como JSON"""
+        ahora = time.time()
+        registros = []
+        for clave, filas in entradas.items():
+            datos = zlib.compress(json.dumps(filas, ensure_ascii=False).encode())
+            registros.append((clave, datos, len(datos), ahora))
+        with self._lock, self.con:
+            self.con.executemany(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?)", registros
+            )
+
+    def podar(self):
+        """Aplica los límites de edad y tamaño, devuelve las entradas eliminadas"""
+        with self._lock, self.con:
+            eliminadas = self.con.execute(
+                "DELETE FROM resultados WHERE usado < ?",
+                (time.time() - self.max_edad,),
+            ).rowcount
+            (total,) = self.con.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM resultados"
+            ).fetchone()
+            if total > self.max_bytes:
+                sobrantes = []
+                for clave, tamano in self.con.execute(
+                    "SELECT clave, bytes FROM resultados ORDER BY usado"
+                ):
+                    if total <= self.max_bytes:
+                        break
+                    sobrantes.append((clave,))
+                    total -= tamano
+                self.con.executemany(
+                    "DELETE FROM resultados WHERE clave = ?", sobrantes
+                )
+                eliminadas += len(sobrantes)
+        return eliminadas
+
+    def cerrar(self):
+        try:
+            self.podar()
+        finally:
+            self.con.close()
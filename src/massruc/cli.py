@@ -0,0 +1,464 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from massruc import (
+    historial,
+    metrics,
+    name_search,
+    processing,
+    ruc_utils,
+    snapshots,
+)
+from massruc.config import (
+    BITMAP_RUCS,
+    CARPETA_SNAPSHOTS,
+    DB_COMPACTA,
+    INDICE_NOMBRES,
+    NOMBRE_PADRON_TABLE,
+    PATH_CACHE_RESULTADOS,
+    PATH_PADRON_DB,
+    PATH_PADRON_ZIP,
+    SNAPSHOTS_RETENIDOS,
+    SUNAT_FOLDER,
+    WORKERS_DESCARGA,
+)
+from massruc.excel_export import ExportadorExcel
+from massruc.file_reader import iter_documentos
+
+
+def _sin_log(mensaje):
+    pass
+
+
+def padron_activo():
+    """Snapshot activo del padrón, o la DB única si aún no hay snapshots"""
+    return snapshots.ruta_activa(CARPETA_SNAPSHOTS, PATH_PADRON_DB) or PATH_PADRON_DB
+
+
+def _validar_archivo(
+    archivo,
+    carpeta_salida,
+    path_db,
+    table_name,
+    columna,
+    chunk_size,
+    cache,
+    formato,
+    hoja,
+):
+    """Procesa un archivo en un proceso del pool, sin interfaz gráfica"""
+    nombre_salida = processing.nombre_salida_para(archivo, "." + formato)
+    if carpeta_salida:
+        nombre_salida = os.path.join(carpeta_salida, os.path.basename(nombre_salida))
+
+    start_time = time.perf_counter()
+    _, filas = processing.procesar_archivo(
+        archivo,
+        path_db,
+        table_name,
+        nombre_salida,
+        columna=columna,
+        chunk_size=chunk_size,
+        log=_sin_log,
+        cache=cache,
+        hoja=hoja,
+    )
+    return nombre_salida, filas, time.perf_counter() - start_time
+
+
+def validar(
+    archivos,
+    carpeta_salida=None,
+    workers=None,
+    path_db=None,
+    table_name=NOMBRE_PADRON_TABLE,
+    columna=None,
+    chunk_size=processing.CHUNK_FILAS,
+    cache=PATH_CACHE_RESULTADOS,
+    formato="xlsx",
+    hoja=None,
+):
+    """
+    Valida varios archivos en paralelo con un pool de procesos que comparten la
+    DB del padrón en solo lectura. Devuelve la cantidad de archivos con error.
+    Con `cache` se reutilizan los resultados de bloques ya validados. Sin
+    `columna`, la de documentos se detecta en cada archivo.
+    """
+    path_db = path_db or padron_activo()
+    if not os.path.exists(path_db):
+        print(f"❌ No se encontró el padrón en {path_db}", file=sys.stderr)
+        return len(archivos)
+    if carpeta_salida:
+        os.makedirs(carpeta_salida, exist_ok=True)
+
+    start_time = time.perf_counter()
+    total_filas = 0
+    errores = 0
+    workers = min(workers or os.cpu_count() or 1, len(archivos))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {
+            pool.submit(
+                _validar_archivo,
+                archivo,
+                carpeta_salida,
+                path_db,
+                table_name,
+                columna,
+                chunk_size,
+                cache,
+                formato,
+                hoja,
+            ): archivo
+            for archivo in archivos
+        }
+        for futuro in as_completed(futuros):
+            archivo = futuros[futuro]
+            try:
+                nombre_salida, filas, segundos = futuro.result()
+            except Exception as e:
+                errores += 1
+                print(f"❌ {archivo}: {e}", file=sys.stderr)
+                continue
+
+            total_filas += filas
+            print(
+                f"✅ {archivo} -> {nombre_salida} "
+                f"({filas} filas en {round(segundos, 2)}s)"
+            )
+
+    segundos = time.perf_counter() - start_time
+    print(
+        f"{len(archivos) - errores}/{len(archivos)} archivos, {total_filas} filas "
+        f"en {round(segundos, 2)}s ({round(total_filas / segundos)} filas/s, "
+        f"{workers} procesos)"
+    )
+    return errores
+
+
+def buscar(
+    nombres,
+    archivo=None,
+    columna="nombre",
+    salida=None,
+    candidatos=name_search.CANDIDATOS,
+    workers=4,
+    path_db=None,
+    table_name=NOMBRE_PADRON_TABLE,
+):
+    """
+    Busca razones sociales. Los nombres pasados como argumento se muestran en
+    pantalla; los de la columna de un archivo se guardan en un Excel.
+    """
+    path_db = path_db or padron_activo()
+    if not os.path.exists(path_db):
+        print(f"❌ No se encontró el padrón en {path_db}", file=sys.stderr)
+        return 1
+
+    try:
+        if nombres:
+            resultados = name_search.buscar_nombres(
+                nombres, path_db, table_name, candidatos, workers
+            )
+            for fila in name_search.filas_resultado(nombres, resultados):
+                print(" | ".join(str(valor) for valor in fila))
+
+        if archivo:
+            salida = salida or processing.nombre_salida_para(archivo)
+            total = 0
+            start_time = time.perf_counter()
+            with ExportadorExcel(salida, name_search.HEADER_NOMBRES) as exportador:
+                for bloque in iter_documentos(archivo, columna):
+                    resultados = name_search.buscar_nombres(
+                        bloque, path_db, table_name, candidatos, workers
+                    )
+                    exportador.escribir_filas(
+                        name_search.filas_resultado(bloque, resultados)
+                    )
+                    total += len(bloque)
+            print(
+                f"✅ {archivo} -> {salida} ({total} nombres en "
+                f"{round(time.perf_counter() - start_time, 2)}s)"
+            )
+    except (LookupError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cambios(
+    salida_anterior=None,
+    desde=None,
+    nombre_salida=None,
+    path_db=None,
+    table_name=NOMBRE_PADRON_TABLE,
+):
+    """
+    Con una salida anterior, guarda solo sus filas cuyo estado o condición
+    cambió; sin ella, muestra los cambios registrados en el padrón.
+    """
+    path_db = path_db or padron_activo()
+    if not os.path.exists(path_db):
+        print(f"❌ No se encontró el padrón en {path_db}", file=sys.stderr)
+        return 1
+
+    if salida_anterior is None:
+        registro = historial.leer_cambios(path_db, table_name, desde)
+        if registro is None:
+            print("❌ El padrón no tiene registro de cambios", file=sys.stderr)
+            return 1
+        for fila in registro.itertuples(index=False):
+            print(
+                f"{fila.fecha} {fila.ruc} {fila.tipo}: "
+                f"{fila.estado_anterior} -> {fila.estado_nuevo}, "
+                f"{fila.condicion_anterior} -> {fila.condicion_nueva}"
+            )
+        return 0
+
+    try:
+        start_time = time.perf_counter()
+        reporte, filas, cambiadas = historial.revalidar_salida(
+            salida_anterior, path_db, table_name, nombre_salida, desde, log=_sin_log
+        )
+    except (LookupError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(
+        f"✅ {salida_anterior} -> {reporte} ({cambiadas} de {filas} filas "
+        f"cambiaron, {round(time.perf_counter() - start_time, 2)}s)"
+    )
+    return 0
+
+
+def actualizar(
+    carpeta=CARPETA_SNAPSHOTS,
+    retener=SNAPSHOTS_RETENIDOS,
+    workers=WORKERS_DESCARGA,
+    table_name=NOMBRE_PADRON_TABLE,
+):
+    """
+    Descarga el padrón y, si cambió, publica un nuevo snapshot: se construye
+    aparte, se valida y recién entonces se activa. Quien consulta el padrón
+    sigue usando el snapshot anterior mientras tanto.
+    """
+    os.makedirs(SUNAT_FOLDER, exist_ok=True)
+    try:
+        nuevo = ruc_utils.descargar_padron_reducido(PATH_PADRON_ZIP, workers=workers)
+        if not nuevo and snapshots.ruta_activa(carpeta):
+            print("✅ El padrón no cambió desde la última descarga")
+            return 0
+
+        ruta = snapshots.construir_snapshot(
+            PATH_PADRON_ZIP,
+            carpeta,
+            table_name,
+            compacto=DB_COMPACTA,
+            indice_nombres=INDICE_NOMBRES,
+            bitmap=BITMAP_RUCS,
+            indice_mmap=True,
+            respaldo=PATH_PADRON_DB,
+        )
+    except Exception as e:
+        print(f"❌ No se actualizó el padrón: {e}", file=sys.stderr)
+        return 1
+
+    snapshots.activar_snapshot(carpeta, ruta)
+    for eliminado in snapshots.podar_snapshots(carpeta, retener):
+        print(f"Snapshot eliminado: {eliminado}")
+    print(f"✅ Snapshot activo: {ruta}")
+    return 0
+
+
+def listar(carpeta=CARPETA_SNAPSHOTS):
+    activo = snapshots.ruta_activa(carpeta)
+    for ruta in snapshots.listar_snapshots(carpeta):
+        info = snapshots.leer_info(ruta)
+        marca = "*" if ruta == activo else " "
+        print(
+            f"{marca} {os.path.basename(ruta)}  {info.get('filas', '?')} filas  "
+            f"origen {info.get('fecha_origen', '?')}"
+        )
+    return 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="massruc",
+        description="Validador masivo de RUC. Sin argumentos abre la interfaz gráfica.",
+    )
+    comandos = parser.add_subparsers(dest="comando")
+
+    validate = comandos.add_parser(
+        "validate", aliases=["validar"], help="Valida archivos sin interfaz gráfica"
+    )
+    validate.add_argument("archivos", nargs="+", help="Archivos xlsx, csv o parquet")
+    validate.add_argument(
+        "--out", help="Carpeta de salida (por defecto, la del archivo)"
+    )
+    validate.add_argument(
+        "--workers", type=int, default=None, help="Procesos en paralelo"
+    )
+    validate.add_argument("--db", help="Ruta del padrón (por defecto, el activo)")
+    validate.add_argument("--table", default=NOMBRE_PADRON_TABLE)
+    validate.add_argument(
+        "--columna", help="Columna de documentos (por defecto, se detecta)"
+    )
+    validate.add_argument(
+        "--hoja", help="Hoja de Excel (sin --columna, se detecta dentro de ella)"
+    )
+    validate.add_argument("--chunk-size", type=int, default=processing.CHUNK_FILAS)
+    validate.add_argument(
+        "--formato",
+        choices=[extension[1:] for extension in processing.FORMATOS_SALIDA],
+        default="xlsx",
+        help="Formato de salida: xlsx con estilos o csv/parquet/feather tipados",
+    )
+    validate.add_argument(
+        "--sin-cache",
+        action="store_true",
+        help="No reutiliza resultados de validaciones anteriores",
+    )
+    validate.add_argument(
+        "--metricas", help="Archivo JSON lines donde registrar los tiempos por etapa"
+    )
+
+    search = comandos.add_parser(
+        "search", aliases=["buscar"], help="Busca RUCs por nombre o razón social"
+    )
+    search.add_argument("nombres", nargs="*", help="Nombres a buscar")
+    search.add_argument("--archivo", help="Archivo con una columna de nombres")
+    search.add_argument("--columna", default="nombre")
+    search.add_argument("--out", help="Excel de salida para --archivo")
+    search.add_argument("--candidatos", type=int, default=name_search.CANDIDATOS)
+    search.add_argument("--workers", type=int, default=4)
+    search.add_argument("--db", help="Ruta del padrón (por defecto, el activo)")
+    search.add_argument("--table", default=NOMBRE_PADRON_TABLE)
+
+    serve = comandos.add_parser(
+        "serve", aliases=["servir"], help="Servicio HTTP local de consulta de RUC"
+    )
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--conexiones", type=int, default=4)
+    serve.add_argument(
+        "--db", help="Ruta del padrón (por defecto sigue al snapshot activo)"
+    )
+    serve.add_argument("--table", default=NOMBRE_PADRON_TABLE)
+
+    changes = comandos.add_parser(
+        "changes",
+        aliases=["cambios"],
+        help="Reporta los RUCs de una salida anterior cuyo estado cambió",
+    )
+    changes.add_argument(
+        "salida",
+        nargs="?",
+        help=(
+            "Salida _PROCESADO de una validación anterior "
+            "(sin ella, lista los cambios)"
+        ),
+    )
+    changes.add_argument(
+        "--desde",
+        help="Fecha ISO desde la que buscar cambios (por defecto, la de la salida)",
+    )
+    changes.add_argument("--out", help="Excel de salida con los cambios")
+    changes.add_argument("--db", help="Ruta del padrón (por defecto, el activo)")
+    changes.add_argument("--table", default=NOMBRE_PADRON_TABLE)
+
+    update = comandos.add_parser(
+        "update",
+        aliases=["actualizar"],
+        help="Descarga el padrón y publica un nuevo snapshot",
+    )
+    update.add_argument("--retener", type=int, default=SNAPSHOTS_RETENIDOS)
+    update.add_argument("--workers", type=int, default=WORKERS_DESCARGA)
+    update.add_argument("--table", default=NOMBRE_PADRON_TABLE)
+    update.add_argument(
+        "--rollback", action="store_true", help="Vuelve al snapshot anterior"
+    )
+    update.add_argument(
+        "--listar", action="store_true", help="Lista los snapshots disponibles"
+    )
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+
+    if args.comando is None:
+        # la interfaz se importa solo si se usa, para no requerir Tk en servidores
+        from massruc.main import main as main_gui
+
+        main_gui()
+        return 0
+
+    if args.comando in ("validate", "validar"):
+        if args.metricas:
+            metrics.registrar_jsonl(args.metricas)
+        errores = validar(
+            args.archivos,
+            args.out,
+            args.workers,
+            args.db,
+            args.table,
+            args.columna,
+            args.chunk_size,
+            None if args.sin_cache else PATH_CACHE_RESULTADOS,
+            args.formato,
+            args.hoja,
+        )
+        return 1 if errores else 0
+
+    if args.comando in ("search", "buscar"):
+        return buscar(
+            args.nombres,
+            args.archivo,
+            args.columna,
+            args.out,
+            args.candidatos,
+            args.workers,
+            args.db,
+            args.table,
+        )
+
+    if args.comando in ("serve", "servir"):
+        from massruc.server import ServidorRuc
+
+        # sin --db se sigue al snapshot activo, también cuando se publica otro
+        carpeta = None if args.db else CARPETA_SNAPSHOTS
+        servidor = ServidorRuc(
+            args.db or padron_activo(), args.table, args.conexiones, carpeta
+        )
+        try:
+            asyncio.run(servidor.ejecutar(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.cerrar()
+        return 0
+
+    if args.comando in ("changes", "cambios"):
+        return cambios(args.salida, args.desde, args.out, args.db, args.table)
+
+    if args.comando in ("update", "actualizar"):
+        if args.listar:
+            return listar()
+        if args.rollback:
+            try:
+                print(f"✅ Snapshot activo: {snapshots.rollback(CARPETA_SNAPSHOTS)}")
+            except LookupError as e:
+                print(f"❌ {e}", file=sys.stderr)
+                return 1
+            return 0
+        return actualizar(
+            retener=args.retener, workers=args.workers, table_name=args.table
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import os
+
+import pandas as pd
+
+from massruc import metrics
+from massruc.excel_export import HEADER_RESULTADOS
+from massruc.ruc_utils import RUC_QUERY_ERRORS
+
+COLUMNA_ERROR = "Error"
+# tipos de las columnas de resultados; el resto se guarda como texto
+COLUMNAS_ENTERAS = ("RUC Validado",)
+COLUMNAS_CATEGORICAS = (
+    "Estado de contribuyente",
+    "Condición de domicilio",
+    COLUMNA_ERROR,
+)
+TEXTOS_ERROR = [error["text"] for error in RUC_QUERY_ERRORS.values()]
+# valores conocidos de cada columna categórica, con los que empieza su diccionario
+CATEGORIAS_CONOCIDAS = {
+    "Estado de contribuyente": [
+        "ACTIVO",
+        "BAJA DE OFICIO",
+        "BAJA DEFINITIVA",
+        "BAJA PROVISIONAL",
+        "SUSPENSION TEMPORAL",
+    ],
+    "Condición de domicilio": ["HABIDO", "NO HABIDO", "NO HALLADO", "PENDIENTE"],
+    COLUMNA_ERROR: TEXTOS_ERROR,
+}
+
+
+def _importar_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError(
+            "Para exportar Parquet o Feather instala la dependencia opcional: pip install massruc[columnar]"
+        ) from e
+    return pa
+
+
+class ExportadorColumnar:
+    """
+    Base de los exportadores CSV, Parquet y Feather, con la misma interfaz que
+    `ExportadorExcel`. Cada bloque de filas se convierte en un DataFrame
+    tipado: el error de consulta (que en Excel ocupa la columna `columna_error`)
+    pasa a su propia columna y deja nulos en lugar de "-", los RUC son Int64 y
+    estado, condición y error son categóricos.
+    """
+
+    formato = None
+
+    def __init__(
+        self,
+        output_file,
+        header=HEADER_RESULTADOS,
+        columna_error=2,
+        enteras=COLUMNAS_ENTERAS,
+        categoricas=COLUMNAS_CATEGORICAS,
+    ):
+        self.output_file = output_file
+        self.header = list(header)
+        self.columna_error = columna_error
+        self.columnas = self.header + (
+            [COLUMNA_ERROR] if columna_error is not None else []
+        )
+        self.enteras = [c for c in self.columnas if c in enteras]
+        self.categoricas = [c for c in self.columnas if c in categoricas]
+        self.filas_escritas = 0
+        self._abrir()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # si hubo un error no se deja un archivo a medio escribir
+        if exc_type is None:
+            self.cerrar()
+        else:
+            self._descartar()
+
+    def a_columnas(self, filas):
+        """DataFrame tipado a partir de las filas de resultados"""
+        df = pd.DataFrame.from_records(list(filas), columns=self.header)
+        df = df.astype(object).where(df.notna(), None)
+
+        if self.columna_error is not None:
+            col_error = self.header[self.columna_error]
+            con_error = df[col_error].isin(TEXTOS_ERROR)
+            df[COLUMNA_ERROR] = df[col_error].where(con_error, None)
+            # en las filas con error solo quedan el documento y el RUC limpio
+            df.loc[con_error, self.header[self.columna_error :]] = None
+
+        for c in self.enteras:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+        for c in self.categoricas:
+            df[c] = df[c].astype("category")
+        return df
+
+    def escribir_filas(self, filas):
+        with metrics.medir("exportacion", formato=self.formato) as span:
+            df = self.a_columnas(filas)
+            if len(df):
+                self._escribir(df)
+            span.filas = len(df)
+            self.filas_escritas += len(df)
+
+    def cerrar(self):
+        with metrics.medir("exportacion", formato=self.formato) as span:
+            if not self.filas_escritas:
+                # sin filas igual se deja el encabezado (y el esquema)
+                self._escribir(self.a_columnas([]))
+            self._finalizar()
+            span.bytes = os.path.getsize(self.output_file)
+
+    def _abrir(self):
+        pass
+
+    def _escribir(self, df):
+        raise NotImplementedError
+
+    def _finalizar(self):
+        pass
+
+    def _descartar(self):
+        self._finalizar()
+        if os.path.exists(self.output_file):
+            os.remove(self.output_file)
+
+
+class ExportadorCsv(ExportadorColumnar):
+    """CSV UTF-8 escrito por bloques, con el encabezado en el primero"""
+
+    formato = "csv"
+
+    def _abrir(self):
+        self._archivo = open(self.output_file, "w", encoding="utf-8", newline="")
+        self._encabezado = True
+
+    def _escribir(self, df):
+        df.to_csv(self._archivo, index=False, header=self._encabezado)
+        self._encabezado = False
+
+    def _finalizar(self):
+        self._archivo.close()
+
+
+class ExportadorArrow(ExportadorColumnar):
+    """Convierte cada bloque a una tabla de Arrow con un esquema fijo"""
+
+    def _abrir(self):
+        pa = _importar_pyarrow()
+        tipos = {c: pa.int64() for c in self.enteras}
+        tipos.update(
+            {c: pa.dictionary(pa.int32(), pa.string()) for c in self.categoricas}
+        )
+        self.schema = pa.schema([(c, tipos.get(c, pa.string())) for c in self.columnas])
+
+    def _tabla(self, df):
+        pa = _importar_pyarrow()
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+
+class ExportadorParquet(ExportadorArrow):
+    """Parquet escrito por bloques, un row group por bloque"""
+
+    formato = "parquet"
+
+    def _abrir(self):
+        super()._abrir()
+        self._writer = None
+
+    def _escribir(self, df):
+        tabla = self._tabla(df)
+        if self._writer is None:
+            import pyarrow.parquet as pq
+
+            # el esquema de la tabla incluye los tipos de pandas (Int64, category)
+            self._writer = pq.ParquetWriter(self.output_file, tabla.schema)
+        self._writer.write_table(tabla)
+
+    def _finalizar(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ExportadorFeather(ExportadorArrow):
+    """
+    Feather (Arrow IPC) escrito por bloques. El formato no admite reemplazar
+    el diccionario de una columna categórica, solo extenderlo: cada diccionario
+    empieza con los valores de `CATEGORIAS_CONOCIDAS` (nunca vacío, aunque el
+    primer bloque no tenga valores) y las categorías nuevas de cada bloque se
+    agregan al final y se emiten como deltas. Una columna sin valores conocidos
+    se guarda como texto.
+    """
+
+    formato = "feather"
+
+    def _abrir(self):
+        self.categoricas = [c for c in self.categoricas if c in CATEGORIAS_CONOCIDAS]
+        super()._abrir()
+        self._writer = None
+        self._categorias = {c: list(CATEGORIAS_CONOCIDAS[c]) for c in self.categoricas}
+
+    def _escribir(self, df):
+        for columna, categorias in self._categorias.items():
+            conocidas = set(categorias)
+            categorias += [c for c in df[columna].cat.categories if c not in conocidas]
+            df[columna] = df[columna].cat.set_categories(categorias)
+        tabla = self._tabla(df)
+        if self._writer is None:
+            pa = _importar_pyarrow()
+            import pyarrow.ipc as ipc
+
+            # como en Parquet, el esquema de la tabla conserva los tipos de pandas
+            self._writer = ipc.new_file(
+                self.output_file,
+                tabla.schema,
+                options=ipc.IpcWriteOptions(
+                    compression="lz4" if pa.Codec.is_available("lz4") else None,
+                    emit_dictionary_deltas=True,
+                ),
+            )
+        self._writer.write_table(tabla)
+
+    def _finalizar(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,23 @@
+import os
+
+# --- CONFIGURACIÓN ---
+SUNAT_FOLDER = "./.sunat-datos"
+PATH_PADRON_ZIP = os.path.join(SUNAT_FOLDER, "padron_ruc_sunat.zip")
+# DB única de versiones anteriores, se usa mientras no haya snapshots
+PATH_PADRON_DB = os.path.join(SUNAT_FOLDER, "padron_ruc_sunat.db")
+# cada actualización del padrón es un snapshot fechado, el activo se indica
+# en un puntero y se conservan algunos anteriores para volver atrás
+CARPETA_SNAPSHOTS = os.path.join(SUNAT_FOLDER, "snapshots")
+SNAPSHOTS_RETENIDOS = 2
+NOMBRE_PADRON_TABLE = "padron"
+WORKERS_DESCARGA = 4
+# tabla WITHOUT ROWID con estados codificados: DB ~40% más chica, pero la
+# ingesta es ~25% más lenta y las consultas apenas cambian
+DB_COMPACTA = False
+# índice FTS5 para buscar RUCs por nombre o razón social
+INDICE_NOMBRES = True
+# bitmap de RUCs existentes: los no encontrados se descartan sin consultar la DB
+BITMAP_RUCS = True
+# resultados ya validados, por bloque de documentos y versión del padrón, para
+# no volver a consultar los libros que se reprocesan con pocos cambios
+PATH_CACHE_RESULTADOS = os.path.join(SUNAT_FOLDER, "cache_resultados.db")
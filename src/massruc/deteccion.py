@@ -0,0 +1,105 @@
+import pandas as pd
+
+from massruc.file_reader import MUESTRA_FILAS, muestrear_columnas
+from massruc.ruc_utils import limpiar_rucs_lote
+
+# por debajo de este puntaje una columna no se considera de documentos
+PUNTAJE_MINIMO = 0.25
+# un encabezado con exactamente uno de estos nombres gana a cualquier puntaje
+NOMBRES_EXACTOS = ("documento", "ruc", "dni")
+# a igual puntaje, se prefieren las columnas con estos nombres
+NOMBRES_SUGERENTES = ("documento", "ruc", "dni", "doc")
+# tipos de contribuyente: un número de 11 cifras con otro prefijo no es un RUC
+PREFIJOS_RUC = ("10", "15", "16", "17", "20")
+
+
+def _textos(valores):
+    textos = pd.Series(list(valores), dtype=object).dropna().map(str).str.strip()
+    return textos[textos != ""]
+
+
+def puntuar(valores):
+    """
+    Qué tan probable es que los valores sean RUC o DNI, de 0 a 1: la mitad
+    por la fracción que `limpiar_ruc` acepta y la mitad por la fracción que
+    ya es un documento exacto: un DNI (se convierte a RUC 10 sin corregir
+    nada) o un RUC con prefijo de contribuyente y dígito verificador correcto.
+    Un número cualquiera de 11 cifras, como un teléfono, se acepta corrigiendo
+    el dígito, pero casi nunca es exacto. Las celdas vacías no cuentan.
+    """
+    textos = _textos(valores)
+    if textos.empty:
+        return 0.0
+
+    rucs, validos, _ = limpiar_rucs_lote(textos)
+    dnis = textos.str.len().to_numpy() == 8
+    exactos = validos & (
+        dnis
+        | (
+            (rucs.to_numpy() == textos.to_numpy())
+            & textos.str[:2].isin(PREFIJOS_RUC).to_numpy()
+        )
+    )
+    return float((validos.mean() + exactos.mean()) / 2)
+
+
+def _nombre(columna):
+    return columna.strip().lower()
+
+
+def _sugerente(columna):
+    return any(sugerente in _nombre(columna) for sugerente in NOMBRES_SUGERENTES)
+
+
+def detectar_columnas(archivo, filas=MUESTRA_FILAS, hoja=None):
+    """
+    Puntúa cada columna de cada hoja (o solo de `hoja`, si se indica) con una
+    muestra de sus primeras `filas` filas. Devuelve dicts con hoja, columna y
+    puntaje, del mejor al peor, solo los que llegan a PUNTAJE_MINIMO. Las
+    columnas llamadas como NOMBRES_EXACTOS van primero. Si la muestra no tiene
+    datos (un archivo solo con encabezados), se elige por el nombre, con
+    puntaje 0.
+    """
+    candidatos = []
+    vacias = []
+    hojas = set()
+    for orden, (hoja_actual, columna, valores) in enumerate(
+        muestrear_columnas(archivo, filas)
+    ):
+        hojas.add(hoja_actual)
+        # csv y parquet no tienen hojas: `hoja` no los restringe
+        if hoja is not None and hoja_actual not in (hoja, None):
+            continue
+        candidato = {"hoja": hoja_actual, "columna": columna, "orden": orden}
+        if _textos(valores).empty:
+            if _sugerente(columna):
+                vacias.append(dict(candidato, puntaje=0.0))
+            continue
+        puntaje = puntuar(valores)
+        if puntaje >= PUNTAJE_MINIMO:
+            candidatos.append(dict(candidato, puntaje=round(puntaje, 3)))
+    if hoja is not None and hojas - {None} and hoja not in hojas:
+        raise LookupError(f"No se encontró la hoja '{hoja}' en el archivo.")
+
+    candidatos = candidatos or vacias
+    candidatos.sort(
+        key=lambda c: (
+            _nombre(c["columna"]) not in NOMBRES_EXACTOS,
+            -c["puntaje"],
+            not _sugerente(c["columna"]),
+            c["orden"],
+        )
+    )
+    return candidatos
+
+
+def detectar_columna(archivo, filas=MUESTRA_FILAS, hoja=None):
+    """Mejor candidato (hoja, columna, puntaje); LookupError si no hay ninguno"""
+    candidatos = detectar_columnas(archivo, filas, hoja)
+    if not candidatos:
+        raise LookupError(
+            "No se encontró una columna con RUC o DNI en el archivo, "
+            "indíquela manualmente."
+        )
+    mejor = candidatos[0]
+    return mejor["hoja"], mejor["columna"], mejor["puntaje"]
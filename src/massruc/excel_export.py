@@ -0,0 +1,106 @@
+import os
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+from openpyxl.utils import get_column_letter
+
+from massruc import metrics
+from massruc.ruc_utils import RUC_QUERY_ERRORS
+
+HEADER_RESULTADOS = [
+    "Documento origen",
+    "RUC Validado",
+    "Nombre o razón social",
+    "Estado de contribuyente",
+    "Condición de domicilio",
+]
+
+
+class ExportadorExcel:
+    """
+    Escribe los resultados en un xlsx en modo write-only, con memoria acotada sin
+    importar la cantidad de filas. El color de los errores se aplica al escribir
+    cada fila. En write-only el ancho de columnas debe fijarse antes de la primera
+    fila, por eso se calcula con las primeras `filas_muestra` filas.
+    """
+
+    def __init__(
+        self,
+        output_file,
+        header=HEADER_RESULTADOS,
+        sheet_name="Resultados",
+        filas_muestra=1000,
+        columna_error=2,
+    ):
+        self.output_file = output_file
+        self.header = list(header)
+        self.filas_muestra = filas_muestra
+        self.columna_error = columna_error
+        self.filas_escritas = 0
+
+        self.workbook = Workbook(write_only=True)
+        self.worksheet = self.workbook.create_sheet(sheet_name)
+        self.cache_fills = {
+            v["text"]: PatternFill(
+                start_color=v["color"], end_color=v["color"], fill_type="solid"
+            )
+            for v in RUC_QUERY_ERRORS.values()
+        }
+        self._muestra = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # si hubo un error no se deja un archivo a medio escribir
+        if exc_type is None:
+            self.cerrar()
+
+    def escribir_filas(self, filas):
+        with metrics.medir("exportacion", formato="xlsx") as span:
+            for fila in filas:
+                fila = [str(valor) for valor in fila]
+                if self._muestra is not None:
+                    self._muestra.append(fila)
+                    if len(self._muestra) >= self.filas_muestra:
+                        self._vaciar_muestra()
+                else:
+                    self._escribir_fila(fila)
+                span.filas += 1
+
+    def cerrar(self):
+        with metrics.medir("exportacion", formato="xlsx") as span:
+            if self._muestra is not None:
+                self._vaciar_muestra()
+            self.workbook.save(self.output_file)
+            span.bytes = os.path.getsize(self.output_file)
+
+    def _vaciar_muestra(self):
+        for i, column in enumerate(self.header):
+            max_len = max((len(fila[i]) for fila in self._muestra), default=0)
+
+            # se añade cierto margen para mejorar la visibilidad
+            fixed_width = max(max_len, len(column)) + 2
+
+            col_letter = get_column_letter(i + 1)
+            self.worksheet.column_dimensions[col_letter].width = fixed_width
+
+        self.worksheet.append(self.header)
+        muestra, self._muestra = self._muestra, None
+        for fila in muestra:
+            self._escribir_fila(fila)
+
+    def _escribir_fila(self, fila):
+        current_fill = self.cache_fills.get(fila[self.columna_error].strip())
+
+        if current_fill:
+            celdas = []
+            for valor in fila:
+                cell = WriteOnlyCell(self.worksheet, value=valor)
+                cell.fill = current_fill
+                celdas.append(cell)
+            fila = celdas
+
+        self.worksheet.append(fila)
+        self.filas_escritas += 1
@@ -0,0 +1,252 @@
+import codecs
+import csv
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+FORMATOS_ENTRADA = {
+    ".xlsx": "excel",
+    ".xlsm": "excel",
+    ".xls": "excel_antiguo",
+    ".csv": "csv",
+    ".txt": "csv",
+    ".parquet": "parquet",
+}
+CHUNK_FILAS = 50000
+# filas que se leen de cada hoja para detectar la columna de documentos
+MUESTRA_FILAS = 1000
+# codificaciones que se prueban en orden sobre el inicio de un CSV; los
+# exportados desde Excel en Windows suelen venir en cp1252
+CODIFICACIONES_CSV = ("utf-8-sig", "cp1252", "latin-1")
+
+
+def _formato(archivo):
+    extension = os.path.splitext(os.fspath(archivo))[1].lower()
+    if extension not in FORMATOS_ENTRADA:
+        raise ValueError(f"Formato de archivo no soportado: {extension}")
+    return FORMATOS_ENTRADA[extension]
+
+
+def _buscar_columna(columnas, columna):
+    col_doc = next(
+        (c for c in columnas if str(c).strip().lower() == columna.lower()), None
+    )
+    if col_doc is None:
+        raise LookupError(f"No se encontró columna '{columna.title()}' en el archivo.")
+    return col_doc
+
+
+def _a_texto(valor):
+    """Convierte una celda a texto igual que `pd.read_excel(dtype=str)`"""
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _importar_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "Para leer Parquet instala la dependencia opcional: pip install massruc[columnar]"
+        ) from e
+    return pq
+
+
+def _hoja(workbook, hoja):
+    """La hoja con ese nombre, o la primera si no se indica"""
+    if hoja is None:
+        return workbook.worksheets[0]
+    if hoja not in workbook.sheetnames:
+        raise LookupError(f"No se encontró la hoja '{hoja}' en el archivo.")
+    return workbook[hoja]
+
+
+def estimar_filas(archivo, hoja=None):
+    """Cantidad de filas de datos si se conoce sin leer el archivo, o None"""
+    formato = _formato(archivo)
+    if formato == "excel":
+        workbook = load_workbook(archivo, read_only=True)
+        try:
+            max_row = _hoja(workbook, hoja).max_row
+        finally:
+            workbook.close()
+        return max_row - 1 if max_row else None
+    if formato == "parquet":
+        return _importar_pyarrow().ParquetFile(archivo).metadata.num_rows
+    return None
+
+
+def _iter_excel(archivo, columnas, chunk_size, hoja):
+    # read-only: las filas se leen del xml a medida que se recorren
+    workbook = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = _hoja(workbook, hoja).iter_rows(values_only=True)
+        header = list(next(filas, ()))
+        posiciones = [header.index(_buscar_columna(header, c)) for c in columnas]
+
+        bloque = []
+        for fila in filas:
+            bloque.append(
+                [_a_texto(fila[pos]) if pos < len(fila) else None for pos in posiciones]
+            )
+            if len(bloque) >= chunk_size:
+                yield pd.DataFrame(bloque, columns=columnas, dtype=object)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _iter_excel_antiguo(archivo, columnas, chunk_size, hoja):
+    # xls no admite lectura por partes, se lee completo
+    df_user = pd.read_excel(archivo, sheet_name=hoja or 0, dtype=str)
+    df_user = df_user[[_buscar_columna(df_user.columns, c) for c in columnas]]
+    df_user.columns = columnas
+    for i in range(0, len(df_user), chunk_size):
+        yield df_user.iloc[i : i + chunk_size].astype(object)
+
+
+def _detectar_csv(archivo):
+    """Separador y codificación de un CSV, a partir de sus primeros 64 KB"""
+    with open(archivo, "rb") as f:
+        datos = f.read(64 * 1024)
+    for codificacion in CODIFICACIONES_CSV:
+        try:
+            # incremental: un carácter cortado al final de la muestra no es error
+            muestra = codecs.getincrementaldecoder(codificacion)().decode(datos)
+            break
+        except UnicodeDecodeError:
+            continue
+    try:
+        separador = csv.Sniffer().sniff(muestra, delimiters=",;|\t").delimiter
+    except csv.Error:
+        separador = ","
+    return separador, codificacion
+
+
+def _leer_csv(archivo, **kwargs):
+    separador, codificacion = _detectar_csv(archivo)
+    # un byte inválido después de la muestra no debe cortar la lectura
+    return pd.read_csv(
+        archivo,
+        sep=separador,
+        encoding=codificacion,
+        encoding_errors="replace",
+        **kwargs,
+    )
+
+
+def _iter_csv(archivo, columnas, chunk_size, hoja):
+    header = _leer_csv(archivo, nrows=0).columns
+    originales = [_buscar_columna(header, c) for c in columnas]
+    for chunk in _leer_csv(
+        archivo, usecols=originales, dtype=str, chunksize=chunk_size
+    ):
+        chunk = chunk[originales].astype(object)
+        chunk.columns = columnas
+        yield chunk
+
+
+def _iter_parquet(archivo, columnas, chunk_size, hoja):
+    parquet = _importar_pyarrow().ParquetFile(archivo)
+    originales = [_buscar_columna(parquet.schema_arrow.names, c) for c in columnas]
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=originales):
+        yield pd.DataFrame(
+            {
+                c: batch.column(i)
+                .to_pandas()
+                .map(_a_texto, na_action="ignore")
+                .astype(object)
+                for i, c in enumerate(columnas)
+            }
+        )
+
+
+LECTORES = {
+    "excel": _iter_excel,
+    "excel_antiguo": _iter_excel_antiguo,
+    "csv": _iter_csv,
+    "parquet": _iter_parquet,
+}
+
+
+def iter_columnas(archivo, columnas, chunk_size=CHUNK_FILAS, hoja=None):
+    """
+    Genera las `columnas` indicadas por bloques de `chunk_size` filas, como
+    DataFrame de texto con esos nombres, sin cargar el archivo completo. En
+    Excel se lee la hoja `hoja`, o la primera si no se indica.
+    """
+    return LECTORES[_formato(archivo)](archivo, list(columnas), chunk_size, hoja)
+
+
+def iter_documentos(archivo, columna="documento", chunk_size=CHUNK_FILAS, hoja=None):
+    """
+    Genera la columna de documentos por bloques de `chunk_size` filas, como
+    pd.Series de texto, sin cargar el archivo completo en memoria.
+    """
+    for bloque in iter_columnas(archivo, [columna], chunk_size, hoja):
+        yield bloque[columna]
+
+
+def _muestra_excel(archivo, filas):
+    workbook = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            # solo se recorren las primeras filas de cada hoja
+            lector = worksheet.iter_rows(max_row=filas + 1, values_only=True)
+            header = next(lector, None) or ()
+            datos = list(lector)
+            for pos, columna in enumerate(header):
+                if columna is not None:
+                    valores = [
+                        _a_texto(f[pos]) if pos < len(f) else None for f in datos
+                    ]
+                    yield worksheet.title, str(columna).strip(), valores
+    finally:
+        workbook.close()
+
+
+def _muestra_excel_antiguo(archivo, filas):
+    for hoja, df in pd.read_excel(
+        archivo, sheet_name=None, nrows=filas, dtype=str
+    ).items():
+        for columna in df.columns:
+            yield hoja, str(columna).strip(), df[columna].astype(object).tolist()
+
+
+def _muestra_csv(archivo, filas):
+    df = _leer_csv(archivo, nrows=filas, dtype=str)
+    for columna in df.columns:
+        yield None, str(columna).strip(), df[columna].astype(object).tolist()
+
+
+def _muestra_parquet(archivo, filas):
+    parquet = _importar_pyarrow().ParquetFile(archivo)
+    batch = next(parquet.iter_batches(batch_size=filas), None)
+    if batch is None:
+        return
+    for i, columna in enumerate(batch.schema.names):
+        serie = batch.column(i).to_pandas().map(_a_texto, na_action="ignore")
+        yield None, str(columna).strip(), serie.astype(object).tolist()
+
+
+MUESTRAS = {
+    "excel": _muestra_excel,
+    "excel_antiguo": _muestra_excel_antiguo,
+    "csv": _muestra_csv,
+    "parquet": _muestra_parquet,
+}
+
+
+def muestrear_columnas(archivo, filas=MUESTRA_FILAS):
+    """
+    Genera (hoja, columna, valores) con las primeras `filas` filas de cada
+    columna de cada hoja, sin leer el resto del archivo. En csv y parquet la
+    hoja es None.
+    """
+    return MUESTRAS[_formato(archivo)](archivo, filas)
@@ -0,0 +1,200 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from massruc import ruc_utils
+from massruc.excel_export import HEADER_RESULTADOS, ExportadorExcel
+from massruc.file_reader import CHUNK_FILAS, estimar_filas, iter_columnas
+from massruc.progreso import como_progreso
+from massruc.ruc_utils import conectar_solo_lectura
+
+# columnas del padrón cuyas transiciones se registran (estado_* y condicion_*)
+COLUMNAS_SEGUIDAS = ("estado_del_contribuyente", "condición_de_domicilio")
+HEADER_CAMBIOS = [
+    "Documento origen",
+    "RUC Validado",
+    "Nombre o razón social",
+    "Estado anterior",
+    "Estado actual",
+    "Condición anterior",
+    "Condición actual",
+]
+
+
+def tabla_cambios(table_name):
+    return f"{table_name}_cambios"
+
+
+def _ahora():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _fecha_archivo(ruta):
+    modificado = os.path.getmtime(ruta)
+    return datetime.fromtimestamp(modificado, timezone.utc).isoformat(
+        timespec="seconds"
+    )
+
+
+def registrar_cambios(connection, table_name, fuente, columnas, version=None):
+    """
+    Guarda en la tabla de cambios los RUCs cuyo estado o condición difiere entre
+    `table_name` (todavía sin actualizar) y `fuente` (el padrón nuevo), además
+    de altas y bajas. Se llama dentro de la transacción de la actualización
+    incremental; solo se guardan las transiciones, no el padrón completo.
+    Devuelve la cantidad registrada.
+    """
+    seguidas = [c for c in COLUMNAS_SEGUIDAS if c in columnas]
+    if not seguidas:
+        return 0
+
+    cambios = tabla_cambios(table_name)
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {cambios} (ruc INTEGER NOT NULL, "
+        "fecha TEXT NOT NULL, version TEXT, tipo TEXT NOT NULL, "
+        "estado_anterior TEXT, estado_nuevo TEXT, "
+        "condicion_anterior TEXT, condicion_nueva TEXT, "
+        "PRIMARY KEY (ruc, fecha)) WITHOUT ROWID"
+    )
+
+    def pares(anterior, nuevo):
+        campos = []
+        for c in COLUMNAS_SEGUIDAS:
+            campos.append(f'{anterior}."{c}"' if anterior and c in seguidas else "NULL")
+            campos.append(f'{nuevo}."{c}"' if nuevo and c in seguidas else "NULL")
+        return ", ".join(campos)
+
+    distintas = " OR ".join(f'n."{c}" IS NOT t."{c}"' for c in seguidas)
+    insertar = f"INSERT OR REPLACE INTO {cambios} "
+    parametros = (_ahora(), version)
+    consultas = [
+        f"SELECT n.ruc, ?, ?, 'cambio', {pares('t', 'n')} FROM {fuente} n "
+        f"JOIN {table_name} t ON t.ruc = n.ruc WHERE {distintas}",
+        f"SELECT n.ruc, ?, ?, 'alta', {pares(None, 'n')} FROM {fuente} n "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE t.ruc = n.ruc)",
+        f"SELECT t.ruc, ?, ?, 'baja', {pares('t', None)} FROM {table_name} t "
+        f"WHERE t.ruc NOT IN (SELECT ruc FROM {fuente})",
+    ]
+    return sum(
+        connection.execute(insertar + consulta, parametros).rowcount
+        for consulta in consultas
+    )
+
+
+def leer_cambios(path_db, table_name="main_table", desde=None):
+    """
+    Transiciones registradas después de `desde` (fecha ISO), como DataFrame.
+    Devuelve None si la DB no tiene tabla de cambios, p. ej. si nunca se
+    actualizó de forma incremental.
+    """
+    con = conectar_solo_lectura(path_db)
+    try:
+        return pd.read_sql_query(
+            f"SELECT * FROM {tabla_cambios(table_name)} WHERE fecha > ? "
+            "ORDER BY fecha, ruc",
+            con,
+            params=(desde or "",),
+        )
+    except pd.errors.DatabaseError:
+        return None
+    finally:
+        con.close()
+
+
+def rucs_cambiados(path_db, table_name="main_table", desde=None):
+    """Conjunto de RUCs con transiciones después de `desde`, o None sin registro"""
+    con = conectar_solo_lectura(path_db)
+    try:
+        return {
+            ruc
+            for (ruc,) in con.execute(
+                f"SELECT ruc FROM {tabla_cambios(table_name)} WHERE fecha > ?",
+                (desde or "",),
+            )
+        }
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        con.close()
+
+
+def _sin_dato(*valores):
+    """
+    Iguala las formas de "sin dato": el Excel guarda "-" o "None" como texto y
+    las salidas columnares (csv, parquet) dejan nulos.
+    """
+    return tuple(
+        None if pd.isna(valor) or valor in ("-", "None") else str(valor)
+        for valor in valores
+    )
+
+
+def nombre_cambios_para(salida_anterior):
+    return os.path.splitext(salida_anterior)[0] + "_CAMBIOS.xlsx"
+
+
+def revalidar_salida(
+    salida_anterior,
+    path_db,
+    table_name="main_table",
+    nombre_salida=None,
+    desde=None,
+    chunk_size=CHUNK_FILAS,
+    log=print,
+    progress_callback=None,
+):
+    """
+    Vuelve a consultar solo los RUCs de una salida ya procesada que cambiaron
+    desde `desde` (por defecto, la fecha del archivo) según la tabla de cambios,
+    y guarda las filas cuyo estado o condición ya no coincide con la salida.
+    Sin tabla de cambios se consultan todos los RUCs de la salida.
+    Devuelve la ruta del reporte, las filas leídas y las filas con cambios.
+    """
+    progreso = como_progreso(progress_callback)
+    nombre_salida = nombre_salida or nombre_cambios_para(salida_anterior)
+    desde = desde or _fecha_archivo(salida_anterior)
+    candidatos = rucs_cambiados(path_db, table_name, desde)
+    if candidatos is None:
+        log("⚠️ El padrón no tiene registro de cambios, se revisan todos los RUCs.")
+    else:
+        log(f"{len(candidatos)} RUCs cambiaron en el padrón desde {desde}")
+
+    total_estimado = estimar_filas(salida_anterior)
+    total_filas = 0
+    con_cambios = 0
+    documento, ruc, _, estado, condicion = HEADER_RESULTADOS
+    with ExportadorExcel(nombre_salida, HEADER_CAMBIOS) as exportador:
+        for bloque in iter_columnas(salida_anterior, HEADER_RESULTADOS, chunk_size):
+            total_filas += len(bloque)
+            rucs = pd.to_numeric(bloque[ruc], errors="coerce")
+            revisar = rucs.notna()
+            if candidatos is not None:
+                revisar &= rucs.isin(candidatos)
+            bloque = bloque[revisar]
+
+            if len(bloque):
+                actuales = ruc_utils.buscar_rucs(
+                    bloque[ruc].tolist(), path_db, table_name
+                )
+                if not actuales:
+                    raise RuntimeError("No se pudo consultar la base de datos")
+
+                filas = [
+                    (fila[documento], actual[1], actual[2])
+                    + (fila[estado], actual[3], fila[condicion], actual[4])
+                    for fila, actual in zip(bloque.to_dict("records"), actuales)
+                    if _sin_dato(fila[estado], fila[condicion])
+                    != _sin_dato(actual[3], actual[4])
+                ]
+                exportador.escribir_filas(filas)
+                con_cambios += len(filas)
+
+            if total_estimado:
+                progreso.reportar(total_filas / total_estimado)
+            else:
+                progreso.verificar()
+
+    log(f"{con_cambios} de {total_filas} registros cambiaron de estado o condición")
+    return nombre_salida, total_filas, con_cambios
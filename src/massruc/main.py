@@ -5,26 +5,37 @@ import tkinter as tk
 import zipfile
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 
-import pandas as pd
 import requests
-from openpyxl.styles import PatternFill
-from openpyxl.utils import get_column_letter
 
-from massruc import ruc_utils, txt_to_db
-
-# --- CONFIGURACIÓN ---
-SUNAT_FOLDER = "./.sunat-datos"
-TEMP_DB_TXT = os.path.join(SUNAT_FOLDER, ".padron_txt.tmp")
-PATH_PADRON_ZIP = os.path.join(SUNAT_FOLDER, "padron_ruc_sunat.zip")
-PATH_PADRON_DB = os.path.join(SUNAT_FOLDER, "padron_ruc_sunat.db")
-NOMBRE_PADRON_TABLE = "padron"
+from massruc import (
+    historial,
+    metrics,
+    name_search,
+    processing,
+    ruc_utils,
+    snapshots,
+)
+from massruc.config import (
+    BITMAP_RUCS,
+    CARPETA_SNAPSHOTS,
+    DB_COMPACTA,
+    INDICE_NOMBRES,
+    NOMBRE_PADRON_TABLE,
+    PATH_CACHE_RESULTADOS,
+    PATH_PADRON_DB,
+    PATH_PADRON_ZIP,
+    SNAPSHOTS_RETENIDOS,
+    SUNAT_FOLDER,
+    WORKERS_DESCARGA,
+)
+from massruc.progreso import OperacionCancelada, Progreso
 
 
 class SunatApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Validador Masivo SUNAT - Modo Gratuito")
-        self.root.geometry("600x550")
+        self.root.geometry("600x705")
         self.root.resizable(False, False)
 
         # Estilos
@@ -38,6 +49,14 @@ class SunatApp:
         # Variables
         self.archivo_seleccionado = tk.StringVar()
         self.estado_padron = tk.StringVar(value="Verificando padrón...")
+        self.mostrar_metricas = tk.BooleanVar(value=False)
+        self.nombre_buscado = tk.StringVar()
+        self.formato_salida = tk.StringVar(value="xlsx")
+        # vacío: la columna de documentos se detecta en el archivo
+        self.columna_manual = tk.StringVar()
+        self.sink_metricas = None
+        # token de la operación en curso, para informar avance y cancelarla
+        self.progreso = None
 
         # --- INTERFAZ ---
         # 1. Sección Padrón
@@ -82,6 +101,21 @@ class SunatApp:
             fg="white",
         ).pack(side="right")
 
+        # Búsqueda por nombre o razón social
+        frame_nombre = tk.LabelFrame(
+            root, text="Buscar RUC por razón social", padx=10, pady=5
+        )
+        frame_nombre.pack(fill="x", padx=10, pady=5)
+
+        entry_nombre = tk.Entry(
+            frame_nombre, textvariable=self.nombre_buscado, width=50
+        )
+        entry_nombre.pack(side="left", padx=5)
+        entry_nombre.bind("<Return>", lambda _: self.iniciar_busqueda_nombre_thread())
+        tk.Button(
+            frame_nombre, text="🔎 Buscar", command=self.iniciar_busqueda_nombre_thread
+        ).pack(side="right")
+
         # 3. Sección Procesar
         frame_action = tk.Frame(root, padx=10, pady=10)
         frame_action.pack(fill="x", padx=10, pady=5)
@@ -98,15 +132,53 @@ class SunatApp:
         )
         self.btn_procesar.pack(pady=5)
 
+        # xlsx con estilos para revisar a mano; csv/parquet/feather para otros procesos
+        frame_formato = tk.Frame(frame_action)
+        frame_formato.pack()
+        tk.Label(frame_formato, text="Formato de salida:").pack(side="left")
+        ttk.Combobox(
+            frame_formato,
+            textvariable=self.formato_salida,
+            values=[extension[1:] for extension in processing.FORMATOS_SALIDA],
+            state="readonly",
+            width=8,
+        ).pack(side="left", padx=5)
+        tk.Label(frame_formato, text="Columna (vacío = detectar):").pack(side="left")
+        tk.Entry(frame_formato, textvariable=self.columna_manual, width=15).pack(
+            side="left", padx=5
+        )
+
+        tk.Button(
+            frame_action,
+            text="🔁 Revisar solo cambios de una salida anterior",
+            command=self.iniciar_cambios_thread,
+        ).pack()
+
+        tk.Checkbutton(
+            frame_action,
+            text="Mostrar tiempos por etapa en el log",
+            variable=self.mostrar_metricas,
+            command=self.alternar_metricas,
+        ).pack()
+
         # Barra de Progreso
+        frame_progreso = tk.Frame(root)
+        frame_progreso.pack(pady=5)
         self.progress = ttk.Progressbar(
-            root,
+            frame_progreso,
             orient="horizontal",
-            length=550,
+            length=470,
             mode="determinate",
             style="Green.Horizontal.TProgressbar",
         )
-        self.progress.pack(pady=5)
+        self.progress.pack(side="left")
+        self.btn_cancelar = tk.Button(
+            frame_progreso,
+            text="✖ Cancelar",
+            command=self.cancelar_operacion,
+            state="disabled",
+        )
+        self.btn_cancelar.pack(side="left", padx=5)
 
         # Consola de Log
         self.log_area = scrolledtext.ScrolledText(
@@ -125,8 +197,15 @@ class SunatApp:
         self.log_area.config(state="disabled")
         self.root.update_idletasks()
 
+    def alternar_metricas(self):
+        if self.mostrar_metricas.get():
+            self.sink_metricas = metrics.agregar_sink(metrics.sink_log(self.log))
+        else:
+            metrics.quitar_sink(self.sink_metricas)
+            self.sink_metricas = None
+
     def verificar_padron_local(self):
-        if not os.path.exists(PATH_PADRON_DB):
+        if not self.ruta_padron():
             if not os.path.exists(PATH_PADRON_ZIP):
                 self.estado_padron.set("❌ Padrón NO encontrado")
                 self.lbl_padron.config(fg="red")
@@ -139,6 +218,25 @@ class SunatApp:
             self.lbl_padron.config(fg="green")
             self.btn_descargar.config(state="normal")
 
+    def ruta_padron(self):
+        """Snapshot activo del padrón (o la DB única anterior), None si no hay"""
+        return snapshots.ruta_activa(CARPETA_SNAPSHOTS, PATH_PADRON_DB)
+
+    def nuevo_progreso(self):
+        """Token para una operación larga; el botón Cancelar lo cancela"""
+        self.progreso = Progreso(self.update_progress_bar)
+        self.btn_cancelar.config(state="normal")
+        return self.progreso
+
+    def terminar_progreso(self):
+        self.progreso = None
+        self.btn_cancelar.config(state="disabled")
+
+    def cancelar_operacion(self):
+        if self.progreso is not None:
+            self.log("Cancelando...")
+            self.progreso.cancelar()
+
     def update_progress_bar(self, decimal_percentage):
         self.root.after(
             0, lambda: self._set_progress_bar(decimal_percentage=decimal_percentage)
@@ -162,15 +260,25 @@ class SunatApp:
     def iniciar_procesamiento_thread(self):
         threading.Thread(target=self.procesar_logica, daemon=True).start()
 
+    def iniciar_cambios_thread(self):
+        salida_anterior = filedialog.askopenfilename(
+            title="Salida procesada anteriormente",
+            filetypes=[("Excel procesado", "*_PROCESADO.xlsx"), ("Excel", "*.xlsx")],
+        )
+        if salida_anterior:
+            threading.Thread(
+                target=self.cambios_logica, args=(salida_anterior,), daemon=True
+            ).start()
+
+    def iniciar_busqueda_nombre_thread(self):
+        threading.Thread(target=self.buscar_nombre_logica, daemon=True).start()
+
     def iniciar_optimizacion_db_threat(self):
         threading.Thread(target=self.optimizar_db, daemon=True).start()
 
     # --- LÓGICA PRINCIPAL ---
     def descargar_logica(self):
-        # al descargar una nueva base, se elimina la anterior
-        if os.path.exists(PATH_PADRON_DB):
-            os.remove(PATH_PADRON_DB)
-
+        # la base anterior se conserva, luego solo se aplican los cambios
         self.btn_descargar.config(state="disabled")
         self.btn_procesar.config(state="disabled")
         self.log("Iniciando descarga del Padrón SUNAT (300MB+)...")
@@ -179,18 +287,29 @@ class SunatApp:
             if not os.path.exists(SUNAT_FOLDER):
                 os.mkdir(SUNAT_FOLDER)
 
-            ruc_utils.descargar_padron_reducido(
-                PATH_PADRON_ZIP, progress_callback=self.update_progress_bar
+            # si la descarga se interrumpe o cancela, el siguiente intento la retoma
+            progreso = self.nuevo_progreso()
+            nuevo = ruc_utils.descargar_padron_reducido(
+                PATH_PADRON_ZIP,
+                progress_callback=progreso,
+                workers=WORKERS_DESCARGA,
             )
 
-            self.log("Descarga completa.")
-            self.root.after(0, self.verificar_padron_local)
+            if nuevo or not self.ruta_padron():
+                self.log("Descarga completa.")
+                self.optimizar_db(progreso)
+            else:
+                self.log("✅ El padrón no cambió desde la última descarga.")
+
+        except OperacionCancelada:
+            self.log("⛔ Descarga cancelada, se retomará en el siguiente intento.")
 
         except Exception as e:
             self.log(f"❌ Error en descarga: {str(e)}")
             messagebox.showerror("Error", f"Fallo en la descarga: {e}")
 
         finally:
+            self.terminar_progreso()
             self.btn_descargar.config(state="normal")
             if self.archivo_seleccionado.get():
                 self.btn_procesar.config(state="normal")
@@ -198,12 +317,15 @@ class SunatApp:
 
     def seleccionar_excel(self):
         archivo = filedialog.askopenfilename(
-            filetypes=[("Excel Files", "*.xlsx *.xls")]
+            filetypes=[
+                ("Archivos de clientes", "*.xlsx *.xlsm *.xls *.csv *.txt *.parquet"),
+                ("Excel Files", "*.xlsx *.xls"),
+            ]
         )
         if archivo:
             self.archivo_seleccionado.set(archivo)
             self.log(f"Archivo seleccionado: {os.path.basename(archivo)}")
-            if os.path.exists(PATH_PADRON_DB):
+            if self.ruta_padron():
                 self.btn_procesar.config(state="normal")
             else:
                 self.log("⚠️ Primero debes descargar el padrón SUNAT.")
@@ -212,100 +334,105 @@ class SunatApp:
         self.btn_procesar.config(state="disabled")
         self.update_progress_bar(0)
         archivo_input = self.archivo_seleccionado.get()
+        progreso = self.nuevo_progreso()
 
         try:
             self.log("🔎 Iniciando búsqueda...")
             start_time = time.time()
-            # Cargar Excel
-            self.log(f"Leyendo Excel: {os.path.basename(archivo_input)}")
-            df_user = pd.read_excel(archivo_input, dtype=str)
-
-            # Buscar columna
-            col_doc = next(
-                (c for c in df_user.columns if str(c).strip().lower() == "documento"),
-                None,
-            )
-            if not col_doc:
-                raise LookupError("No se encontró columna 'Documento' en el Excel.")
-
-            # Procesar
-            total_filas = len(df_user)
-            self.log(f"Analizando {total_filas} registros...")
-            resultados = ruc_utils.buscar_rucs(
-                df_user[col_doc], PATH_PADRON_DB, NOMBRE_PADRON_TABLE
+
+            # se lee, valida y guarda por bloques, sin cargar todo el archivo; si
+            # mientras tanto se activa otro snapshot, este proceso sigue con el suyo.
+            # Los bloques sin cambios desde la última vez salen de la caché
+            nombre_salida, total_filas = processing.procesar_archivo(
+                archivo_input,
+                self.ruta_padron(),
+                NOMBRE_PADRON_TABLE,
+                log=self.log,
+                progress_callback=progreso,
+                columna=self.columna_manual.get().strip() or None,
+                cache=PATH_CACHE_RESULTADOS,
+                formato=self.formato_salida.get(),
             )
-            resultados = [map(str, res) for res in resultados]
-
-            # Guardar
-            self.update_progress_bar(100)
-            self.log("💾 Guardando y formateando Excel...")
-            nombre_salida = os.path.splitext(archivo_input)[0] + "_PROCESADO.xlsx"
-            header = [
-                "Documento origen",
-                "RUC Validado",
-                "Nombre o razón social",
-                "Estado de contribuyente",
-                "Condición de domicilio",
-            ]
-            df_export = pd.DataFrame(resultados, columns=header)
-
-            with pd.ExcelWriter(nombre_salida, engine="openpyxl") as writer:
-                df_export.to_excel(writer, index=False, sheet_name="Resultados")
-                worksheet = writer.sheets["Resultados"]
-
-                for i, column in enumerate(df_export.columns):
-                    max_len_data = df_export[column].astype(str).map(len).max()
-                    len_header = len(column)
-
-                    max_len = (
-                        max(max_len_data, len_header)
-                        if pd.notna(max_len_data)
-                        else len_header
-                    )
-
-                    # se añade cierto margen para mejorar la visibilidad
-                    fixed_width = max_len + 2
-
-                    col_letter = get_column_letter(i + 1)
-                    worksheet.column_dimensions[col_letter].width = fixed_width
-
-                map_colores = {
-                    v["text"]: v["color"] for v in ruc_utils.RUC_QUERY_ERRORS.values()
-                }
-                cache_fills = {
-                    text: PatternFill(
-                        start_color=color, end_color=color, fill_type="solid"
-                    )
-                    for text, color in map_colores.items()
-                }
-
-                for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-                    razon_social = str(row[2].value).strip()
-
-                    if razon_social in cache_fills:
-                        current_fill = cache_fills[razon_social]
-                        for cell in row:
-                            cell.fill = current_fill
 
             self.log(f"✅ ¡ÉXITO! Archivo guardado:\n{os.path.basename(nombre_salida)}")
             self.log(
-                f"Operación completada en {round(time.time()-start_time,2)} segundos"
+                f"{total_filas} registros en {round(time.time()-start_time,2)} segundos"
             )
             messagebox.showinfo(
                 "Proceso Terminado", f"Se generó el archivo:\n{nombre_salida}"
             )
             os.startfile(os.path.dirname(nombre_salida))  # Abrir carpeta
 
+        except OperacionCancelada:
+            self.log("⛔ Proceso cancelado, no se generó el archivo de salida.")
+
         except Exception as e:
             self.log(f"❌ ERROR CRÍTICO: {str(e)}")
             messagebox.showerror("Error", str(e))
 
         finally:
+            self.terminar_progreso()
             self.btn_procesar.config(state="normal")
 
-    def optimizar_db(self):
-        TEMP_SANITIZED_TXT = os.path.join(SUNAT_FOLDER, ".sanitized_db.tmp")
-        TEMP_DB = PATH_PADRON_DB + ".tmp"
+    def cambios_logica(self, salida_anterior):
+        path_db = self.ruta_padron()
+        if not path_db:
+            self.log("⚠️ Primero debes descargar el padrón SUNAT.")
+            return
+        progreso = self.nuevo_progreso()
+
+        try:
+            self.log(f"🔁 Revisando cambios de: {os.path.basename(salida_anterior)}")
+            # solo se consultan los RUCs que la tabla de cambios marca como cambiados
+            nombre_salida, _, cambiadas = historial.revalidar_salida(
+                salida_anterior,
+                path_db,
+                NOMBRE_PADRON_TABLE,
+                log=self.log,
+                progress_callback=progreso,
+            )
+            self.log(f"✅ Reporte de cambios:\n{os.path.basename(nombre_salida)}")
+            messagebox.showinfo(
+                "Revisión terminada",
+                f"{cambiadas} registros cambiaron.\nSe generó el archivo:\n"
+                f"{nombre_salida}",
+            )
+
+        except OperacionCancelada:
+            self.log("⛔ Revisión cancelada, no se generó el reporte.")
+
+        except Exception as e:
+            self.log(f"❌ Error al revisar cambios: {str(e)}")
+            messagebox.showerror("Error", str(e))
+
+        finally:
+            self.terminar_progreso()
+
+    def buscar_nombre_logica(self):
+        nombre = self.nombre_buscado.get().strip()
+        if not nombre:
+            return
+        path_db = self.ruta_padron()
+        if not path_db:
+            self.log("⚠️ Primero debes descargar el padrón SUNAT.")
+            return
+
+        try:
+            (candidatos,) = name_search.buscar_nombres(
+                [nombre], path_db, NOMBRE_PADRON_TABLE, workers=1
+            )
+            if not candidatos:
+                self.log(f"Sin coincidencias para: {nombre}")
+            for fila in candidatos:
+                self.log(f"{fila[0]} | {fila[1]} | {fila[2]} | {fila[3]}")
+        except LookupError:
+            self.log("⚠️ El padrón no tiene índice de nombres, actualícelo.")
+        except Exception as e:
+            self.log(f"❌ Error en la búsqueda: {str(e)}")
+
+    def optimizar_db(self, progreso=None):
+        progreso = progreso or self.nuevo_progreso()
+        cancelada = False
 
         if not os.path.exists(PATH_PADRON_ZIP):
             self.root.after(0, self.verificar_padron_local)
@@ -316,42 +443,53 @@ class SunatApp:
             self.root.after(0, self.verificar_padron_local)
             return
 
-        if os.path.exists(TEMP_DB):
-            os.remove(TEMP_DB)
-
         self.log("⚙️ Iniciando optimización...")
-        with zipfile.ZipFile(PATH_PADRON_ZIP, "r") as z:
-            in_zip_name = z.filelist[0].filename
-            z.extractall(SUNAT_FOLDER)
-            os.rename(
-                os.path.join(SUNAT_FOLDER, in_zip_name), os.path.relpath(TEMP_DB_TXT)
-            )
-
         try:
-            self.log("Limpiando base de datos...")
-            txt_to_db.sanitize_csv(TEMP_DB_TXT, TEMP_SANITIZED_TXT)
-            os.remove(TEMP_DB_TXT)
-
-            self.log("Optimizando base de datos...")
-            txt_to_db.convert_txt_to_sql(
-                TEMP_SANITIZED_TXT,
-                TEMP_DB,
+            if self.ruta_padron():
+                # se copia el padrón activo y solo se aplican las filas que cambiaron
+                self.log("Aplicando cambios del nuevo padrón...")
+            else:
+                # se lee directo del ZIP, sin extraer ni generar txt intermedios
+                self.log("Limpiando y optimizando base de datos...")
+
+            # se construye aparte: el padrón activo se sigue usando mientras tanto
+            nuevo = snapshots.construir_snapshot(
+                PATH_PADRON_ZIP,
+                CARPETA_SNAPSHOTS,
                 NOMBRE_PADRON_TABLE,
-                chunk_size=10000,
-                progress_callback=self.update_progress_bar,
+                progress_callback=progreso,
+                compacto=DB_COMPACTA,
+                indice_nombres=INDICE_NOMBRES,
+                bitmap=BITMAP_RUCS,
+                indice_mmap=True,
+                respaldo=PATH_PADRON_DB,
+            )
+            snapshots.activar_snapshot(CARPETA_SNAPSHOTS, nuevo)
+            snapshots.podar_snapshots(CARPETA_SNAPSHOTS, SNAPSHOTS_RETENIDOS)
+            info = snapshots.leer_info(nuevo)
+            self.log(
+                f"✅ Base de datos lista: {info['filas']} RUCs "
+                f"(padrón del {info['fecha_origen']})"
             )
-            os.remove(TEMP_SANITIZED_TXT)
 
-            # Si es interrumpe la conversión, el archivo sera solo el temporal
-            os.rename(TEMP_DB, PATH_PADRON_DB)
-            self.log("✅ Base de datos lista")
+        except OperacionCancelada:
+            # el snapshot a medio construir se elimina; el activo no cambió
+            cancelada = True
+            self.log("⛔ Optimización cancelada.")
 
         except Exception as e:
             self.log(f"❌ Error en optimización: {str(e)}")
             messagebox.showerror("Error", f"Fallo en la optimización: {e}")
 
         finally:
-            self.root.after(0, self.verificar_padron_local)
+            self.terminar_progreso()
+            self.progress["value"] = 0
+            if cancelada and not self.ruta_padron():
+                # sin DB se volvería a optimizar sola al verificar el padrón
+                self.estado_padron.set("⏸ Optimización cancelada")
+                self.btn_descargar.config(state="normal")
+            else:
+                self.root.after(0, self.verificar_padron_local)
 
 
 def main():
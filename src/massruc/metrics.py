@@ -0,0 +1,285 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENV_METRICAS = "MASSRUC_METRICAS"
+
+_sinks = []
+_local = threading.local()
+# un grupo de `agrupar` puede recibir eventos de varios hilos (`unirse_a_grupo`)
+_lock_grupos = threading.Lock()
+
+
+def memoria_pico():
+    """RSS pico del proceso en bytes, None si no se puede medir"""
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo reporta en KB y macOS en bytes
+        return pico if sys.platform == "darwin" else pico * 1024
+    if sys.platform != "win32":
+        return None
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class CONTADORES(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        contadores = CONTADORES()
+        contadores.cb = ctypes.sizeof(contadores)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(),
+            ctypes.byref(contadores),
+            contadores.cb,
+        )
+        return contadores.PeakWorkingSetSize
+    except OSError:
+        return None
+
+
+def agregar_sink(sink):
+    """Registra un callable que recibe cada evento (dict) al cerrar una etapa"""
+    _sinks.append(sink)
+    return sink
+
+
+def quitar_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def activo():
+    """Indica si alguien recibe los eventos, si no las mediciones se omiten"""
+    return bool(_sinks) or getattr(_local, "grupo", None) is not None
+
+
+def emitir(evento):
+    grupo = getattr(_local, "grupo", None)
+    if grupo is not None:
+        with _lock_grupos:
+            _acumular(grupo, evento)
+        return
+
+    for sink in list(_sinks):
+        try:
+            sink(evento)
+        except Exception as e:
+            # una métrica nunca debe interrumpir el proceso medido
+            print(f"Error en sink de métricas: {e}")
+
+
+def _acumular(grupo, evento):
+    previo = grupo.get(evento["etapa"])
+    if previo is None:
+        grupo[evento["etapa"]] = dict(evento, veces=1)
+        return
+
+    previo["segundos"] += evento["segundos"]
+    previo["filas"] += evento["filas"]
+    previo["bytes"] += evento["bytes"]
+    previo["veces"] += 1
+    previo["rss_pico"] = max(previo["rss_pico"] or 0, evento["rss_pico"] or 0)
+    previo["filas_por_segundo"] = _tasa(previo["filas"], previo["segundos"])
+    if evento.get("error"):
+        previo["error"] = evento["error"]
+
+
+def _tasa(filas, segundos):
+    return round(filas / segundos, 1) if segundos > 0 else None
+
+
+class Span:
+    """Acumula tiempo, filas y bytes de una etapa hasta emitir su evento"""
+
+    def __init__(self, etapa, filas=0, bytes=0, **datos):
+        self.etapa = etapa
+        self.filas = filas
+        self.bytes = bytes
+        self.datos = datos
+        self.segundos = 0.0
+        self.error = None
+        self.inicio = time.time()
+
+    @contextmanager
+    def tramo(self):
+        inicio = time.perf_counter()
+        try:
+            yield self
+        except BaseException as e:
+            self.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.segundos += time.perf_counter() - inicio
+
+    def evento(self):
+        evento = {
+            "etapa": self.etapa,
+            "inicio": self.inicio,
+            "segundos": self.segundos,
+            "filas": self.filas,
+            "filas_por_segundo": _tasa(self.filas, self.segundos),
+            "bytes": self.bytes,
+            "rss_pico": memoria_pico(),
+            "pid": os.getpid(),
+        }
+        if self.error:
+            evento["error"] = self.error
+        evento.update(self.datos)
+        return evento
+
+    def emitir(self):
+        emitir(self.evento())
+
+
+@contextmanager
+def medir(etapa, filas=0, bytes=0, **datos):
+    """
+    Mide el bloque como una etapa. Las filas y bytes se pueden fijar al abrirla
+    o completar luego en el Span devuelto (`span.filas = ...`).
+    """
+    span = Span(etapa, filas, bytes, **datos)
+    if not activo():
+        yield span
+        return
+
+    try:
+        with span.tramo():
+            yield span
+    finally:
+        span.emitir()
+
+
+def medir_iteracion(etapa, iterable, contar=None, **datos):
+    """
+    Mide solo el tiempo gastado en producir los elementos de `iterable`, útil
+    para separar la lectura de quien la consume. Cuenta un elemento por fila,
+    o `contar(elemento)` filas si se indica.
+    """
+    if not activo():
+        return iterable
+    return _iterar_midiendo(Span(etapa, **datos), iter(iterable), contar)
+
+
+def _iterar_midiendo(span, iterador, contar):
+    # se mide sin context managers: esto corre una vez por cada fila del padrón
+    reloj = time.perf_counter
+    try:
+        while True:
+            inicio = reloj()
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                return
+            except Exception as e:
+                span.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                span.segundos += reloj() - inicio
+            span.filas += contar(elemento) if contar else 1
+            yield elemento
+    finally:
+        span.emitir()
+
+
+@contextmanager
+def agrupar():
+    """
+    Junta los eventos del bloque por etapa (sumando tiempos, filas y bytes) y
+    los emite al salir, para no generar un evento por cada bloque procesado.
+    """
+    if not activo():
+        yield None
+        return
+
+    anterior = getattr(_local, "grupo", None)
+    grupo = {}
+    _local.grupo = grupo
+    try:
+        yield grupo
+    finally:
+        _local.grupo = anterior
+        for evento in grupo.values():
+            emitir(evento)
+
+
+@contextmanager
+def unirse_a_grupo(grupo):
+    """
+    Suma los eventos de este hilo al `grupo` abierto con `agrupar` en otro
+    hilo, p. ej. desde las etapas de un pipeline. Con None no hace nada.
+    """
+    anterior = getattr(_local, "grupo", None)
+    _local.grupo = grupo
+    try:
+        yield
+    finally:
+        _local.grupo = anterior
+
+
+class SinkJsonl:
+    """Agrega cada evento como una línea JSON al archivo indicado"""
+
+    def __init__(self, ruta):
+        self.ruta = os.fspath(ruta)
+        self._lock = threading.Lock()
+
+    def __call__(self, evento):
+        linea = json.dumps(evento, ensure_ascii=False) + "\n"
+        with self._lock, open(self.ruta, "a", encoding="utf-8") as f:
+            f.write(linea)
+
+
+def registrar_jsonl(ruta):
+    """
+    Envía los eventos a un archivo JSON lines, también desde los procesos hijos
+    que se creen luego (se les pasa la ruta por variable de entorno).
+    """
+    ruta = os.path.abspath(ruta)
+    os.environ[ENV_METRICAS] = ruta
+    return agregar_sink(SinkJsonl(ruta))
+
+
+def formatear_evento(evento):
+    """Texto corto de un evento, para el log de la interfaz"""
+    partes = [f"{evento['etapa']}: {evento['segundos']:.2f}s"]
+    if evento["filas"]:
+        partes.append(f"{evento['filas']} filas")
+    if evento["filas_por_segundo"]:
+        partes.append(f"{evento['filas_por_segundo']:.0f} filas/s")
+    if evento["bytes"]:
+        partes.append(f"{evento['bytes'] / 1024**2:.1f} MB")
+    if evento["rss_pico"]:
+        partes.append(f"RSS pico {evento['rss_pico'] / 1024**2:.0f} MB")
+    if evento.get("error"):
+        partes.append(f"error: {evento['error']}")
+    return ", ".join(partes)
+
+
+def sink_log(log):
+    """Sink que escribe cada evento formateado con la función `log` (ej. la GUI)"""
+    return lambda evento: log(f"⏱ {formatear_evento(evento)}")
+
+
+# los procesos hijos heredan el archivo de métricas por variable de entorno
+if os.environ.get(ENV_METRICAS):
+    agregar_sink(SinkJsonl(os.environ[ENV_METRICAS]))
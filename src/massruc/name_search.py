@@ -0,0 +1,221 @@
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from massruc import metrics
+from massruc.ruc_utils import RUC_QUERY_ERRORS, conectar_solo_lectura
+
+# columna del padrón con el nombre o razón social (encabezado normalizado)
+COLUMNA_NOMBRE = "nombre_o_razón_social"
+# las palabras de este largo o más se buscan como prefijo si no hay coincidencias
+LARGO_PREFIJO = 3
+CANDIDATOS = 5
+# filas que se traen del índice por consulta, antes de ordenarlas por similitud
+LIMITE_FTS = 100
+
+HEADER_NOMBRES = [
+    "Nombre buscado",
+    "RUC",
+    "Nombre o razón social",
+    "Estado de contribuyente",
+    "Condición de domicilio",
+    "Similitud",
+]
+
+_TOKENS = re.compile(r"\w+")
+
+
+def tabla_nombres(table_name):
+    return f"{table_name}_nombres"
+
+
+def indice_nombres_disponible(connection, table_name):
+    fila = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (tabla_nombres(table_name),)
+    ).fetchone()
+    return fila is not None
+
+
+def construir_indice_nombres(path_db, table_name="main_table", columna=COLUMNA_NOMBRE):
+    """
+    Crea (o rehace) un índice FTS5 sobre la razón social, sin acentos y con
+    prefijos. Es una tabla sin contenido cuyo rowid es el RUC: los datos se
+    leen luego de la tabla del padrón.
+    """
+    fts = tabla_nombres(table_name)
+    connection = sqlite3.connect(path_db)
+    print("Indexando nombres")
+    start_time = time.time()
+    try:
+        with metrics.medir("indice", tipo="fts5") as span, connection:
+            connection.execute(f"DROP TABLE IF EXISTS {fts}")
+            connection.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5(nombre, content='', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='3')"
+            )
+            span.filas = connection.execute(
+                f'INSERT INTO {fts} (rowid, nombre) SELECT ruc, "{columna}" '
+                f'FROM {table_name} WHERE "{columna}" IS NOT NULL'
+            ).rowcount
+            connection.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    except sqlite3.OperationalError as e:
+        if "fts5" in str(e):
+            raise RuntimeError("Este SQLite no incluye FTS5") from e
+        raise
+    finally:
+        connection.close()
+    print(f"Índice de nombres creado en {round(time.time() - start_time, 2)}s")
+
+
+def normalizar_nombre(nombre):
+    """Palabras del nombre en minúsculas y sin tildes, como las separa el índice"""
+    texto = unicodedata.normalize("NFKD", str(nombre).lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _TOKENS.findall(texto)
+
+
+def _expresion(tokens, operador="AND", prefijo=False, frase=False):
+    """Expresión MATCH con cada palabra entre comillas (sin operadores de FTS5)"""
+    if frase:
+        return '"' + " ".join(tokens) + '"'
+    return f" {operador} ".join(
+        f'"{t}"*' if prefijo and len(t) >= LARGO_PREFIJO else f'"{t}"' for t in tokens
+    )
+
+
+def similitud(tokens, tokens_candidato):
+    """
+    Jaccard entre las palabras buscadas y las del candidato; una palabra
+    buscada también coincide si es prefijo de una del candidato. Solo el
+    nombre idéntico (mismas palabras en el mismo orden) llega a 1.
+    """
+    if not tokens or not tokens_candidato:
+        return 0.0
+    if tokens == tokens_candidato:
+        return 1.0
+    buscadas = set(tokens)
+    candidato = set(tokens_candidato)
+    coinciden = sum(
+        1
+        for t in buscadas
+        if t in candidato
+        or (len(t) >= LARGO_PREFIJO and any(c.startswith(t) for c in candidato))
+    )
+    # varios prefijos pueden coincidir con la misma palabra del candidato
+    coinciden = min(coinciden, len(candidato))
+    return 0.99 * coinciden / (len(buscadas) + len(candidato) - coinciden)
+
+
+class BuscadorNombres:
+    """Consultas por nombre sobre una conexión abierta, con la sentencia preparada"""
+
+    def __init__(self, connection, table_name="main_table", candidatos=CANDIDATOS):
+        if not indice_nombres_disponible(connection, table_name):
+            raise LookupError(
+                "La DB no tiene índice de nombres, use construir_indice_nombres"
+            )
+        fts = tabla_nombres(table_name)
+        self.connection = connection
+        self.candidatos = candidatos
+        consulta = (
+            f"SELECT t.* FROM (SELECT rowid FROM {fts} WHERE {fts} MATCH ? "
+            f"{{}}LIMIT {LIMITE_FTS}) m JOIN {table_name} t ON t.ruc = m.rowid"
+        )
+        # sin ORDER BY rank: calcular bm25 sobre todas las coincidencias de
+        # palabras comunes es lo más caro, y con menos de LIMITE_FTS ya están
+        # todas
+        self.consulta = consulta.format("")
+        # con más, se toman las mejores por bm25 (favorece los nombres cortos
+        # con las palabras buscadas) y no las de RUC más bajo
+        self.consulta_ordenada = consulta.format("ORDER BY rank ")
+        cursor = connection.execute(f"SELECT * FROM {table_name} LIMIT 0")
+        self.pos_nombre = [c[0] for c in cursor.description].index(COLUMNA_NOMBRE)
+
+    def _consultar(self, expresion):
+        filas = self.connection.execute(self.consulta, (expresion,)).fetchall()
+        if len(filas) == LIMITE_FTS:
+            filas = self.connection.execute(
+                self.consulta_ordenada, (expresion,)
+            ).fetchall()
+        return filas
+
+    def buscar(self, nombre):
+        """
+        Devuelve los mejores candidatos como (fila del padrón..., similitud).
+        Primero exige todas las palabras; si no hay resultados, las acepta como
+        prefijo y, por último, basta con que coincida alguna.
+        """
+        tokens = normalizar_nombre(nombre)
+        # las letras sueltas (S.A.C.) no filtran y vuelven lenta la consulta
+        claves = [t for t in tokens if len(t) > 1] or tokens
+        if not claves:
+            return []
+
+        filas = self._consultar(_expresion(claves))
+        if len(filas) == LIMITE_FTS and len(tokens) > 1:
+            # con muchas coincidencias se asegura incluir el nombre exacto
+            filas += self._consultar(_expresion(tokens, frase=True))
+        if not filas:
+            filas = self._consultar(_expresion(claves, prefijo=True))
+        if not filas:
+            filas = self._consultar(_expresion(claves, "OR"))
+
+        unicas = {fila[0]: fila for fila in filas}.values()
+        puntuadas = [
+            (*fila, similitud(tokens, normalizar_nombre(fila[self.pos_nombre])))
+            for fila in unicas
+        ]
+        puntuadas.sort(key=lambda fila: (-fila[-1], fila[0]))
+        return puntuadas[: self.candidatos]
+
+
+def buscar_nombres(
+    nombres, path_db, table_name="main_table", candidatos=CANDIDATOS, workers=4
+):
+    """
+    Busca una lista de nombres o razones sociales en el padrón, con `workers`
+    hilos de conexiones de solo lectura. Devuelve, por cada nombre, la lista
+    de candidatos ordenados por similitud.
+    """
+    local = threading.local()
+    conexiones = []
+    lock = threading.Lock()
+
+    def buscador():
+        if not hasattr(local, "buscador"):
+            connection = conectar_solo_lectura(path_db, check_same_thread=False)
+            with lock:
+                conexiones.append(connection)
+            local.buscador = BuscadorNombres(connection, table_name, candidatos)
+        return local.buscador
+
+    # celdas vacías (None o NaN) se buscan como texto vacío, sin candidatos
+    nombres = ["" if n is None or n != n else str(n) for n in nombres]
+    # los nombres repetidos de una columna se consultan una sola vez
+    unicos = list(dict.fromkeys(nombres))
+    try:
+        with metrics.medir("busqueda_nombres", filas=len(nombres), workers=workers):
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                resultados = dict(
+                    zip(
+                        unicos,
+                        pool.map(lambda n: buscador().buscar(n), unicos),
+                    )
+                )
+    finally:
+        for connection in conexiones:
+            connection.close()
+
+    return [resultados[nombre] for nombre in nombres]
+
+
+def filas_resultado(nombres, resultados):
+    """Una fila por candidato (o una de error si no hubo), según `HEADER_NOMBRES`"""
+    for nombre, candidatos in zip(nombres, resultados):
+        if not candidatos:
+            yield (nombre, "", RUC_QUERY_ERRORS["NOT_FOUND"]["text"], "-", "-", "")
+        for fila in candidatos:
+            yield (nombre, *fila[:-1], round(fila[-1], 3))
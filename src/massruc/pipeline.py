@@ -0,0 +1,227 @@
+import queue
+import threading
+import time
+
+from massruc import metrics
+
+# bloques que pueden esperar entre dos etapas; una etapa lenta frena a las
+# anteriores en lugar de acumular bloques en memoria
+CAPACIDAD_COLA = 2
+# cada cuánto un hilo bloqueado en una cola revisa si debe detenerse
+ESPERA_COLA = 0.1
+
+_FIN = object()
+
+
+class Etapa:
+    """
+    Una etapa del pipeline: aplica `funcion` a cada bloque con `workers` hilos
+    y cuenta bloques, filas y segundos de trabajo (sin contar la espera en las
+    colas), para ver cuál es la etapa más lenta.
+    """
+
+    def __init__(self, nombre, funcion=None, workers=1):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.workers = workers
+        self.bloques = 0
+        self.filas = 0
+        self.segundos = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, filas, segundos):
+        with self._lock:
+            self.bloques += 1
+            self.filas += filas
+            self.segundos += segundos
+
+    @property
+    def filas_por_segundo(self):
+        return round(self.filas / self.segundos, 1) if self.segundos > 0 else None
+
+    def __repr__(self):
+        return f"{self.nombre}: {self.filas} filas en {round(self.segundos, 2)}s"
+
+
+class Pipeline:
+    """
+    Lee los bloques de `fuente` en un hilo y los pasa por `etapas`, cada una en
+    sus propios hilos, unidas por colas acotadas a `capacidad` bloques. El hilo
+    que llama recibe los resultados en el orden de la fuente y los entrega a
+    `destino` (p. ej. la escritura, que debe ser ordenada). SQLite y numpy
+    liberan el GIL, así la lectura, la consulta y la escritura se solapan y el
+    tiempo total se acerca al de la etapa más lenta.
+
+    Con un solo bloque no hay nada que solapar: se procesa en el hilo que
+    llama, sin iniciar hilos. Se usa como context manager: al salir, también
+    por un error o una cancelación, se detienen y esperan todos los hilos. Un
+    error en una etapa se relanza en el hilo que llama. Los eventos de
+    métricas de los hilos se suman a `grupo` (el de `metrics.agrupar`).
+    """
+
+    def __init__(
+        self,
+        fuente,
+        etapas,
+        destino,
+        contar=len,
+        capacidad=CAPACIDAD_COLA,
+        grupo=None,
+    ):
+        self.fuente = fuente
+        self.lectura = Etapa("lectura")
+        self.etapas = list(etapas)
+        self.destino = destino
+        self.contar = contar
+        self.grupo = grupo
+        self._colas = [queue.Queue(capacidad) for _ in range(len(self.etapas) + 1)]
+        self._detener = threading.Event()
+        self._error = None
+        self._hilos = []
+
+    def __enter__(self):
+        self._iterador = iter(self.fuente)
+        # se leen dos bloques para saber si vale la pena iniciar los hilos
+        self._leidos = []
+        while len(self._leidos) < 2:
+            item = self._siguiente()
+            if item is _FIN:
+                self._cerrar_fuente()
+                return self
+            self._leidos.append(item)
+
+        self._iniciar(self._leer)
+        for etapa, entrada, salida in zip(self.etapas, self._colas, self._colas[1:]):
+            activos = [etapa.workers]
+            for _ in range(etapa.workers):
+                self._iniciar(self._trabajar, etapa, entrada, salida, activos)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join()
+
+    @property
+    def contadores(self):
+        """Contadores de todas las etapas, de la lectura al destino"""
+        return [self.lectura, *self.etapas, self.destino]
+
+    def resultados(self):
+        """
+        Entrega cada bloque a `destino` en el orden de la fuente y genera la
+        cantidad de filas de cada uno.
+        """
+        if not self._hilos:
+            for filas, bloque in self._leidos:
+                for etapa in self.etapas:
+                    bloque = self._aplicar(etapa, filas, bloque)
+                self._aplicar(self.destino, filas, bloque)
+                yield filas
+            return
+
+        pendientes = {}
+        siguiente = 0
+        while True:
+            item = self._tomar(self._colas[-1])
+            if item is _FIN:
+                return
+            indice, filas, bloque = item
+            pendientes[indice] = (filas, bloque)
+
+            # las etapas con varios workers pueden terminar fuera de orden
+            while siguiente in pendientes:
+                filas, bloque = pendientes.pop(siguiente)
+                self._aplicar(self.destino, filas, bloque)
+                siguiente += 1
+                yield filas
+
+    def _aplicar(self, etapa, filas, bloque):
+        inicio = time.perf_counter()
+        resultado = etapa.funcion(bloque)
+        etapa.registrar(filas, time.perf_counter() - inicio)
+        return resultado
+
+    def _iniciar(self, funcion, *args):
+        hilo = threading.Thread(target=self._ejecutar, args=(funcion, *args))
+        hilo.daemon = True
+        hilo.start()
+        self._hilos.append(hilo)
+
+    def _ejecutar(self, funcion, *args):
+        try:
+            with metrics.unirse_a_grupo(self.grupo):
+                funcion(*args)
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._detener.set()
+
+    def _poner(self, cola, item):
+        while not self._detener.is_set():
+            try:
+                cola.put(item, timeout=ESPERA_COLA)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _tomar(self, cola):
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                return cola.get(timeout=ESPERA_COLA)
+            except queue.Empty:
+                if self._detener.is_set() and self._error is None:
+                    return _FIN
+
+    def _siguiente(self):
+        """(filas, bloque) siguiente de la fuente, o _FIN"""
+        inicio = time.perf_counter()
+        bloque = next(self._iterador, _FIN)
+        if bloque is _FIN:
+            return _FIN
+        filas = self.contar(bloque)
+        self.lectura.registrar(filas, time.perf_counter() - inicio)
+        return filas, bloque
+
+    def _cerrar_fuente(self):
+        # cierra el archivo de entrada también si se detuvo a la mitad
+        cerrar = getattr(self._iterador, "close", None)
+        if cerrar:
+            cerrar()
+
+    def _leer(self):
+        try:
+            indice = 0
+            while not self._detener.is_set():
+                # primero los bloques leídos en __enter__, sin retenerlos
+                item = self._leidos.pop(0) if self._leidos else self._siguiente()
+                if item is _FIN:
+                    break
+                filas, bloque = item
+                if not self._poner(self._colas[0], (indice, filas, bloque)):
+                    return
+                indice += 1
+            self._poner(self._colas[0], _FIN)
+        finally:
+            self._cerrar_fuente()
+
+    def _trabajar(self, etapa, entrada, salida, activos):
+        while True:
+            item = self._tomar(entrada)
+            if item is _FIN:
+                # avisa a los demás workers; el último avisa a la etapa siguiente
+                self._poner(entrada, _FIN)
+                with etapa._lock:
+                    activos[0] -= 1
+                    ultimo = activos[0] == 0
+                if ultimo:
+                    self._poner(salida, _FIN)
+                return
+
+            indice, filas, bloque = item
+            resultado = self._aplicar(etapa, filas, bloque)
+            if not self._poner(salida, (indice, filas, resultado)):
+                return
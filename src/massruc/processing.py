@@ -0,0 +1,198 @@
+import os
+from functools import partial
+
+import pandas as pd
+
+from massruc import deteccion, metrics, ruc_index, ruc_utils
+from massruc.cache_resultados import (
+    BLOQUE_CACHE,
+    CacheResultados,
+    clave_bloque,
+    identidad_padron,
+    partir_bloque,
+)
+from massruc.columnar_export import (
+    ExportadorCsv,
+    ExportadorFeather,
+    ExportadorParquet,
+)
+from massruc.excel_export import ExportadorExcel
+from massruc.file_reader import CHUNK_FILAS, estimar_filas, iter_documentos
+from massruc.pipeline import Etapa, Pipeline
+from massruc.progreso import como_progreso
+
+# hilos de la etapa de limpieza; la consulta y la escritura usan uno cada una
+WORKERS_LIMPIEZA = 2
+
+# el formato de salida se elige por la extensión del archivo
+FORMATOS_SALIDA = {
+    ".xlsx": ExportadorExcel,
+    ".csv": ExportadorCsv,
+    ".parquet": ExportadorParquet,
+    ".feather": ExportadorFeather,
+}
+
+
+def nombre_salida_para(archivo_input, extension=".xlsx"):
+    return os.path.splitext(archivo_input)[0] + "_PROCESADO" + extension
+
+
+def crear_exportador(nombre_salida, **kwargs):
+    extension = os.path.splitext(os.fspath(nombre_salida))[1].lower()
+    if extension not in FORMATOS_SALIDA:
+        raise ValueError(f"Formato de salida no soportado: {extension}")
+    return FORMATOS_SALIDA[extension](nombre_salida, **kwargs)
+
+
+def elegir_backend(path_db):
+    """Usa el índice mapeado en memoria si está al día con la DB"""
+    return "mmap" if ruc_index.indice_vigente(path_db) else "sqlite"
+
+
+def preparar_bloque(documentos, path_db, cache=None, identidad=None, bloque=None):
+    """
+    Etapa de limpieza, sin tocar la DB. Con `cache`, los sub-bloques (de unas
+    `bloque` filas, cortados según su contenido) ya consultados con la misma
+    versión del padrón salen de la caché y solo los nuevos o editados se
+    limpian y pasan a la consulta.
+    """
+    preparado = {"documentos": documentos, "consulta": documentos}
+    if cache is not None:
+        partes = partir_bloque(documentos, bloque or BLOQUE_CACHE)
+        claves = [clave_bloque(identidad, parte) for parte in partes]
+        with metrics.medir("cache") as span:
+            encontrados = cache.obtener(claves)
+            span.filas = sum(len(filas) for filas in encontrados.values())
+        faltantes = [i for i, clave in enumerate(claves) if clave not in encontrados]
+        preparado.update(
+            partes=partes, claves=claves, encontrados=encontrados, faltantes=faltantes
+        )
+        preparado["consulta"] = pd.concat(
+            [documentos.iloc[:0]] + [partes[i] for i in faltantes], ignore_index=True
+        )
+
+    if len(preparado["consulta"]):
+        preparado["limpios"], preparado["enteros"] = ruc_utils.preparar_consulta(
+            preparado["consulta"], path_db
+        )
+    return preparado
+
+
+def consultar_bloque(preparado, path_db, table_name, backend, cache=None):
+    """Etapa de consulta: devuelve las filas de resultado de todo el bloque"""
+    consulta = preparado["consulta"]
+    resultados = []
+    if len(consulta):
+        resultados = ruc_utils.completar_consulta(
+            consulta,
+            preparado["limpios"],
+            preparado["enteros"],
+            path_db,
+            table_name,
+            backend,
+        )
+        if not resultados:
+            raise RuntimeError("No se pudo consultar la base de datos")
+    if cache is None:
+        return resultados
+
+    claves, partes = preparado["claves"], preparado["partes"]
+    encontrados = preparado["encontrados"]
+    nuevos = {}
+    inicio = 0
+    for i in preparado["faltantes"]:
+        nuevos[claves[i]] = resultados[inicio : inicio + len(partes[i])]
+        inicio += len(partes[i])
+    if nuevos:
+        cache.guardar(nuevos)
+    encontrados.update(nuevos)
+    return [fila for clave in claves for fila in encontrados[clave]]
+
+
+def procesar_archivo(
+    archivo_input,
+    path_db,
+    table_name="main_table",
+    nombre_salida=None,
+    columna=None,
+    chunk_size=CHUNK_FILAS,
+    backend=None,
+    log=print,
+    progress_callback=None,
+    cache=None,
+    formato="xlsx",
+    hoja=None,
+):
+    """
+    Lee el archivo por bloques, valida cada bloque y lo escribe en la salida.
+    La memoria usada depende de `chunk_size`, no del tamaño del archivo.
+    Devuelve la ruta de salida y la cantidad de filas procesadas. Si se cancela
+    el `Progreso` recibido, no se guarda la salida. Con `cache` (ruta de una
+    `CacheResultados`) los bloques ya validados con el mismo padrón no se
+    vuelven a consultar. El formato (xlsx, csv, parquet o feather) sale de la
+    extensión de `nombre_salida` o, si no se indica, de `formato`. Sin
+    `columna`, la de documentos se detecta entre las columnas de `hoja` o, si
+    tampoco se indica, de todas las hojas.
+    """
+    progreso = como_progreso(progress_callback)
+    nombre_salida = nombre_salida or nombre_salida_para(archivo_input, "." + formato)
+    backend = backend or elegir_backend(path_db)
+    if columna is None:
+        hoja, columna, puntaje = deteccion.detectar_columna(archivo_input, hoja=hoja)
+        en_hoja = f" de la hoja '{hoja}'" if hoja else ""
+        log(f"Columna detectada: '{columna}'{en_hoja} ({puntaje:.0%} de coincidencia)")
+    total_estimado = estimar_filas(archivo_input, hoja)
+    total_filas = 0
+    cache_resultados = CacheResultados(cache) if cache else None
+    identidad = identidad_padron(path_db, table_name) if cache else None
+
+    log(f"Leyendo: {os.path.basename(archivo_input)}")
+    try:
+        # los eventos de cada bloque se juntan en uno por etapa para todo el archivo
+        with metrics.agrupar() as grupo, crear_exportador(nombre_salida) as exportador:
+            lectura = metrics.medir_iteracion(
+                "lectura",
+                iter_documentos(archivo_input, columna, chunk_size, hoja),
+                contar=len,
+                bytes=os.path.getsize(archivo_input),
+                archivo=os.path.basename(archivo_input),
+            )
+            # lectura, limpieza, consulta y escritura se solapan entre bloques
+            etapas = [
+                Etapa(
+                    "limpieza",
+                    partial(
+                        preparar_bloque,
+                        path_db=path_db,
+                        cache=cache_resultados,
+                        identidad=identidad,
+                    ),
+                    workers=WORKERS_LIMPIEZA,
+                ),
+                Etapa(
+                    "consulta",
+                    partial(
+                        consultar_bloque,
+                        path_db=path_db,
+                        table_name=table_name,
+                        backend=backend,
+                        cache=cache_resultados,
+                    ),
+                ),
+            ]
+            escritura = Etapa("escritura", exportador.escribir_filas)
+            with Pipeline(lectura, etapas, escritura, grupo=grupo) as flujo:
+                for filas in flujo.resultados():
+                    total_filas += filas
+                    log(f"{total_filas} registros analizados...")
+
+                    if total_estimado:
+                        progreso.reportar(total_filas / total_estimado)
+                    else:
+                        progreso.verificar()
+            log(" | ".join(map(repr, flujo.contadores)))
+    finally:
+        if cache_resultados:
+            cache_resultados.cerrar()
+
+    return nombre_salida, total_filas
@@ -0,0 +1,62 @@
+import threading
+import time
+
+# como máximo una actualización de progreso cada tantos segundos
+INTERVALO_PROGRESO = 0.1
+
+
+class OperacionCancelada(Exception):
+    """La operación se detuvo porque se pidió cancelarla"""
+
+
+class Progreso:
+    """
+    Token compartido entre la interfaz y una operación larga (descarga,
+    sanitizado, ingesta o consulta). Limita la frecuencia con que se llama a
+    `callback` y permite cancelar: la operación lanza `OperacionCancelada` en
+    su siguiente reporte o verificación. Se puede usar desde varios hilos.
+    """
+
+    def __init__(self, callback=None, intervalo=INTERVALO_PROGRESO):
+        self.callback = callback
+        self.intervalo = intervalo
+        self._cancelado = threading.Event()
+        self._lock = threading.Lock()
+        self._ultimo = float("-inf")
+
+    def cancelar(self):
+        self._cancelado.set()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    def verificar(self):
+        if self._cancelado.is_set():
+            raise OperacionCancelada("Operación cancelada")
+
+    def reportar(self, fraccion):
+        """Informa el avance (0 a 1); el inicio y el final siempre se informan"""
+        self.verificar()
+        if self.callback is None:
+            return
+
+        fraccion = min(max(fraccion, 0.0), 1.0)
+        ahora = time.monotonic()
+        with self._lock:
+            if fraccion not in (0.0, 1.0) and ahora - self._ultimo < self.intervalo:
+                return
+            self._ultimo = ahora
+        self.callback(fraccion)
+
+    __call__ = reportar
+
+
+def como_progreso(progress_callback):
+    """
+    Acepta un `Progreso` o un callable simple (que se envuelve para limitar su
+    frecuencia), así las funciones siguen recibiendo `progress_callback`.
+    """
+    if isinstance(progress_callback, Progreso):
+        return progress_callback
+    return Progreso(progress_callback)
@@ -0,0 +1,319 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from massruc import metrics
+
+# separa los campos de cada registro dentro del blob
+SEPARADOR_CAMPOS = "\x1f"
+# marca los campos NULL de la DB
+CAMPO_NULO = "\x00"
+
+
+def rutas_indice(path_db):
+    base = os.fspath(path_db)
+    return {
+        "claves": base + ".keys.npy",
+        "offsets": base + ".offsets.npy",
+        "datos": base + ".data.bin",
+        "meta": base + ".index.json",
+    }
+
+
+def _firma_db(path_db):
+    stat = os.stat(path_db)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def indice_vigente(path_db):
+    """Indica si existe un índice construido para el estado actual de la DB"""
+    rutas = rutas_indice(path_db)
+    if not all(os.path.exists(ruta) for ruta in rutas.values()):
+        return False
+
+    with open(rutas["meta"], encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta["firma_db"] == _firma_db(path_db)
+
+
+def eliminar_indice(path_db):
+    for ruta in rutas_indice(path_db).values():
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+@contextmanager
+def _temporales(rutas):
+    """Rutas .tmp donde se arman los archivos; si algo falla no quedan a medias"""
+    temporales = {clave: ruta + ".tmp" for clave, ruta in rutas.items()}
+    try:
+        yield temporales
+    except BaseException:
+        for ruta in temporales.values():
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        raise
+
+
+def construir_indice(path_db, table_name="main_table", fetch_size=50000):
+    """
+    Genera, a partir de la DB, un arreglo ordenado de RUCs (int64) y un blob con
+    los registros empaquetados, para consultarlos luego con memoria mapeada.
+    """
+    rutas = rutas_indice(path_db)
+    with (
+        metrics.medir("indice", tipo="mmap") as span,
+        _temporales(rutas) as temporales,
+    ):
+        con = sqlite3.connect(path_db)
+        try:
+            total = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+            claves = np.lib.format.open_memmap(
+                temporales["claves"], mode="w+", dtype=np.int64, shape=(total,)
+            )
+            offsets = np.lib.format.open_memmap(
+                temporales["offsets"], mode="w+", dtype=np.int64, shape=(total + 1,)
+            )
+            offsets[0] = 0
+
+            cursor = con.execute(f"SELECT * FROM {table_name} ORDER BY ruc")
+            columnas = [c[0] for c in cursor.description]
+
+            i = 0
+            with open(temporales["datos"], "wb") as datos:
+                while filas := cursor.fetchmany(fetch_size):
+                    for fila in filas:
+                        registro = SEPARADOR_CAMPOS.join(
+                            CAMPO_NULO if v is None else str(v) for v in fila[1:]
+                        ).encode("utf-8")
+                        datos.write(registro)
+                        claves[i] = fila[0]
+                        offsets[i + 1] = offsets[i] + len(registro)
+                        i += 1
+
+            claves.flush()
+            offsets.flush()
+            del claves, offsets
+        finally:
+            con.close()
+
+        with open(temporales["meta"], "w", encoding="utf-8") as f:
+            json.dump(
+                {"columnas": columnas, "filas": total, "firma_db": _firma_db(path_db)},
+                f,
+            )
+
+        # el metadato se mueve al final, cuando el resto del índice ya es consistente
+        for clave in ("claves", "offsets", "datos", "meta"):
+            os.replace(temporales[clave], rutas[clave])
+
+
+class IndiceRuc:
+    """Índice de solo lectura sobre los archivos generados por `construir_indice`"""
+
+    def __init__(self, path_db):
+        rutas = rutas_indice(path_db)
+        with open(rutas["meta"], encoding="utf-8") as f:
+            self.columnas = json.load(f)["columnas"]
+
+        self.claves = np.load(rutas["claves"], mmap_mode="r")
+        self.offsets = np.load(rutas["offsets"], mmap_mode="r")
+        # np.memmap no admite archivos vacíos
+        if os.path.getsize(rutas["datos"]):
+            self.datos = np.memmap(rutas["datos"], dtype=np.uint8, mode="r")
+        else:
+            self.datos = np.zeros(0, dtype=np.uint8)
+
+    def posiciones(self, rucs):
+        """Búsqueda binaria vectorizada: devuelve las posiciones y los hallados"""
+        rucs = np.asarray(rucs, dtype=np.int64)
+        pos = np.searchsorted(self.claves, rucs)
+        if not len(self.claves):
+            return pos, np.zeros(len(rucs), dtype=bool)
+
+        encontrados = self.claves[np.minimum(pos, len(self.claves) - 1)] == rucs
+        return pos, encontrados & (pos < len(self.claves))
+
+    def fila(self, pos):
+        registro = bytes(self.datos[self.offsets[pos] : self.offsets[pos + 1]])
+        campos = registro.decode("utf-8").split(SEPARADOR_CAMPOS)
+        return (int(self.claves[pos]),) + tuple(
+            None if campo == CAMPO_NULO else campo for campo in campos
+        )
+
+    def buscar(self, rucs):
+        """Devuelve un dict ruc -> fila, con las mismas tuplas que daría la DB"""
+        rucs = np.unique(np.asarray(rucs, dtype=np.int64))
+        pos, encontrados = self.posiciones(rucs)
+        return {
+            int(ruc): self.fila(p)
+            for ruc, p in zip(rucs[encontrados], pos[encontrados])
+        }
+
+
+@lru_cache(maxsize=4)
+def _cargar_indice(path_db, firma):
+    return IndiceRuc(path_db)
+
+
+def cargar_indice(path_db):
+    """Abre (o reutiliza) el índice de la DB, None si no existe o está desfasado"""
+    if not indice_vigente(path_db):
+        return None
+    firma = os.stat(rutas_indice(path_db)["claves"]).st_mtime_ns
+    return _cargar_indice(os.path.abspath(path_db), firma)
+
+
+def rutas_bitmap(path_db):
+    base = os.fspath(path_db)
+    return {"bits": base + ".bitmap.npy", "meta": base + ".bitmap.json"}
+
+
+def bitmap_vigente(path_db):
+    """Indica si existe un bitmap de RUCs construido para el estado actual de la DB"""
+    rutas = rutas_bitmap(path_db)
+    if not all(os.path.exists(ruta) for ruta in rutas.values()):
+        return False
+
+    with open(rutas["meta"], encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta["firma_db"] == _firma_db(path_db)
+
+
+def eliminar_bitmap(path_db):
+    for ruta in rutas_bitmap(path_db).values():
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def _base_ruc(rucs):
+    """RUC sin el dígito verificador, que se deduce de los 10 primeros dígitos"""
+    return np.asarray(rucs, dtype=np.int64) // 10
+
+
+def construir_bitmap(path_db, table_name="main_table", fetch_size=200000):
+    """
+    Genera un bitmap exacto de los RUCs de la DB: un bit por cada RUC posible
+    (sin el dígito verificador), en un tramo por prefijo (10, 20, ...) que
+    cubre solo del menor al mayor RUC existente de ese prefijo.
+    """
+    rutas = rutas_bitmap(path_db)
+    with (
+        metrics.medir("indice", tipo="bitmap") as span,
+        _temporales(rutas) as temporales,
+    ):
+        con = sqlite3.connect(path_db)
+        try:
+            tramos, total_bits = _tramos_bitmap(con, table_name)
+            # el primer bit de cada byte es el mayor, como en np.packbits
+            bits = np.lib.format.open_memmap(
+                temporales["bits"],
+                mode="w+",
+                dtype=np.uint8,
+                shape=((total_bits + 7) // 8,),
+            )
+
+            cursor = con.cursor()
+            cursor.row_factory = lambda _, fila: fila[0]
+            cursor.execute(f"SELECT ruc FROM {table_name}")
+            while filas := cursor.fetchmany(fetch_size):
+                rucs = np.array(filas, dtype=np.int64)
+                posiciones = _posiciones_bitmap(tramos, rucs)
+                np.bitwise_or.at(
+                    bits, posiciones >> 3, (128 >> (posiciones & 7)).astype(np.uint8)
+                )
+                span.filas += len(rucs)
+
+            bits.flush()
+            del bits
+        finally:
+            con.close()
+
+        with open(temporales["meta"], "w", encoding="utf-8") as f:
+            json.dump({"tramos": tramos, "firma_db": _firma_db(path_db)}, f)
+
+        for clave in ("bits", "meta"):
+            os.replace(temporales[clave], rutas[clave])
+
+
+def _tramos_bitmap(con, table_name):
+    """
+    Un tramo [prefijo, bit inicial, base menor, base mayor] por prefijo de RUC.
+    Se salta de prefijo en prefijo con búsquedas en el índice de RUC.
+    """
+    tramos = []
+    inicio = 0
+    desde = 0
+    while True:
+        (menor,) = con.execute(
+            f"SELECT MIN(ruc) FROM {table_name} WHERE ruc >= ?", (desde,)
+        ).fetchone()
+        if menor is None:
+            return tramos, inicio
+
+        prefijo = menor // 10**9
+        desde = (prefijo + 1) * 10**9
+        (mayor,) = con.execute(
+            f"SELECT MAX(ruc) FROM {table_name} WHERE ruc < ?", (desde,)
+        ).fetchone()
+        tramos.append([prefijo, inicio, menor // 10, mayor // 10])
+        inicio += mayor // 10 - menor // 10 + 1
+
+
+def _posiciones_bitmap(tramos, rucs):
+    """Posición del bit de cada RUC, -1 si queda fuera de todos los tramos"""
+    tramos = np.asarray(tramos, dtype=np.int64).reshape(-1, 4)
+    base = _base_ruc(rucs)
+    if not len(tramos):
+        return np.full(len(base), -1, dtype=np.int64)
+
+    # el prefijo es la base sin sus últimos 8 dígitos
+    prefijos = base // 10**8
+    i = np.minimum(np.searchsorted(tramos[:, 0], prefijos), len(tramos) - 1)
+    prefijo, inicio, minimo, maximo = tramos[i].T
+    dentro = (prefijo == prefijos) & (base >= minimo) & (base <= maximo)
+    return np.where(dentro, inicio + base - minimo, -1)
+
+
+class BitmapRuc:
+    """Bitmap de solo lectura generado por `construir_bitmap`"""
+
+    def __init__(self, path_db):
+        rutas = rutas_bitmap(path_db)
+        with open(rutas["meta"], encoding="utf-8") as f:
+            self.tramos = json.load(f)["tramos"]
+        self.bits = np.load(rutas["bits"], mmap_mode="r")
+
+    def contiene(self, rucs):
+        """Máscara de los RUCs que pueden estar en la DB; los False no están"""
+        posiciones = _posiciones_bitmap(self.tramos, rucs)
+        dentro = posiciones >= 0
+        posiciones = np.where(dentro, posiciones, 0)
+        if not len(self.bits):
+            return np.zeros(len(posiciones), dtype=bool)
+        bytes_ = self.bits[posiciones >> 3]
+        return dentro & ((bytes_ & (128 >> (posiciones & 7))) != 0)
+
+    def filtrar(self, rucs_enteros):
+        """Solo los RUCs que pueden estar en la DB, en el mismo orden"""
+        if not rucs_enteros:
+            return []
+        rucs = np.asarray(rucs_enteros, dtype=np.int64)
+        return rucs[self.contiene(rucs)].tolist()
+
+
+@lru_cache(maxsize=4)
+def _cargar_bitmap(path_db, firma):
+    return BitmapRuc(path_db)
+
+
+def cargar_bitmap(path_db):
+    """Abre (o reutiliza) el bitmap de la DB, None si no existe o está desfasado"""
+    if not bitmap_vigente(path_db):
+        return None
+    firma = os.stat(rutas_bitmap(path_db)["bits"]).st_mtime_ns
+    return _cargar_bitmap(os.path.abspath(path_db), firma)
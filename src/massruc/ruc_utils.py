@@ -1,48 +1,279 @@
+import json
+import os
+import pathlib
 import sqlite3
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from rich.progress import Progress
 
+from massruc import metrics, ruc_index
+from massruc.progreso import como_progreso
+
+FACTORES_RUC = np.array([5, 4, 3, 2, 7, 6, 5, 4, 3, 2])
 URL_PADRON = "https://www.sunat.gob.pe/descargaPRR/padron_reducido_ruc.zip"
+CHUNK_DESCARGA = 1024 * 1024
+PIEZA_DESCARGA = 16 * 1024 * 1024
+TIMEOUT_DESCARGA = 60
+MMAP_SIZE = 1024**3
 RUC_QUERY_ERRORS = {
     "NOT_FOUND": {"text": "NO SE ENCONTRÓ", "color": "#FFC052".removeprefix("#")},
     "INVALID_FORMAT": {"text": "RUC INVÁLIDO", "color": "#FF5252".removeprefix("#")},
 }
 
 
-def descargar_padron_reducido(output_file, progress_callback=None):
-    response = requests.get(URL_PADRON, stream=True)
-    total_length = int(response.headers.get("content-length", 0))
-    dl = 0
-    with open(output_file, "wb") as f:
-        bar = Progress()
-        bar.start()
-        tarea = bar.add_task("Descargando padrón", total=1)
-        for data in response.iter_content(chunk_size=4096):
-            dl += len(data)
-            f.write(data)
-            if total_length:
-                porcentaje = dl / total_length
-                bar.update(tarea, completed=porcentaje)
-                progress_callback(porcentaje) if progress_callback else None
-        bar.update(tarea, completed=1)
-        bar.stop()
-
-
-def buscar_rucs(lista_rucs, path_db, table_name="main_table"):
+def _leer_metadatos(ruta):
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_metadatos(ruta, datos):
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def crear_sesion(conexiones=8):
+    """Sesión HTTP con un pool de conexiones reutilizables"""
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max(conexiones, 1))
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+
+def _verificar_zip(ruta, tamano_esperado):
+    if tamano_esperado and os.path.getsize(ruta) != tamano_esperado:
+        raise IOError(
+            f"Descarga incompleta: {os.path.getsize(ruta)} de {tamano_esperado} bytes"
+        )
+    if not zipfile.is_zipfile(ruta):
+        raise IOError("El archivo descargado no es un ZIP válido")
+    with zipfile.ZipFile(ruta) as z:
+        if not z.infolist():
+            raise IOError("El ZIP descargado está vacío")
+
+
+def _descargar_secuencial(sesion, url, parcial, meta_parcial, headers, avanzar):
+    """Descarga en un solo flujo, retomando el archivo parcial si es posible"""
+    descargado = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    validador = meta_parcial.get("etag") or meta_parcial.get("last_modified")
+    # un parcial de la descarga paralela tiene huecos, no se puede continuar al final
+    if descargado and validador and "piezas_completas" not in meta_parcial:
+        headers = headers | {"Range": f"bytes={descargado}-", "If-Range": validador}
+
+    response = sesion.get(url, headers=headers, stream=True, timeout=TIMEOUT_DESCARGA)
+    with response:
+        if response.status_code == 304:
+            return None
+        if response.status_code == 416 and meta_parcial.get("size") == descargado:
+            # el parcial ya estaba completo
+            return meta_parcial
+        response.raise_for_status()
+
+        largo = int(response.headers.get("content-length", 0))
+        if response.status_code == 206:
+            total = descargado + largo if largo else 0
+            modo = "ab"
+        else:
+            descargado, total, modo = 0, largo, "wb"
+
+        meta = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "size": total,
+        }
+        _guardar_metadatos(parcial + ".json", meta)
+
+        avanzar(descargado, total)
+        with open(parcial, modo) as f:
+            for data in response.iter_content(chunk_size=CHUNK_DESCARGA):
+                f.write(data)
+                avanzar(len(data), total)
+
+    return meta
+
+
+def _descargar_paralelo(sesion, url, parcial, meta, workers, avanzar):
     """
-    Recibe una lista de rucs:str, verifica si son validos y los busca en la base de datos.
-    Devuelve la lista original completa, seguida de la versión limpia de cada ruc, si es que hubiera, y la información extraída de la DB
+    Descarga el archivo por rangos de bytes en paralelo sobre la misma sesión.
+    Las piezas completas se registran en los metadatos parciales para retomar.
+    """
+    total = meta["size"]
+    validador = meta.get("etag") or meta.get("last_modified")
+    completas = set(meta.get("piezas_completas", []))
+    piezas = [
+        (inicio, min(inicio + PIEZA_DESCARGA, total) - 1)
+        for inicio in range(0, total, PIEZA_DESCARGA)
+    ]
+    lock = threading.Lock()
+
+    if not os.path.exists(parcial) or os.path.getsize(parcial) != total:
+        completas.clear()
+        with open(parcial, "wb") as f:
+            f.truncate(total)
+
+    def descargar_pieza(pieza):
+        inicio, fin = pieza
+        headers = {"Range": f"bytes={inicio}-{fin}"}
+        if validador:
+            headers["If-Range"] = validador
+        with sesion.get(
+            url, headers=headers, stream=True, timeout=TIMEOUT_DESCARGA
+        ) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError("El servidor no respetó el rango, el archivo cambió")
+            with open(parcial, "r+b") as f:
+                f.seek(inicio)
+                for data in response.iter_content(chunk_size=CHUNK_DESCARGA):
+                    f.write(data)
+                    with lock:
+                        avanzar(len(data), total)
+        with lock:
+            completas.add(inicio)
+            _guardar_metadatos(
+                parcial + ".json", meta | {"piezas_completas": sorted(completas)}
+            )
+
+    avanzar(
+        sum(fin - inicio + 1 for inicio, fin in piezas if inicio in completas), total
+    )
+    pendientes = [pieza for pieza in piezas if pieza[0] not in completas]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futuros = [pool.submit(descargar_pieza, pieza) for pieza in pendientes]
+        try:
+            for futuro in futuros:
+                futuro.result()
+        except BaseException:
+            # ante un error o cancelación no se empiezan las piezas pendientes
+            pool.shutdown(cancel_futures=True)
+            raise
+
+
+def descargar_padron_reducido(
+    output_file, progress_callback=None, url=URL_PADRON, workers=1, session=None
+):
     """
-    rucs_enteros = [int(ruc) for ruc in limpiar_rucs(lista_rucs)]
+    Descarga el padrón solo si cambió, usando el ETag/Last-Modified guardado junto
+    al archivo. Retoma descargas parciales con Range y, con `workers` > 1, baja
+    rangos en paralelo. Verifica tamaño e integridad del ZIP antes de reemplazarlo.
+    Devuelve True si se descargó un archivo nuevo, False si no hubo cambios.
+    `progress_callback` puede ser un `Progreso`: al cancelarlo se lanza
+    `OperacionCancelada` y el parcial queda para retomar la descarga.
+    """
+    output_file = os.fspath(output_file)
+    parcial = output_file + ".part"
+    ruta_meta = output_file + ".json"
+
+    meta_actual = _leer_metadatos(ruta_meta) if os.path.exists(output_file) else {}
+    headers = {}
+    if meta_actual.get("etag"):
+        headers["If-None-Match"] = meta_actual["etag"]
+    if meta_actual.get("last_modified"):
+        headers["If-Modified-Since"] = meta_actual["last_modified"]
+
+    meta_parcial = _leer_metadatos(parcial + ".json")
+    sesion = session or crear_sesion(workers)
+    progreso = como_progreso(progress_callback)
+    # la barra de terminal solo se muestra si nadie más informa el avance
+    bar = Progress() if progreso.callback is None else None
+    if bar:
+        bar.start()
+        tarea = bar.add_task("Descargando padrón", total=1)
+    dl = 0
+
+    def avanzar(cantidad, total_length):
+        nonlocal dl
+        dl += cantidad
+        if not total_length:
+            progreso.verificar()
+            return
+        porcentaje = dl / total_length
+        if bar:
+            bar.update(tarea, completed=porcentaje)
+        progreso.reportar(porcentaje)
+
+    with metrics.medir("descarga", url=url, workers=workers) as span:
+        try:
+            meta = None
+            if workers > 1:
+                # se consulta primero el tamaño y si el servidor acepta rangos
+                response = sesion.head(url, headers=headers, timeout=TIMEOUT_DESCARGA)
+                if response.status_code == 304:
+                    return False
+
+                # un servidor que rechaza HEAD (405, 403, 501) se descarga en serie
+                total = int(response.headers.get("content-length", 0))
+                rangos = response.headers.get("accept-ranges") == "bytes"
+                if response.ok and rangos and total:
+                    meta = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "size": total,
+                    }
+                    if {k: meta_parcial.get(k) for k in meta} == meta:
+                        meta = meta_parcial
+                    _guardar_metadatos(parcial + ".json", meta)
+                    _descargar_paralelo(sesion, url, parcial, meta, workers, avanzar)
+
+            if meta is None:
+                meta = _descargar_secuencial(
+                    sesion, url, parcial, meta_parcial, headers, avanzar
+                )
+                if meta is None:
+                    return False
+
+            try:
+                _verificar_zip(parcial, meta["size"])
+            except IOError:
+                # un parcial corrupto no debe retomarse en el siguiente intento
+                os.remove(parcial)
+                os.remove(parcial + ".json")
+                raise
+
+            os.replace(parcial, output_file)
+            meta.pop("piezas_completas", None)
+            _guardar_metadatos(ruta_meta, meta)
+            os.remove(parcial + ".json")
+            return True
+
+        finally:
+            span.bytes = dl
+            if bar:
+                bar.update(tarea, completed=1)
+                bar.stop()
+            if session is None:
+                sesion.close()
+
+
+def conectar_solo_lectura(path_db, mmap_size=MMAP_SIZE, check_same_thread=True):
+    """Conexión de solo lectura con lectura por mmap, para servicios de consulta"""
+    uri = pathlib.Path(path_db).resolve().as_uri() + "?mode=ro"
+    con = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread)
+    con.execute("PRAGMA query_only = ON")
+    con.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    return con
+
+
+def consultar_rucs(con, rucs_enteros, table_name):
+    """Consulta los RUCs en lotes `IN (...)` sobre una conexión abierta"""
     CHUNK_SQL_SIZE = 900
 
     db_cache = {}
-
-    con = sqlite3.connect(path_db)
     cursor = con.cursor()
-    num_columnas = 0
     try:
+        # las columnas se conocen aunque ningún RUC del lote sea válido
+        cursor.execute(f"SELECT * FROM {table_name} LIMIT 0")
+        num_columnas = len(cursor.description)
+
         for i in range(0, len(rucs_enteros), CHUNK_SQL_SIZE):
             lote = rucs_enteros[i : i + CHUNK_SQL_SIZE]
 
@@ -52,23 +283,145 @@ def buscar_rucs(lista_rucs, path_db, table_name="main_table"):
             cursor.execute(consulta, lote)
             filas = cursor.fetchall()
 
-            if num_columnas == 0 and cursor.description:
-                num_columnas = len(cursor.description)
+            for fila in filas:
+                db_cache[fila[0]] = fila
+
+    finally:
+        cursor.close()
+
+    return db_cache, num_columnas
+
+
+def _consultar_sqlite(rucs_enteros, path_db, table_name):
+    """Consulta los RUCs en lotes `IN (...)`, devuelve el dict ruc -> fila"""
+    con = sqlite3.connect(path_db)
+    try:
+        return consultar_rucs(con, rucs_enteros, table_name)
+    finally:
+        con.close()
+
+
+def _consultar_sqlite_join(rucs_enteros, path_db, table_name):
+    """
+    Carga los RUCs únicos en una tabla temporal y los resuelve con un solo join
+    indexado, leyendo las filas por bloques.
+    """
+    FETCH_SIZE = 5000
 
+    db_cache = {}
+
+    con = sqlite3.connect(path_db)
+    try:
+        con.execute("CREATE TEMP TABLE consulta (ruc INTEGER PRIMARY KEY)")
+        # ordenados, la inserción en la tabla temporal es secuencial
+        con.executemany(
+            "INSERT INTO consulta VALUES (?)",
+            (
+                (ruc,)
+                for ruc in np.unique(np.asarray(rucs_enteros, dtype=np.int64)).tolist()
+            ),
+        )
+
+        cursor = con.execute(
+            f"SELECT t.* FROM consulta c JOIN {table_name} t ON t.ruc = c.ruc"
+        )
+        num_columnas = len(cursor.description)
+
+        while filas := cursor.fetchmany(FETCH_SIZE):
             for fila in filas:
                 db_cache[fila[0]] = fila
 
+    finally:
+        con.close()
+
+    return db_cache, num_columnas
+
+
+def _consultar_mmap(rucs_enteros, path_db, table_name):
+    """
+    Consulta los RUCs en el índice mapeado en memoria generado junto a la DB.
+    Si el índice no existe o es de una versión anterior de la DB, consulta
+    SQLite para no devolver estados viejos.
+    """
+    indice = ruc_index.cargar_indice(path_db)
+    if indice is None:
+        print("Índice mmap ausente o desfasado, se consulta la DB")
+        return _consultar_sqlite(rucs_enteros, path_db, table_name)
+    return indice.buscar(rucs_enteros), len(indice.columnas)
+
+
+BACKENDS = {
+    "sqlite": _consultar_sqlite,
+    "sqlite_join": _consultar_sqlite_join,
+    "mmap": _consultar_mmap,
+}
+
+
+def buscar_rucs(
+    lista_rucs, path_db, table_name="main_table", backend="sqlite", prefiltro=True
+):
+    """
+    Recibe una lista de rucs:str, verifica si son validos y los busca en la base de datos.
+    Devuelve la lista original completa, seguida de la versión limpia de cada ruc, si es que hubiera, y la información extraída de la DB
+
+    `backend` puede ser "sqlite" (lotes IN), "sqlite_join" (tabla temporal sin
+    duplicados) o "mmap" (requiere `ruc_index.construir_indice`). Con
+    `prefiltro`, si hay un bitmap vigente (`ruc_index.construir_bitmap`), los
+    RUCs que no están en el padrón se descartan sin consultar la DB.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend}")
+
+    rucs_limpios, rucs_enteros = preparar_consulta(lista_rucs, path_db, prefiltro)
+    return completar_consulta(
+        lista_rucs, rucs_limpios, rucs_enteros, path_db, table_name, backend
+    )
+
+
+def preparar_consulta(lista_rucs, path_db, prefiltro=True):
+    """
+    Primera mitad de `buscar_rucs`, sin tocar la DB: limpia los documentos y
+    descarta con el bitmap los que no están en el padrón. Devuelve los RUC
+    limpios y la lista de enteros a consultar.
+    """
+    with metrics.medir("limpieza", filas=len(lista_rucs)):
+        rucs_limpios, validos, _ = limpiar_rucs_lote(lista_rucs)
+        rucs_enteros = [int(ruc) for ruc in rucs_limpios[validos]]
+
+    bitmap = ruc_index.cargar_bitmap(path_db) if prefiltro else None
+    if bitmap is not None:
+        with metrics.medir("prefiltro", filas=len(rucs_enteros)) as span:
+            rucs_enteros = bitmap.filtrar(rucs_enteros)
+            span.datos["descartados"] = span.filas - len(rucs_enteros)
+    return rucs_limpios, rucs_enteros
+
+
+def completar_consulta(
+    lista_rucs,
+    rucs_limpios,
+    rucs_enteros,
+    path_db,
+    table_name="main_table",
+    backend="sqlite",
+):
+    """Segunda mitad de `buscar_rucs`: consulta la DB y arma las filas de resultado"""
+    try:
+        with metrics.medir("consulta", filas=len(rucs_enteros), backend=backend):
+            db_cache, num_columnas = BACKENDS[backend](
+                rucs_enteros, path_db, table_name
+            )
     except Exception as e:
         print(f"Error consulting DB: {e}")
         return []
 
-    finally:
-        con.close()
+    return armar_resultados(lista_rucs, rucs_limpios, db_cache, num_columnas)
+
 
+def armar_resultados(lista_rucs, rucs_limpios, db_cache, num_columnas):
+    """Une cada documento original con su fila de la DB o con el error de consulta"""
     resultados_finales = []
 
-    for ruc_listado in lista_rucs:
-        ruc_limpio = limpiar_ruc(ruc_listado)
+    for ruc_listado, ruc_limpio in zip(lista_rucs, rucs_limpios):
         ruc_failed = None
 
         if not ruc_limpio:
@@ -83,7 +436,7 @@ def buscar_rucs(lista_rucs, path_db, table_name="main_table"):
             tupla_vacia = (
                 (
                     ruc_listado,
-                    limpiar_ruc(ruc_limpio),
+                    ruc_limpio,
                 )
                 + (ruc_failed,)
                 + ("-",) * (num_columnas - 2)
@@ -94,13 +447,67 @@ def buscar_rucs(lista_rucs, path_db, table_name="main_table"):
 
 
 def limpiar_rucs(lista_rucs):
-    rucs_limpios = []
-    for doc in lista_rucs:
-        ruc_final = limpiar_ruc(doc)
+    rucs_limpios, validos, _ = limpiar_rucs_lote(lista_rucs)
+    return rucs_limpios[validos].tolist()
+
+
+def limpiar_rucs_lote(documentos):
+    """
+    Versión vectorizada de `limpiar_ruc` para una Series o arreglo completo.
+    Devuelve los RUC limpios (Series con None en los inválidos), la máscara de
+    válidos y el dígito verificador calculado (-1 en los inválidos).
+    """
+    if isinstance(documentos, pd.Series):
+        serie = documentos.astype(object)
+    else:
+        serie = pd.Series(list(documentos), dtype=object)
+
+    textos = serie.map(str).str.strip()
+    largos = textos.str.len().to_numpy()
+    candidatos = (largos == 11) | (largos == 8)
+
+    rucs = np.full(len(serie), None, dtype=object)
+    digitos = np.full(len(serie), -1, dtype=np.int8)
+
+    # cada caracter como su código unicode, rellenado con 0 hasta 11 columnas
+    codigos = (
+        np.array(textos[candidatos].tolist(), dtype="U11")
+        .view(np.uint32)
+        .reshape(-1, 11)
+    )
+    largos_cand = largos[candidatos]
+    es_digito = (codigos >= ord("0")) & (codigos <= ord("9"))
+    es_ruc = (largos_cand == 11) & es_digito.all(axis=1)
+    es_dni = (largos_cand == 8) & es_digito[:, :8].all(axis=1)
+
+    # base de 10 dígitos: el RUC sin su dígito, o "10" + DNI
+    base = np.where(
+        es_dni[:, None],
+        np.concatenate(
+            [np.full((len(codigos), 2), [ord("1"), ord("0")]), codigos[:, :8]], axis=1
+        ),
+        codigos[:, :10],
+    ).astype(np.uint32)
+    diferencia = 11 - ((base.astype(np.int64) - ord("0")) @ FACTORES_RUC) % 11
+    digito = np.where(diferencia >= 10, diferencia - 10, diferencia)
+
+    finales = np.concatenate([base, (digito + ord("0"))[:, None]], axis=1)
+    finales = np.ascontiguousarray(finales, dtype=np.uint32).view("U11").ravel()
+
+    ok = es_ruc | es_dni
+    indices = np.flatnonzero(candidatos)
+    rucs[indices[ok]] = finales[ok].tolist()
+    digitos[indices[ok]] = digito[ok]
+
+    # dígitos no ASCII u otros casos raros: se resuelven con la versión escalar
+    for i in indices[~ok]:
+        ruc_final = limpiar_ruc(textos.iat[i])
         if ruc_final:
-            rucs_limpios.append(ruc_final)
+            rucs[i] = ruc_final
+            digitos[i] = int(ruc_final[-1])
 
-    return rucs_limpios
+    validos = digitos >= 0
+    return pd.Series(rucs, index=serie.index, dtype=object), validos, digitos
 
 
 def limpiar_ruc(ruc):
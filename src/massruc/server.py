@@ -0,0 +1,326 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import unquote
+
+import numpy as np
+
+from massruc import ruc_index, ruc_utils, snapshots
+
+ERRORES_POR_TEXTO = {v["text"]: k for k, v in ruc_utils.RUC_QUERY_ERRORS.items()}
+MAX_CUERPO = 16 * 1024 * 1024
+MUESTRAS_LATENCIA = 10000
+LOTE_VECTORIZADO = 64
+# cada cuántos segundos se revisa si se activó otro snapshot del padrón
+INTERVALO_SNAPSHOT = 1.0
+# espera antes de cerrar el pool del snapshot anterior, para las peticiones que
+# ya lo habían tomado
+PLAZO_CIERRE = 5.0
+# errores de transporte que solo cierran la conexión
+ERRORES_CONEXION = (ConnectionError, asyncio.IncompleteReadError)
+
+
+class PoolCerrado(RuntimeError):
+    """El pool ya se cerró, p. ej. el de un snapshot reemplazado"""
+
+
+# queda en la cola de un pool cerrado: quien espera una conexión falla enseguida
+_CERRADO = object()
+
+
+class PoolConexiones:
+    """Pool de conexiones de solo lectura al padrón, compartido entre hilos"""
+
+    def __init__(self, path_db, tamano=4, mmap_size=ruc_utils.MMAP_SIZE):
+        self._libres = queue.Queue()
+        for _ in range(tamano):
+            self._libres.put(
+                ruc_utils.conectar_solo_lectura(
+                    path_db, mmap_size, check_same_thread=False
+                )
+            )
+        self.tamano = tamano
+
+    @contextmanager
+    def conexion(self, bloquear=True):
+        """
+        Presta una conexión, sin bloquear lanza queue.Empty si no hay libres.
+        Si el pool se cerró lanza PoolCerrado, también a quien ya esperaba.
+        """
+        con = self._libres.get(block=bloquear)
+        if con is _CERRADO:
+            self._libres.put(_CERRADO)
+            raise PoolCerrado("El pool de conexiones está cerrado")
+        try:
+            yield con
+        finally:
+            self._libres.put(con)
+
+    def calentar(self, table_name):
+        """Recorre el índice de RUC para cargar sus páginas en caché"""
+        with self.conexion() as con:
+            con.execute(f"SELECT COUNT(ruc) FROM {table_name}").fetchone()
+
+    def cerrar(self):
+        for _ in range(self.tamano):
+            self._libres.get().close()
+        self._libres.put(_CERRADO)
+
+
+class Metricas:
+    """Latencias de las últimas peticiones, para reportar p50/p99"""
+
+    def __init__(self, muestras=MUESTRAS_LATENCIA):
+        self.latencias = deque(maxlen=muestras)
+        self.peticiones = 0
+        self.rucs = 0
+
+    def registrar(self, segundos, rucs):
+        self.latencias.append(segundos)
+        self.peticiones += 1
+        self.rucs += rucs
+
+    def resumen(self):
+        p50, p99 = (
+            np.percentile(np.fromiter(self.latencias, float), [50, 99]) * 1000
+            if self.latencias
+            else (0.0, 0.0)
+        )
+        return {
+            "peticiones": self.peticiones,
+            "rucs": self.rucs,
+            "p50_ms": round(float(p50), 3),
+            "p99_ms": round(float(p99), 3),
+        }
+
+
+def _a_json(fila):
+    documento, ruc, razon_social, *resto = fila
+    error = ERRORES_POR_TEXTO.get(razon_social)
+    return {
+        "documento": None if documento is None else str(documento),
+        "ruc": None if ruc is None else str(ruc),
+        "razon_social": None if error else razon_social,
+        "estado": None if error else (resto[0] if resto else None),
+        "condicion": None if error else (resto[1] if len(resto) > 1 else None),
+        "error": error,
+    }
+
+
+class ServidorRuc:
+    """
+    Servicio HTTP asyncio de consulta de RUC sobre el padrón:
+    GET /ruc/<documento>, POST /rucs con {"documentos": [...]} y GET /metrics.
+    Con `carpeta_snapshots` sigue al snapshot activo: al publicarse uno nuevo
+    abre un pool sobre él y cierra el anterior cuando termina de usarse, sin
+    dejar de responder.
+    """
+
+    def __init__(
+        self, path_db, table_name="main_table", conexiones=4, carpeta_snapshots=None
+    ):
+        self.table_name = table_name
+        self.path_db = path_db
+        self.pool = PoolConexiones(path_db, conexiones)
+        self.metricas = Metricas()
+        # los RUCs que no están en el padrón se descartan sin consultar la DB
+        self.bitmap = ruc_index.cargar_bitmap(path_db)
+
+        self.carpeta_snapshots = carpeta_snapshots
+        self._revisado = time.monotonic()
+        self._cambiando = threading.Lock()
+
+    def revisar_snapshot(self):
+        """Si se activó otro snapshot, lo carga en segundo plano"""
+        ahora = time.monotonic()
+        if (
+            self.carpeta_snapshots is None
+            or ahora - self._revisado < INTERVALO_SNAPSHOT
+        ):
+            return
+        self._revisado = ahora
+        ruta = snapshots.ruta_activa(self.carpeta_snapshots)
+        if ruta and ruta != self.path_db and self._cambiando.acquire(blocking=False):
+            threading.Thread(
+                target=self._cambiar_snapshot, args=(ruta,), daemon=True
+            ).start()
+
+    def _cambiar_snapshot(self, ruta):
+        try:
+            nuevo = PoolConexiones(ruta, self.pool.tamano)
+            nuevo.calentar(self.table_name)
+            anterior = self.pool
+            # sin bitmap mientras se cambia: nunca se filtra con el de otra DB
+            self.bitmap = None
+            self.pool, self.path_db = nuevo, ruta
+            self.bitmap = ruc_index.cargar_bitmap(ruta)
+            print(f"Snapshot activo: {ruta}")
+        except Exception as e:
+            print(f"No se pudo abrir el snapshot {ruta}: {e}")
+            return
+        finally:
+            self._cambiando.release()
+        # cerrar() espera además a que se devuelvan las conexiones prestadas
+        time.sleep(PLAZO_CIERRE)
+        anterior.cerrar()
+
+    def validar(self, documentos, bloquear=True):
+        self.revisar_snapshot()
+        pool = self.pool
+        if len(documentos) < LOTE_VECTORIZADO:
+            # en lotes chicos pesa más armar la Series que limpiar uno por uno
+            rucs_limpios = [ruc_utils.limpiar_ruc(doc) for doc in documentos]
+        else:
+            rucs_limpios, _, _ = ruc_utils.limpiar_rucs_lote(documentos)
+        rucs_enteros = [int(ruc) for ruc in rucs_limpios if ruc]
+        bitmap = self.bitmap
+        if bitmap is not None:
+            rucs_enteros = bitmap.filtrar(rucs_enteros)
+        try:
+            with pool.conexion(bloquear) as con:
+                db_cache, num_columnas = ruc_utils.consultar_rucs(
+                    con, rucs_enteros, self.table_name
+                )
+        except PoolCerrado:
+            # se tomó el pool de un snapshot ya reemplazado: se usa el nuevo
+            if pool is self.pool:
+                raise
+            return self.validar(documentos, bloquear)
+        return [
+            _a_json(fila)
+            for fila in ruc_utils.armar_resultados(
+                documentos, rucs_limpios, db_cache, num_columnas
+            )
+        ]
+
+    async def _resolver(self, metodo, ruta, cuerpo):
+        if metodo == "GET" and ruta.startswith("/ruc/"):
+            documentos = [unquote(ruta.removeprefix("/ruc/"))]
+            try:
+                # una sola clave se resuelve en el mismo loop, es más rápido que
+                # pasar a un hilo, salvo que todas las conexiones estén ocupadas
+                resultado = self.validar(documentos, bloquear=False)
+            except queue.Empty:
+                resultado = await asyncio.to_thread(self.validar, documentos)
+            return 200, resultado[0], 1
+
+        if metodo == "POST" and ruta == "/rucs":
+            datos = json.loads(cuerpo or b"{}")
+            documentos = datos.get("documentos") if isinstance(datos, dict) else None
+            if not isinstance(documentos, list):
+                return 400, {"error": 'Se espera {"documentos": [...]}'}, 0
+            resultados = await asyncio.to_thread(self.validar, documentos)
+            return 200, {"resultados": resultados}, len(documentos)
+
+        if metodo == "GET" and ruta == "/metrics":
+            return 200, self.metricas.resumen(), None
+
+        if metodo == "GET" and ruta == "/health":
+            return 200, {"estado": "ok"}, None
+
+        return 404, {"error": "Ruta no encontrada"}, None
+
+    async def _leer_peticion(self, reader):
+        """
+        Lee la línea de petición y los encabezados. Devuelve None si el cliente
+        cerró la conexión y lanza ValueError si la petición está mal formada.
+        """
+        linea = await reader.readline()
+        if not linea:
+            return None
+        partes = linea.decode("latin-1").split()
+        if len(partes) != 3:
+            raise ValueError("Línea de petición inválida")
+        metodo, ruta, _ = partes
+
+        headers = {}
+        while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            nombre, separador, valor = header.decode("latin-1").partition(":")
+            if not separador:
+                raise ValueError("Encabezado inválido")
+            headers[nombre.strip().lower()] = valor.strip()
+
+        largo = headers.get("content-length", "0")
+        if not (largo.isascii() and largo.isdigit()):
+            raise ValueError("Content-Length inválido")
+        return metodo, ruta, headers, int(largo)
+
+    async def _responder(self, writer, estado, respuesta, cerrar):
+        datos = json.dumps(respuesta, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {estado} {'OK' if estado == 200 else 'Error'}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(datos)}\r\n"
+            f"Connection: {'close' if cerrar else 'keep-alive'}\r\n\r\n".encode(
+                "latin-1"
+            )
+            + datos
+        )
+        await writer.drain()
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    peticion = await self._leer_peticion(reader)
+                except ValueError as e:
+                    # sin saber dónde termina la petición no se puede seguir
+                    # leyendo de la conexión: se responde y se cierra
+                    await self._responder(writer, 400, {"error": str(e)}, True)
+                    break
+                if peticion is None:
+                    break
+                metodo, ruta, headers, largo = peticion
+                inicio = time.perf_counter()
+
+                rucs = None
+                if largo > MAX_CUERPO:
+                    estado, respuesta = 413, {"error": "Cuerpo muy grande"}
+                else:
+                    cuerpo = await reader.readexactly(largo) if largo else b""
+                    try:
+                        estado, respuesta, rucs = await self._resolver(
+                            metodo, ruta, cuerpo
+                        )
+                    except ValueError as e:
+                        estado, respuesta = 400, {"error": str(e)}
+                    except PoolCerrado as e:
+                        estado, respuesta = 503, {"error": str(e)}
+                    except sqlite3.Error as e:
+                        print(f"Error consultando el padrón: {e}")
+                        estado, respuesta = 500, {
+                            "error": "Error consultando el padrón"
+                        }
+
+                # un cuerpo muy grande no se leyó, la conexión no puede seguir
+                cerrar = (
+                    estado == 413 or headers.get("connection", "").lower() == "close"
+                )
+                await self._responder(writer, estado, respuesta, cerrar)
+
+                if rucs is not None:
+                    self.metricas.registrar(time.perf_counter() - inicio, rucs)
+                if cerrar:
+                    break
+        except ERRORES_CONEXION:
+            pass
+        finally:
+            writer.close()
+
+    async def iniciar(self, host="127.0.0.1", port=8080):
+        self.pool.calentar(self.table_name)
+        return await asyncio.start_server(self.atender, host, port)
+
+    async def ejecutar(self, host="127.0.0.1", port=8080):
+        servidor = await self.iniciar(host, port)
+        print(f"Servicio de consulta RUC en http://{host}:{port}")
+        async with servidor:
+            await servidor.serve_forever()
+
+    def cerrar(self):
+        self.pool.cerrar()
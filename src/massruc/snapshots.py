@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from massruc import ruc_index, txt_to_db
+from massruc.ruc_utils import conectar_solo_lectura
+
+# archivo que apunta al snapshot activo, dentro de la carpeta de snapshots
+PUNTERO = "activo.json"
+PREFIJO = "padron_"
+TABLA_INFO = "snapshot_info"
+# puntero inexistente, a medio escribir o de otro formato
+ERRORES_PUNTERO = (OSError, ValueError, KeyError)
+
+
+def _ruta_puntero(carpeta):
+    return os.path.join(carpeta, PUNTERO)
+
+
+def listar_snapshots(carpeta):
+    """Snapshots publicados en la carpeta, del más antiguo al más nuevo"""
+    if not os.path.isdir(carpeta):
+        return []
+    return [
+        os.path.join(carpeta, nombre)
+        for nombre in sorted(os.listdir(carpeta))
+        if nombre.startswith(PREFIJO) and nombre.endswith(".db")
+    ]
+
+
+def ruta_activa(carpeta, respaldo=None):
+    """
+    Ruta del snapshot activo. Si todavía no hay snapshots se usa `respaldo`
+    (la DB única de versiones anteriores), o None si tampoco existe.
+    """
+    try:
+        with open(_ruta_puntero(carpeta), encoding="utf-8") as f:
+            ruta = os.path.join(carpeta, json.load(f)["snapshot"])
+        if os.path.exists(ruta):
+            return ruta
+    except ERRORES_PUNTERO:
+        pass
+    if respaldo and os.path.exists(respaldo):
+        return respaldo
+    return None
+
+
+def activar_snapshot(carpeta, ruta):
+    """
+    Cambia el puntero al snapshot indicado con un reemplazo atómico: los
+    lectores ven el snapshot anterior o el nuevo, nunca un estado intermedio.
+    Las conexiones ya abiertas siguen leyendo su propio archivo.
+    """
+    puntero = _ruta_puntero(carpeta)
+    with open(puntero + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"snapshot": os.path.basename(ruta), "activado": _ahora()}, f)
+    os.replace(puntero + ".tmp", puntero)
+
+
+def _ahora():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _sha256(ruta, bloque=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        while datos := f.read(bloque):
+            digest.update(datos)
+    return digest.hexdigest()
+
+
+def _fecha_origen(input_zip):
+    """Last-Modified guardado por la descarga, o la fecha del archivo"""
+    ruta_meta = os.fspath(input_zip) + ".json"
+    if os.path.exists(ruta_meta):
+        with open(ruta_meta, encoding="utf-8") as f:
+            fecha = json.load(f).get("last_modified")
+        if fecha:
+            return fecha
+    modificado = os.path.getmtime(input_zip)
+    return datetime.fromtimestamp(modificado, timezone.utc).isoformat(
+        timespec="seconds"
+    )
+
+
+def leer_info(path_db):
+    """Metadatos del snapshot (origen, filas, sha256 del ZIP...), {} si no tiene"""
+    con = conectar_solo_lectura(path_db)
+    try:
+        return dict(con.execute(f"SELECT clave, valor FROM {TABLA_INFO}"))
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        con.close()
+
+
+def _guardar_info(path_db, table_name, input_zip, filas):
+    """
+    Registra los metadatos del snapshot. `filas` es la cantidad que informó la
+    ingesta (leídas menos descartadas y repetidas), no un COUNT(*) de la tabla,
+    para que `validar_snapshot` la compare con lo que realmente quedó.
+    `sha256_zip` identifica la versión del padrón de origen; no verifica el
+    archivo de la DB, eso lo hace el quick_check de `validar_snapshot`.
+    """
+    con = sqlite3.connect(path_db)
+    try:
+        info = {
+            "tabla": table_name,
+            "filas": str(filas),
+            "fecha_origen": _fecha_origen(input_zip),
+            "sha256_zip": _sha256(input_zip),
+            "creado": _ahora(),
+        }
+        with con:
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLA_INFO} "
+                "(clave TEXT PRIMARY KEY, valor TEXT)"
+            )
+            con.executemany(
+                f"INSERT OR REPLACE INTO {TABLA_INFO} VALUES (?, ?)", info.items()
+            )
+    finally:
+        con.close()
+    return info
+
+
+def validar_snapshot(path_db, table_name, anterior=None, minimo_relativo=0.9):
+    """
+    Verifica un snapshot antes de activarlo: integridad de SQLite, filas
+    iguales a las que informó la ingesta y, si hay uno anterior, que no haya
+    perdido más de `minimo_relativo` de sus filas (un padrón truncado). Lanza
+    ValueError.
+    """
+    con = sqlite3.connect(path_db)
+    try:
+        (integridad,) = con.execute("PRAGMA quick_check").fetchone()
+        filas = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    finally:
+        con.close()
+
+    if integridad != "ok":
+        raise ValueError(f"Snapshot dañado: {integridad}")
+    esperadas = leer_info(path_db).get("filas")
+    if not filas or str(filas) != esperadas:
+        raise ValueError(
+            f"Snapshot incompleto: {filas} filas, la ingesta informó {esperadas}"
+        )
+    if anterior:
+        filas_anterior = int(leer_info(anterior).get("filas") or 0)
+        if filas < filas_anterior * minimo_relativo:
+            raise ValueError(
+                f"El nuevo padrón tiene {filas} filas, el anterior {filas_anterior}"
+            )
+
+
+def _ruta_nueva(carpeta):
+    base = os.path.join(carpeta, f"{PREFIJO}{datetime.now():%Y%m%d_%H%M%S}")
+    ruta, n = base + ".db", 1
+    while os.path.exists(ruta):
+        ruta, n = f"{base}_{n}.db", n + 1
+    return ruta
+
+
+def construir_snapshot(
+    input_zip,
+    carpeta,
+    table_name="main_table",
+    progress_callback=None,
+    compacto=False,
+    indice_nombres=False,
+    bitmap=False,
+    indice_mmap=False,
+    respaldo=None,
+    minimo_relativo=0.9,
+):
+    """
+    Construye un nuevo snapshot fechado a partir del ZIP del padrón, sin tocar
+    el activo: si existe uno se copia y se le aplican solo los cambios, si no
+    se convierte completo. Registra sus metadatos, lo valida y lo deja listo
+    (con sus índices) para `activar_snapshot`. Devuelve su ruta. Al copiar el
+    anterior se conserva su tabla de cambios y se agregan los de esta versión.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    anterior = ruta_activa(carpeta, respaldo)
+    destino = _ruta_nueva(carpeta)
+    temporal = destino + ".tmp"
+
+    start_time = time.time()
+    try:
+        if anterior:
+            shutil.copyfile(anterior, temporal)
+            conteos = txt_to_db.actualizar_incremental(
+                input_zip,
+                temporal,
+                table_name,
+                progress_callback=progress_callback,
+                indice_nombres=indice_nombres,
+                version=_fecha_origen(input_zip),
+            )
+            # el nuevo padrón completo: lo que se agregó, cambió o quedó igual
+            filas = (
+                conteos["insertados"] + conteos["actualizados"] + conteos["sin_cambios"]
+            )
+        else:
+            filas = txt_to_db.convert_zip_to_sql(
+                input_zip,
+                temporal,
+                table_name,
+                progress_callback=progress_callback,
+                compacto=compacto,
+                indice_nombres=indice_nombres,
+            )
+        _guardar_info(temporal, table_name, input_zip, filas)
+        validar_snapshot(temporal, table_name, anterior, minimo_relativo)
+        os.replace(temporal, destino)
+
+        # los índices se nombran según la ruta final de la DB
+        if bitmap:
+            ruc_index.construir_bitmap(destino, table_name)
+        if indice_mmap:
+            ruc_index.construir_indice(destino, table_name)
+    except BaseException:
+        # un snapshot sin los índices pedidos no queda listado para activarse
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        if os.path.exists(destino):
+            eliminar_snapshot(destino)
+        raise
+
+    print(f"Snapshot {destino} listo en {round(time.time() - start_time, 2)}s")
+    return destino
+
+
+def eliminar_snapshot(ruta):
+    """Borra el snapshot y sus índices; False si algún archivo sigue en uso"""
+    try:
+        ruc_index.eliminar_indice(ruta)
+        ruc_index.eliminar_bitmap(ruta)
+        os.remove(ruta)
+    except PermissionError:
+        # en Windows un archivo abierto no se puede borrar, se reintenta luego
+        return False
+    return True
+
+
+def podar_snapshots(carpeta, retener=2):
+    """Conserva el activo y los `retener` snapshots más nuevos, para volver atrás"""
+    activo = ruta_activa(carpeta)
+    otros = [ruta for ruta in listar_snapshots(carpeta) if ruta != activo]
+    eliminados = []
+    for ruta in otros[: max(len(otros) - retener, 0)]:
+        if eliminar_snapshot(ruta):
+            eliminados.append(ruta)
+    return eliminados
+
+
+def rollback(carpeta):
+    """Activa el snapshot anterior al activo y devuelve su ruta"""
+    snapshots = listar_snapshots(carpeta)
+    activo = ruta_activa(carpeta)
+    posicion = snapshots.index(activo) if activo in snapshots else len(snapshots)
+    if posicion == 0:
+        raise LookupError("No hay un snapshot anterior al activo")
+
+    anterior = snapshots[posicion - 1]
+    activar_snapshot(carpeta, anterior)
+    return anterior
@@ -1,9 +1,23 @@
+import io
+import os
+import shutil
 import sqlite3
 import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from os import path, remove
 
 import pandas as pd
 
+from massruc import historial, metrics, name_search, ruc_index
+from massruc.progreso import OperacionCancelada, como_progreso
+
+# cada cuántas filas se informa el avance (y se revisa si se canceló)
+PROGRESS_EVERY = 10000
+# columnas con pocos valores distintos, que el esquema compacto guarda como ids
+COLUMNAS_DICCIONARIO = ("estado_del_contribuyente", "condición_de_domicilio")
+
 
 def count_lines(file_path):
     with open(file_path, "rb") as file:
@@ -18,24 +32,216 @@ def count_lines(file_path):
         return lines
 
 
-def sanitize_csv(input_file, output_file, expected_fields=4, separator="|"):
-    clean_lines = []
+def normalizar_columnas(columnas):
+    """Normaliza los encabezados igual que la conversión con pandas"""
+    return [str(c).strip().lower().replace(" ", "_") for c in columnas]
 
-    # open file on latin-1 for correct reading
-    with open(input_file, "r", encoding="latin-1") as file:
-        for i, line in enumerate(file):
-            line = line.strip()
 
-            fields = line.split(separator, expected_fields)[:expected_fields]
+def _imprimir_error(i):
+    print(f"Error en linea {i}")
 
-            if len(fields) == expected_fields:
-                clean_lines.append("|".join(fields))
-            else:
-                print(f"Error en linea {i}")
 
+def iter_sanitized_lines(
+    lines, expected_fields=4, separator="|", reportar_error=_imprimir_error
+):
+    """Genera los campos de cada línea válida, recortados a `expected_fields`"""
+    for i, line in enumerate(lines):
+        line = line.strip()
+
+        fields = line.split(separator, expected_fields)[:expected_fields]
+
+        if len(fields) == expected_fields:
+            yield fields
+        else:
+            reportar_error(i)
+
+
+def _eliminar_si_existe(*rutas):
+    for ruta in rutas:
+        if path.exists(ruta):
+            remove(ruta)
+
+
+def sanitize_csv(
+    input_file, output_file, expected_fields=4, separator="|", progress_callback=None
+):
+    """
+    Deja solo las líneas con `expected_fields` campos, en utf-8. Si se
+    cancela con un `Progreso` no queda un archivo de salida a medio escribir.
+    """
+    progreso = como_progreso(progress_callback)
+    total = max(path.getsize(input_file), 1)
+    # open file on latin-1 for correct reading
     # export file in utf-8 for most compatibility
-    with open(output_file, "w", encoding="utf-8") as file:
-        file.write("\n".join(clean_lines))
+    try:
+        with (
+            open(input_file, "r", encoding="latin-1") as file_in,
+            open(output_file, "w", encoding="utf-8") as file_out,
+            metrics.medir("sanitizado", bytes=path.getsize(input_file)) as span,
+        ):
+            for fields in iter_sanitized_lines(file_in, expected_fields, separator):
+                if span.filas:
+                    file_out.write("\n")
+                file_out.write("|".join(fields))
+                span.filas += 1
+                if span.filas % PROGRESS_EVERY == 0:
+                    progreso.reportar(file_in.buffer.tell() / total)
+    except OperacionCancelada:
+        _eliminar_si_existe(output_file)
+        raise
+    progreso.reportar(1.0)
+
+
+def _rangos_por_linea(input_file, tamano_rango):
+    """Parte el archivo en rangos de bytes que terminan justo después de un salto"""
+    total = path.getsize(input_file)
+    rangos = []
+    inicio = 0
+    with open(input_file, "rb") as f:
+        while inicio < total:
+            f.seek(min(inicio + tamano_rango, total))
+            f.readline()
+            fin = min(f.tell(), total)
+            rangos.append((inicio, fin))
+            inicio = fin
+    return rangos
+
+
+def _sanitizar_rango(input_file, inicio, fin, shard, expected_fields, separator):
+    """
+    Limpia un rango del archivo en un proceso del pool y lo escribe en `shard`.
+    Devuelve las líneas leídas, las filas escritas y los errores (índice local).
+    """
+    with open(input_file, "rb") as f:
+        f.seek(inicio)
+        # newline=None: mismos saltos de línea universales que el modo texto
+        lines = io.StringIO(f.read(fin - inicio).decode("latin-1"), newline=None)
+
+    errores = []
+    limpias = [
+        "|".join(fields)
+        for fields in iter_sanitized_lines(
+            lines, expected_fields, separator, errores.append
+        )
+    ]
+    with open(shard, "w", encoding="utf-8") as file_out:
+        file_out.write("\n".join(limpias))
+
+    texto = lines.getvalue()
+    leidas = texto.count("\n") + (not texto.endswith("\n"))
+    return leidas, len(limpias), errores
+
+
+def sanitize_csv_paralelo(
+    input_file,
+    output_file,
+    expected_fields=4,
+    separator="|",
+    workers=None,
+    tamano_rango=32 * 1024**2,
+    progress_callback=None,
+):
+    """
+    Igual que `sanitize_csv`, pero limpia rangos del archivo en un pool de
+    procesos. Cada rango se escribe en un shard y los shards se unen en orden;
+    los errores se reportan con el número de línea del archivo completo.
+    """
+    progreso = como_progreso(progress_callback)
+    workers = workers or os.cpu_count() or 1
+    rangos = _rangos_por_linea(input_file, tamano_rango)
+    if workers == 1 or len(rangos) == 1:
+        return sanitize_csv(
+            input_file, output_file, expected_fields, separator, progreso
+        )
+
+    shards = [f"{output_file}.{i}.part" for i in range(len(rangos))]
+
+    with metrics.medir(
+        "sanitizado", bytes=path.getsize(input_file), workers=workers
+    ) as span:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futuros = [
+                    pool.submit(
+                        _sanitizar_rango,
+                        input_file,
+                        inicio,
+                        fin,
+                        shard,
+                        expected_fields,
+                        separator,
+                    )
+                    for (inicio, fin), shard in zip(rangos, shards)
+                ]
+                try:
+                    resultados = []
+                    for futuro in futuros:
+                        resultados.append(futuro.result())
+                        progreso.reportar(len(resultados) / len(futuros))
+                except BaseException:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+
+            linea_inicial = 0
+            with open(output_file, "wb") as file_out:
+                for shard, (leidas, escritas, errores) in zip(shards, resultados):
+                    for i in errores:
+                        _imprimir_error(linea_inicial + i)
+                    linea_inicial += leidas
+
+                    if not escritas:
+                        continue
+                    if span.filas:
+                        file_out.write(b"\n")
+                    with open(shard, "rb") as file_in:
+                        shutil.copyfileobj(file_in, file_out)
+                    span.filas += escritas
+        finally:
+            _eliminar_si_existe(*shards)
+
+
+def iter_padron_zip(
+    input_zip, expected_fields=4, separator="|", progress_callback=None
+):
+    """
+    Lee el padrón directamente desde el ZIP, sin extraerlo a disco.
+    Genera los campos de cada línea válida, la primera es el encabezado.
+    El progreso se calcula con los bytes comprimidos consumidos y se informa
+    a un `Progreso`, que puede cancelar la lectura.
+    """
+    progreso = como_progreso(progress_callback)
+
+    with open(input_zip, "rb") as raw, zipfile.ZipFile(raw) as z:
+        info = z.infolist()[0]
+        inicio = info.header_offset
+        total = max(info.compress_size, 1)
+
+        with z.open(info) as member:
+            lines = io.TextIOWrapper(member, encoding="latin-1")
+            for n, fields in enumerate(
+                iter_sanitized_lines(lines, expected_fields, separator)
+            ):
+                yield fields
+
+                if n % PROGRESS_EVERY == 0:
+                    progreso.reportar((raw.tell() - inicio) / total)
+
+    progreso.reportar(1.0)
+
+
+def _crear_indice(connection, table_name):
+    print("Indexando la tabla")
+    index_time = time.time()
+
+    with metrics.medir("indice", tipo="sql"):
+        cursor_idx = connection.cursor()
+        cursor_idx.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_ruc ON {table_name}(ruc)"
+        )
+        cursor_idx.close()
+
+        connection.commit()
+    print(f"Índice creado en {round(time.time() - index_time, 2)}s")
 
 
 def convert_txt_to_sql(
@@ -45,8 +251,14 @@ def convert_txt_to_sql(
     separator="|",
     chunk_size=5000,
     progress_callback=None,
+    indice_nombres=False,
+    bitmap=False,
 ):
-    """Convierte una entrada en txt o csv a una base de datos sql"""
+    """
+    Convierte una entrada en txt o csv a una base de datos sql. Con
+    `indice_nombres` crea además el índice FTS5 de búsqueda por razón social
+    y con `bitmap` el bitmap de RUCs existentes (`ruc_index.construir_bitmap`).
+    """
 
     connection = sqlite3.connect(output_db)
     cursor = connection.cursor()
@@ -60,70 +272,467 @@ def convert_txt_to_sql(
     start_time = time.time()
     rows_processed = 0
     total_lines = count_lines(input_txt)
-    try:
-        chunks = pd.read_csv(
-            input_txt,
-            sep=separator,
-            chunksize=chunk_size,
-            encoding="utf-8",
-            on_bad_lines="warn",
-            engine="c",
-            low_memory=False,
-            quoting=3,
-            dtype="str",
-        )
+    progreso = como_progreso(progress_callback)
+    with metrics.medir("ingesta", bytes=path.getsize(input_txt), origen="txt") as span:
+        try:
+            chunks = pd.read_csv(
+                input_txt,
+                sep=separator,
+                chunksize=chunk_size,
+                encoding="utf-8",
+                on_bad_lines="warn",
+                engine="c",
+                low_memory=False,
+                quoting=3,
+                dtype="str",
+            )
 
-        for i, chunk in enumerate(chunks):
-            chunk.columns = chunk.columns.str.strip().str.lower().str.replace(" ", "_")
-
-            if "ruc" in chunk.columns:
-                # 'coerce' convierte cualquier error a NaN
-                chunk["ruc"] = (
-                    pd.to_numeric(chunk["ruc"], errors="coerce")
-                    .fillna(0)
-                    .astype("int64")
+            for i, chunk in enumerate(chunks):
+                chunk.columns = (
+                    chunk.columns.str.strip().str.lower().str.replace(" ", "_")
                 )
 
-            chunk.to_sql(table_name, connection, if_exists="append", index=False)
+                if "ruc" in chunk.columns:
+                    # 'coerce' convierte cualquier error a NaN
+                    chunk["ruc"] = (
+                        pd.to_numeric(chunk["ruc"], errors="coerce")
+                        .fillna(0)
+                        .astype("int64")
+                    )
 
-            rows_in_chunk = len(chunk)
-            rows_processed += rows_in_chunk
+                chunk.to_sql(table_name, connection, if_exists="append", index=False)
 
-            if progress_callback:
-                progress_callback(min(rows_processed / total_lines, 1.0))
-            else:
-                print(f"Chunk {i+1} procesado")
+                rows_in_chunk = len(chunk)
+                rows_processed += rows_in_chunk
 
-        print("Indexando la tabla")
-        index_time = time.time()
+                progreso.reportar(rows_processed / max(total_lines, 1))
+                if progress_callback is None:
+                    print(f"Chunk {i+1} procesado")
 
-        cursor_idx = connection.cursor()
-        cursor_idx.execute(
-            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_ruc ON {table_name}(ruc)"
+            span.filas = rows_processed
+            _crear_indice(connection, table_name)
+            print(f"Conversion completada en {round(time.time() - start_time, 2)}s")
+        except Exception as e:
+            connection.close()
+            remove(output_db)
+            print(f"Error: {e}")
+            if isinstance(e, OperacionCancelada):
+                raise
+        else:
+            cursor = connection.cursor()
+            cursor.execute("PRAGMA synchronous = NORMAL")
+            cursor.execute("PRAGMA journal_mode = DELETE")
+            connection.close()
+
+    if indice_nombres and path.exists(output_db):
+        name_search.construir_indice_nombres(output_db, table_name)
+    # al final: el bitmap queda ligado al estado del archivo de la DB
+    if bitmap and path.exists(output_db):
+        ruc_index.construir_bitmap(output_db, table_name)
+
+
+def _preparar_filas(filas, pos_ruc):
+    """Convierte el RUC a entero y los campos vacíos a NULL, como lo hacía pandas"""
+    for fields in filas:
+        ruc = fields[pos_ruc].strip()
+        if not ruc.isdigit():
+            print(f"RUC inválido: {ruc!r}")
+            continue
+
+        fila = [field or None for field in fields]
+        fila[pos_ruc] = int(ruc)
+        yield fila
+
+
+def _definicion_columnas(columnas, ruc_primary_key=False):
+    tipo_ruc = "INTEGER PRIMARY KEY" if ruc_primary_key else "INTEGER"
+    return ", ".join(
+        f'"{c}" {tipo_ruc}' if c == "ruc" else f'"{c}" TEXT' for c in columnas
+    )
+
+
+def _tablas_compactas(table_name):
+    """Tabla de datos y tabla de diccionario del esquema compacto"""
+    return f"{table_name}_datos", f"{table_name}_valores"
+
+
+def _definicion_compacta(columnas):
+    return ", ".join(
+        (
+            f'"{c}" INTEGER PRIMARY KEY'
+            if c == "ruc"
+            else f'"{c}" INTEGER' if c in COLUMNAS_DICCIONARIO else f'"{c}" TEXT'
         )
-        cursor_idx.close()
+        for c in columnas
+    )
 
-        connection.commit()
-        print(f"Índice creado en {round(time.time() - index_time, 2)}s")
-        print(f"Conversion completada en {round(time.time() - start_time, 2)}s")
-    except Exception as e:
-        connection.close()
-        remove(output_db)
-        print(f"Error: {e}")
+
+def _crear_esquema_compacto(connection, table_name, columnas):
+    """
+    Crea la tabla WITHOUT ROWID con clave RUC, el diccionario de valores y una
+    vista con el nombre original que decodifica los estados. Las consultas
+    existentes (`SELECT * FROM tabla WHERE ruc IN ...`) no cambian.
+    """
+    datos, valores = _tablas_compactas(table_name)
+    connection.execute(
+        f"CREATE TABLE {valores} (id INTEGER PRIMARY KEY, columna TEXT NOT NULL, "
+        "valor TEXT NOT NULL, UNIQUE (columna, valor))"
+    )
+    connection.execute(
+        f"CREATE TABLE {datos} ({_definicion_compacta(columnas)}) WITHOUT ROWID"
+    )
+
+    campos = []
+    joins = []
+    for i, c in enumerate(columnas):
+        if c in COLUMNAS_DICCIONARIO:
+            campos.append(f'v{i}.valor AS "{c}"')
+            joins.append(f'LEFT JOIN {valores} v{i} ON v{i}.id = d."{c}"')
+        else:
+            campos.append(f'd."{c}"')
+    connection.execute(
+        f"CREATE VIEW {table_name} AS SELECT {', '.join(campos)} "
+        f"FROM {datos} d {' '.join(joins)}"
+    )
+
+
+def es_compacta(connection, table_name):
+    fila = connection.execute(
+        "SELECT type FROM sqlite_master WHERE name = ?", (table_name,)
+    ).fetchone()
+    return fila is not None and fila[0] == "view"
+
+
+def _agregar_valores(connection, valores, origen, columnas):
+    """Agrega al diccionario los valores de `origen` que todavía no tienen id"""
+    for c in columnas:
+        if c in COLUMNAS_DICCIONARIO:
+            connection.execute(
+                f"INSERT OR IGNORE INTO {valores} (columna, valor) "
+                f'SELECT DISTINCT ?, "{c}" FROM {origen} WHERE "{c}" IS NOT NULL',
+                (c,),
+            )
+
+
+def _select_codificado(columnas, valores, origen):
+    """SELECT sobre `origen` con los valores de diccionario reemplazados por su id"""
+    campos = []
+    joins = []
+    for i, c in enumerate(columnas):
+        if c in COLUMNAS_DICCIONARIO:
+            campos.append(f"v{i}.id")
+            joins.append(
+                f"LEFT JOIN {valores} v{i} "
+                f"ON v{i}.columna = '{c}' AND v{i}.valor = o.\"{c}\""
+            )
+        else:
+            campos.append(f'o."{c}"')
+    return f"SELECT {', '.join(campos)} FROM {origen} o {' '.join(joins)}"
+
+
+def _codificar_filas(filas, columnas, diccionario):
+    """
+    Reemplaza los valores de COLUMNAS_DICCIONARIO por su id en `diccionario`
+    ({(columna, valor): id}), agregando los que aparecen por primera vez
+    """
+    posiciones = [(i, c) for i, c in enumerate(columnas) if c in COLUMNAS_DICCIONARIO]
+    for fila in filas:
+        for i, c in posiciones:
+            valor = fila[i]
+            if valor is not None:
+                clave = (c, valor)
+                id_ = diccionario.get(clave)
+                if id_ is None:
+                    id_ = diccionario[clave] = len(diccionario) + 1
+                fila[i] = id_
+        yield fila
+
+
+@contextmanager
+def _contar_reemplazos(connection, tabla):
+    """
+    Cuenta las filas que INSERT OR REPLACE borra en `tabla` por RUC repetido,
+    con un trigger temporal: la cantidad de filas ingeridas no depende así de
+    un COUNT(*) sobre la propia tabla. Deja el total en la lista que devuelve.
+    """
+    reemplazos = [0]
+
+    def contar():
+        reemplazos[0] += 1
+
+    connection.create_function("massruc_reemplazo", 0, contar)
+    # los borrados de REPLACE solo disparan triggers con recursive_triggers
+    connection.execute("PRAGMA recursive_triggers = ON")
+    connection.execute(
+        f"CREATE TEMP TRIGGER contar_reemplazos AFTER DELETE ON main.{tabla} "
+        "BEGIN SELECT massruc_reemplazo(); END"
+    )
+    try:
+        yield reemplazos
     finally:
-        cursor = connection.cursor()
-        cursor.execute("PRAGMA synchronous = NORMAL")
-        cursor.execute("PRAGMA journal_mode = DELETE")
-        connection.close()
+        connection.execute("DROP TRIGGER temp.contar_reemplazos")
+        connection.execute("PRAGMA recursive_triggers = OFF")
+
+
+def _insertar_filas(connection, table_name, filas, batch_size, modo="INSERT"):
+    """Inserta las filas por lotes con executemany, devuelve la cantidad"""
+    insert_sql = None
+    insertadas = 0
+    lote = []
+    for fila in filas:
+        if insert_sql is None:
+            insert_sql = (
+                f"{modo} INTO {table_name} VALUES ({','.join('?' * len(fila))})"
+            )
+
+        lote.append(fila)
+        if len(lote) >= batch_size:
+            connection.executemany(insert_sql, lote)
+            insertadas += len(lote)
+            lote.clear()
+
+    if lote:
+        connection.executemany(insert_sql, lote)
+        insertadas += len(lote)
+
+    return insertadas
+
+
+def convert_zip_to_sql(
+    input_zip,
+    output_db,
+    table_name="main_table",
+    separator="|",
+    expected_fields=4,
+    batch_size=10000,
+    progress_callback=None,
+    compacto=False,
+    indice_nombres=False,
+    bitmap=False,
+):
+    """
+    Convierte el ZIP del padrón a una base de datos sql en una sola pasada:
+    descomprime, limpia e inserta por lotes sin archivos intermedios.
+    Con `compacto` usa una tabla WITHOUT ROWID con los estados en un
+    diccionario, detrás de una vista con el nombre `table_name`. Con
+    `indice_nombres` crea además el índice FTS5 de búsqueda por razón social
+    y con `bitmap` el bitmap de RUCs existentes (`ruc_index.construir_bitmap`).
+    """
+    connection = sqlite3.connect(output_db)
+    print("Iniciando conversión...")
+
+    # Deshabilita seguridad para aumentar velocidad (solo en la conversión)
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("PRAGMA journal_mode = MEMORY")
+
+    start_time = time.time()
+    rows_processed = 0
+    with metrics.medir(
+        "ingesta", bytes=path.getsize(input_zip), origen="zip", compacto=compacto
+    ) as span:
+        try:
+            filas = metrics.medir_iteracion(
+                "descompresion",
+                iter_padron_zip(
+                    input_zip, expected_fields, separator, progress_callback
+                ),
+            )
+            columnas = normalizar_columnas(next(filas))
+            pos_ruc = columnas.index("ruc")
+
+            if compacto:
+                # la clave primaria es el propio RUC: no hace falta otro índice
+                _crear_esquema_compacto(connection, table_name, columnas)
+                datos, valores = _tablas_compactas(table_name)
+                # los estados se codifican en Python mientras se leen y las filas
+                # van directo a la tabla final, sin una tabla temporal
+                diccionario = {}
+                # con RUCs repetidos queda la última fila, como en la actualización
+                with _contar_reemplazos(connection, datos) as reemplazos:
+                    insertadas = _insertar_filas(
+                        connection,
+                        datos,
+                        _codificar_filas(
+                            _preparar_filas(filas, pos_ruc), columnas, diccionario
+                        ),
+                        batch_size,
+                        modo="INSERT OR REPLACE",
+                    )
+                (repetidos,) = reemplazos
+                rows_processed = insertadas - repetidos
+                if repetidos:
+                    print(f"{repetidos} RUCs repetidos, se conservó la última fila")
+                connection.executemany(
+                    f"INSERT INTO {valores} (id, columna, valor) VALUES (?, ?, ?)",
+                    ((id_, c, v) for (c, v), id_ in diccionario.items()),
+                )
+                connection.commit()
+            else:
+                connection.execute(
+                    f"CREATE TABLE {table_name} ({_definicion_columnas(columnas)})"
+                )
+                rows_processed = _insertar_filas(
+                    connection, table_name, _preparar_filas(filas, pos_ruc), batch_size
+                )
+                _crear_indice(connection, table_name)
+
+            span.filas = rows_processed
+            print(f"{rows_processed} filas insertadas")
+            print(f"Conversion completada en {round(time.time() - start_time, 2)}s")
+        except Exception as e:
+            connection.close()
+            remove(output_db)
+            print(f"Error: {e}")
+            raise
+        else:
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA journal_mode = DELETE")
+            connection.close()
+
+    if indice_nombres:
+        name_search.construir_indice_nombres(output_db, table_name)
+    # al final: el bitmap queda ligado al estado del archivo de la DB
+    if bitmap:
+        ruc_index.construir_bitmap(output_db, table_name)
+    return rows_processed
+
+
+def actualizar_incremental(
+    input_zip,
+    db_path,
+    table_name="main_table",
+    separator="|",
+    expected_fields=4,
+    batch_size=10000,
+    progress_callback=None,
+    indice_nombres=False,
+    bitmap=False,
+    version=None,
+):
+    """
+    Actualiza una DB existente aplicando solo las diferencias con el nuevo padrón.
+    Compara por RUC las columnas proyectadas y aplica inserciones, actualizaciones
+    y eliminaciones en una sola transacción. Devuelve el conteo de cada operación.
+    En la misma transacción registra los cambios de estado y condición en la
+    tabla de cambios (`historial`), etiquetados con `version`.
+    El índice de nombres y el bitmap de RUCs se rehacen si ya existían o si se
+    piden con `indice_nombres` y `bitmap`.
+    """
+    connection = sqlite3.connect(db_path)
+    print("Iniciando actualización incremental...")
+    start_time = time.time()
+    with metrics.medir(
+        "ingesta", bytes=path.getsize(input_zip), origen="zip", modo="incremental"
+    ) as span:
+        try:
+            filas = metrics.medir_iteracion(
+                "descompresion",
+                iter_padron_zip(
+                    input_zip, expected_fields, separator, progress_callback
+                ),
+            )
+            columnas = normalizar_columnas(next(filas))
+            pos_ruc = columnas.index("ruc")
+
+            actuales = [
+                c[1] for c in connection.execute(f"PRAGMA table_info({table_name})")
+            ]
+            if actuales != columnas:
+                raise ValueError(
+                    f"Las columnas del padrón cambiaron ({columnas}), "
+                    "se requiere reconstruir la DB"
+                )
+
+            connection.execute(
+                f"CREATE TEMP TABLE nuevo ({_definicion_columnas(columnas, True)})"
+            )
+            _insertar_filas(
+                connection,
+                "temp.nuevo",
+                _preparar_filas(filas, pos_ruc),
+                batch_size,
+                "INSERT OR REPLACE",
+            )
+            total = connection.execute("SELECT COUNT(*) FROM temp.nuevo").fetchone()[0]
+            span.filas = total
+
+            destino = table_name
+            fuente = "temp.nuevo"
+            compacta = es_compacta(connection, table_name)
+            if compacta:
+                # se compara y escribe sobre la tabla de datos, con estados codificados
+                destino, valores = _tablas_compactas(table_name)
+                fuente = "temp.codificado"
+
+            lista = ", ".join(f'"{c}"' for c in columnas)
+            otras = [c for c in columnas if c != "ruc"]
+            asignaciones = ", ".join(f'"{c}" = n."{c}"' for c in otras)
+            distintas = " OR ".join(f'n."{c}" IS NOT {destino}."{c}"' for c in otras)
+
+            with connection:
+                # se compara con la tabla (o vista) todavía sin actualizar
+                registrados = historial.registrar_cambios(
+                    connection, table_name, "temp.nuevo", columnas, version
+                )
+                if compacta:
+                    _agregar_valores(connection, valores, "temp.nuevo", columnas)
+                    definicion = _definicion_compacta(columnas)
+                    connection.execute(f"CREATE TEMP TABLE codificado ({definicion})")
+                    connection.execute(
+                        "INSERT INTO temp.codificado "
+                        + _select_codificado(columnas, valores, "temp.nuevo")
+                    )
+                eliminados = connection.execute(
+                    f"DELETE FROM {destino} WHERE ruc NOT IN (SELECT ruc FROM {fuente})"
+                ).rowcount
+                actualizados = connection.execute(
+                    f"UPDATE {destino} SET {asignaciones} FROM {fuente} n "
+                    f"WHERE n.ruc = {destino}.ruc AND ({distintas})"
+                ).rowcount
+                insertados = connection.execute(
+                    f"INSERT INTO {destino} ({lista}) SELECT {lista} FROM {fuente} n "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {destino} t WHERE t.ruc = n.ruc)"
+                ).rowcount
+
+            connection.execute("DROP TABLE temp.nuevo")
+            if compacta:
+                connection.execute("DROP TABLE temp.codificado")
+            indice_nombres = indice_nombres or (
+                name_search.indice_nombres_disponible(connection, table_name)
+            )
+        finally:
+            connection.close()
+
+    if indice_nombres:
+        # el índice FTS no guarda contenido: se rehace con los nombres nuevos
+        name_search.construir_indice_nombres(db_path, table_name)
+    if bitmap or path.exists(ruc_index.rutas_bitmap(db_path)["bits"]):
+        ruc_index.construir_bitmap(db_path, table_name)
+
+    conteos = {
+        "insertados": insertados,
+        "actualizados": actualizados,
+        "eliminados": eliminados,
+        "sin_cambios": total - insertados - actualizados,
+    }
+    print(f"Actualización completada en {round(time.time() - start_time, 2)}s")
+    print(", ".join(f"{k}: {v}" for k, v in conteos.items()))
+    print(f"Cambios de estado registrados: {registrados}")
+    return conteos
 
 
 def main():
     """runs in a main execution"""
     input_file = input("TO SANITIZE: ")
     output_db = path.splitext(input_file)[0] + ".db"
+
+    if zipfile.is_zipfile(input_file):
+        convert_zip_to_sql(input_file, output_db)
+        return
+
     TEMP_FILE = ".temp_sanitize.txt"
 
-    sanitize_csv(input_file, TEMP_FILE)
+    sanitize_csv_paralelo(input_file, TEMP_FILE)
     convert_txt_to_sql(TEMP_FILE, output_db)
     remove(TEMP_FILE)
     # convert_txt_to_sql(input_file, output_db, "padron", chunk_size=50000)
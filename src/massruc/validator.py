@@ -0,0 +1,126 @@
+import os
+from collections import OrderedDict
+
+from massruc import ruc_index, ruc_utils
+
+
+class Validator:
+    """
+    Validador reutilizable para llamadas repetidas (integraciones, re-procesos).
+    Mantiene una conexión de solo lectura con sentencias preparadas y una caché
+    LRU acotada de RUCs ya resueltos, que se invalida sola si cambia la DB. Si
+    la DB tiene bitmap de RUCs, los inexistentes se descartan sin consultarla.
+    No es seguro compartir una instancia entre hilos.
+    """
+
+    # tamaños fijos de lote: cada uno es siempre la misma sentencia preparada
+    TAMANOS_LOTE = (1, 8, 64, 512)
+
+    def __init__(self, path_db, table_name="main_table", cache_size=100_000):
+        self.path_db = path_db
+        self.table_name = table_name
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self._con = None
+        self._firma = None
+        self._bitmap = None
+        self.num_columnas = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+
+    def cerrar(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def _firma_db(self):
+        stat = os.stat(self.path_db)
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _verificar_db(self):
+        """Reabre la conexión y vacía la caché si el archivo de la DB cambió"""
+        firma = self._firma_db()
+        if firma == self._firma:
+            return
+
+        self.cerrar()
+        self.cache.clear()
+        self._con = ruc_utils.conectar_solo_lectura(self.path_db)
+        self._bitmap = ruc_index.cargar_bitmap(self.path_db)
+        cursor = self._con.execute(f"SELECT * FROM {self.table_name} LIMIT 0")
+        self.num_columnas = len(cursor.description)
+        self._firma = firma
+
+    def _consultar(self, rucs_enteros):
+        filas = {}
+        pendientes = list(rucs_enteros)
+        while pendientes:
+            tamano = next(
+                (t for t in self.TAMANOS_LOTE if t >= len(pendientes)),
+                self.TAMANOS_LOTE[-1],
+            )
+            lote, pendientes = pendientes[:tamano], pendientes[tamano:]
+            # se completa con el último RUC para reutilizar la misma sentencia
+            lote += lote[-1:] * (tamano - len(lote))
+
+            consulta = (
+                f"SELECT * FROM {self.table_name} WHERE ruc IN "
+                f"({','.join('?' * tamano)})"
+            )
+            for fila in self._con.execute(consulta, lote):
+                filas[fila[0]] = fila
+        return filas
+
+    def buscar(self, rucs_enteros):
+        """Devuelve un dict ruc -> fila con los RUCs encontrados"""
+        self._verificar_db()
+
+        db_cache = {}
+        faltantes = []
+        for ruc in dict.fromkeys(rucs_enteros):
+            if ruc in self.cache:
+                self.cache.move_to_end(ruc)
+                self.hits += 1
+                if self.cache[ruc] is not None:
+                    db_cache[ruc] = self.cache[ruc]
+            else:
+                self.misses += 1
+                faltantes.append(ruc)
+
+        posibles = faltantes
+        if self._bitmap is not None:
+            posibles = self._bitmap.filtrar(faltantes)
+        encontrados = self._consultar(posibles)
+        db_cache.update(encontrados)
+
+        # también se recuerdan los no encontrados
+        for ruc in faltantes:
+            self.cache[ruc] = encontrados.get(ruc)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return db_cache
+
+    def validar(self, documentos):
+        """Igual que `ruc_utils.buscar_rucs`, pero reutilizando conexión y caché"""
+        rucs_limpios, validos, _ = ruc_utils.limpiar_rucs_lote(documentos)
+        db_cache = self.buscar([int(ruc) for ruc in rucs_limpios[validos]])
+        return ruc_utils.armar_resultados(
+            documentos, rucs_limpios, db_cache, self.num_columnas
+        )
+
+    def estadisticas(self):
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / consultas if consultas else 0.0,
+            "en_cache": len(self.cache),
+        }
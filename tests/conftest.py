@@ -0,0 +1,36 @@
+import zipfile
+
+import pytest
+
+from massruc.txt_to_db import convert_zip_to_sql
+
+ENCABEZADO_PADRON = (
+    "RUC|NOMBRE O RAZÓN SOCIAL|ESTADO DEL CONTRIBUYENTE|CONDICIÓN DE DOMICILIO|"
+    "UBIGEO|TIPO DE VÍA|"
+)
+FILAS_PADRON = [
+    "10123456781|PÉREZ GÓMEZ JUAN|ACTIVO|HABIDO|150101|AV.|",
+    "20100070970|SUPERMERCADOS PERUANOS S.A.|ACTIVO|HABIDO|150131|CAL.|",
+    "20131312955|SUPERINTENDENCIA NACIONAL DE ADUANAS|ACTIVO|HABIDO|150101|AV.|",
+    "10000000162|ÑAÑEZ CÁCERES ROSA|BAJA DE OFICIO|NO HALLADO|040101|-|",
+    "linea rota",
+]
+
+
+def escribir_padron_zip(ruta, filas=FILAS_PADRON):
+    contenido = "\r\n".join([ENCABEZADO_PADRON, *filas]) + "\r\n"
+    with zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("padron_reducido_ruc.txt", contenido.encode("latin-1"))
+    return ruta
+
+
+@pytest.fixture
+def padron_zip(tmp_path):
+    return escribir_padron_zip(tmp_path / "padron.zip")
+
+
+@pytest.fixture
+def padron_db(padron_zip, tmp_path):
+    output_db = tmp_path / "padron.db"
+    convert_zip_to_sql(padron_zip, output_db, "padron")
+    return output_db
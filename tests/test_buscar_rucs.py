@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+import pytest
+
+from massruc import metrics, ruc_index
+from massruc.ruc_utils import RUC_QUERY_ERRORS, buscar_rucs
+from massruc.txt_to_db import convert_zip_to_sql
+
+DOCUMENTOS = [
+    "10123456781",
+    " 20100070970 ",
+    "20100070971",  # digito verificador corregido
+    "00000016",  # DNI, se convierte a RUC 10
+    "20999999990",  # no existe
+    "ABC",
+]
+
+
+def test_buscar_rucs_sqlite(padron_db):
+    resultados = buscar_rucs(DOCUMENTOS, padron_db, "padron")
+
+    assert resultados[0] == (
+        "10123456781",
+        10123456781,
+        "PÉREZ GÓMEZ JUAN",
+        "ACTIVO",
+        "HABIDO",
+    )
+    assert resultados[2][1] == 20100070970
+    assert resultados[3][1:3] == (10000000162, "ÑAÑEZ CÁCERES ROSA")
+    assert resultados[4] == (
+        "20999999990",
+        "20999999990",
+        RUC_QUERY_ERRORS["NOT_FOUND"]["text"],
+        "-",
+        "-",
+    )
+    assert resultados[5][1:3] == (None, RUC_QUERY_ERRORS["INVALID_FORMAT"]["text"])
+
+
+@pytest.mark.parametrize("backend", ["sqlite_join", "mmap"])
+def test_buscar_rucs_backends_iguales_a_sqlite(padron_db, backend):
+    ruc_index.construir_indice(padron_db, "padron")
+    documentos = DOCUMENTOS * 3  # con duplicados
+
+    assert buscar_rucs(documentos, padron_db, "padron", backend) == buscar_rucs(
+        documentos, padron_db, "padron"
+    )
+
+
+def test_indice_vigente(padron_db):
+    assert not ruc_index.indice_vigente(padron_db)
+    ruc_index.construir_indice(padron_db, "padron")
+    assert ruc_index.indice_vigente(padron_db)
+
+
+def test_mmap_desfasado_consulta_la_db(padron_db):
+    ruc_index.construir_indice(padron_db, "padron")
+    con = sqlite3.connect(padron_db)
+    with con:
+        con.execute(
+            "UPDATE padron SET estado_del_contribuyente = 'BAJA DE OFICIO' "
+            "WHERE ruc = 20100070970"
+        )
+    con.close()
+    # asegura otra firma aunque el sistema de archivos tenga poca resolución
+    stat = os.stat(padron_db)
+    os.utime(padron_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert ruc_index.cargar_indice(padron_db) is None
+    resultado = buscar_rucs(["20100070970"], padron_db, "padron", "mmap")
+    assert resultado[0][3] == "BAJA DE OFICIO"
+
+
+def test_buscar_rucs_backend_desconocido(padron_db):
+    with pytest.raises(ValueError):
+        buscar_rucs(DOCUMENTOS, padron_db, "padron", "otro")
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sqlite_join", "mmap"])
+def test_buscar_rucs_esquema_compacto(padron_db, padron_zip, tmp_path, backend):
+    compacta = tmp_path / "compacta.db"
+    convert_zip_to_sql(padron_zip, compacta, "padron", compacto=True)
+    if backend == "mmap":
+        ruc_index.construir_indice(compacta, "padron")
+
+    assert buscar_rucs(DOCUMENTOS, compacta, "padron", backend) == buscar_rucs(
+        DOCUMENTOS, padron_db, "padron"
+    )
+
+
+def test_bitmap_prefiltro(padron_db):
+    ruc_index.construir_bitmap(padron_db, "padron")
+    bitmap = ruc_index.cargar_bitmap(padron_db)
+    eventos = []
+    metrics.agregar_sink(eventos.append)
+    try:
+        resultados = buscar_rucs(DOCUMENTOS, padron_db, "padron")
+    finally:
+        metrics.quitar_sink(eventos.append)
+
+    assert bitmap.contiene(
+        [10123456781, 20100070970, 20131312955, 10000000162, 20999999990, 15000000001]
+    ).tolist() == [True, True, True, True, False, False]
+    assert resultados == buscar_rucs(DOCUMENTOS, padron_db, "padron", prefiltro=False)
+    (prefiltro,) = [e for e in eventos if e["etapa"] == "prefiltro"]
+    assert (prefiltro["filas"], prefiltro["descartados"]) == (5, 1)
+
+
+def test_bitmap_desfasado_no_se_usa(padron_db):
+    ruc_index.construir_bitmap(padron_db, "padron")
+    assert ruc_index.bitmap_vigente(padron_db)
+
+    con = sqlite3.connect(padron_db)
+    with con:
+        con.execute("INSERT INTO padron (ruc) VALUES (20999999990)")
+    con.close()
+
+    assert ruc_index.cargar_bitmap(padron_db) is None
+    assert buscar_rucs(["20999999990"], padron_db, "padron")[0][1] == 20999999990
@@ -0,0 +1,102 @@
+import time
+
+import pandas as pd
+import pytest
+
+from massruc import processing, ruc_utils
+from massruc.cache_resultados import CacheResultados, clave_bloque, identidad_padron
+
+DOCUMENTOS = ["10123456781", "00000016", None, "ABC", "20100070970", "20999999990"]
+
+
+@pytest.fixture
+def consultados(monkeypatch):
+    """Documentos que se limpian y consultan, es decir, no salieron de la caché"""
+    recibidos = []
+    preparar_consulta = ruc_utils.preparar_consulta
+
+    def registrar(documentos, *args, **kwargs):
+        recibidos.extend(documentos)
+        return preparar_consulta(documentos, *args, **kwargs)
+
+    monkeypatch.setattr(ruc_utils, "preparar_consulta", registrar)
+    return recibidos
+
+
+def procesar(archivo, padron_db, cache, documentos):
+    pd.DataFrame({"documento": documentos}).to_csv(archivo, index=False)
+    salida, _ = processing.procesar_archivo(
+        archivo, padron_db, "padron", log=lambda _: None, cache=cache
+    )
+    return pd.read_excel(salida, dtype=str, keep_default_na=False)
+
+
+def test_solo_se_consultan_los_bloques_editados(
+    padron_db, tmp_path, monkeypatch, consultados
+):
+    monkeypatch.setattr(processing, "BLOQUE_CACHE", 2)
+    archivo = tmp_path / "clientes.csv"
+    cache = tmp_path / "cache" / "resultados.db"
+
+    primera = procesar(archivo, padron_db, cache, DOCUMENTOS)
+    assert len(consultados) == len(DOCUMENTOS)
+
+    consultados.clear()
+    assert procesar(archivo, padron_db, cache, DOCUMENTOS).equals(primera)
+    assert consultados == []
+
+    editados = DOCUMENTOS[:4] + ["20131312955", "20999999990"]
+    resultado = procesar(archivo, padron_db, cache, editados)
+    # el último documento no cambió y sigue saliendo de la caché
+    assert consultados == ["20131312955"]
+    assert resultado.equals(procesar(tmp_path / "sin.csv", padron_db, None, editados))
+
+
+def test_insertar_una_fila_no_invalida_los_bloques_siguientes(
+    padron_db, tmp_path, monkeypatch, consultados
+):
+    monkeypatch.setattr(processing, "BLOQUE_CACHE", 8)
+    archivo = tmp_path / "clientes.csv"
+    cache = tmp_path / "cache" / "resultados.db"
+    documentos = [f"{i:08d}" for i in range(200)]
+
+    procesar(archivo, padron_db, cache, documentos)
+    consultados.clear()
+    insertados = documentos[:10] + ["20131312955"] + documentos[10:]
+    resultado = procesar(archivo, padron_db, cache, insertados)
+
+    # solo se consulta el sub-bloque con la fila nueva, no todos los siguientes
+    assert "20131312955" in consultados
+    assert len(consultados) <= 4 * 8
+    assert not set(consultados) & set(documentos[50:])
+    assert resultado.equals(procesar(tmp_path / "sin.csv", padron_db, None, insertados))
+
+
+def test_otra_version_del_padron_no_usa_la_cache(padron_db, tmp_path):
+    antes = identidad_padron(padron_db, "padron")
+    time.sleep(0.01)
+    padron_db.touch()
+
+    assert identidad_padron(padron_db, "padron") != antes
+    assert clave_bloque(antes, DOCUMENTOS) != clave_bloque(
+        identidad_padron(padron_db, "padron"), DOCUMENTOS
+    )
+
+
+def test_poda_por_edad_y_tamano(tmp_path):
+    filas = [("10123456781", 10123456781, "PÉREZ GÓMEZ JUAN", "ACTIVO", None)] * 50
+    with CacheResultados(tmp_path / "cache.db", max_edad=3600) as cache:
+        cache.guardar({"vieja": filas, "usada": filas, "nueva": filas})
+        cache.con.execute("UPDATE resultados SET usado = usado - 7200")
+        cache.con.execute(
+            "UPDATE resultados SET usado = usado + 7100 WHERE clave != 'vieja'"
+        )
+        cache.con.execute(
+            "UPDATE resultados SET usado = usado + 50 WHERE clave = 'nueva'"
+        )
+        (tamano,) = cache.con.execute("SELECT bytes FROM resultados LIMIT 1").fetchone()
+        cache.max_bytes = tamano
+
+        assert cache.podar() == 2
+        assert list(cache.obtener(["vieja", "usada", "nueva"])) == ["nueva"]
+        assert cache.obtener(["nueva"])["nueva"] == filas
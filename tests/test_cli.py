@@ -0,0 +1,34 @@
+import pandas as pd
+
+from massruc.cli import main
+
+
+def test_validate_varios_archivos(padron_db, tmp_path, capsys):
+    archivos = []
+    for i in range(3):
+        ruta = tmp_path / f"clientes_{i}.csv"
+        pd.DataFrame({"documento": ["10123456781", "ABC"] * (i + 1)}).to_csv(
+            ruta, index=False
+        )
+        archivos.append(str(ruta))
+    salida = tmp_path / "salida"
+
+    codigo = main(
+        ["validate", *archivos, "--out", str(salida), "--workers", "2"]
+        + ["--db", str(padron_db), "--table", "padron", "--sin-cache"]
+    )
+
+    assert codigo == 0
+    assert len(pd.read_excel(salida / "clientes_2_PROCESADO.xlsx")) == 6
+    assert "3/3 archivos, 12 filas" in capsys.readouterr().out
+
+
+def test_validate_archivo_invalido(padron_db, tmp_path):
+    ruta = tmp_path / "sin_columna.csv"
+    pd.DataFrame({"ruc": ["10123456781"]}).to_csv(ruta, index=False)
+
+    codigo = main(
+        ["validate", str(ruta), "--db", str(padron_db), "--sin-cache"]
+        + ["--columna", "documento"]
+    )
+    assert codigo == 1
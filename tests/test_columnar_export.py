@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+
+from massruc import processing
+from massruc.columnar_export import COLUMNA_ERROR
+from massruc.excel_export import HEADER_RESULTADOS
+from massruc.ruc_utils import RUC_QUERY_ERRORS
+
+NO_ENCONTRADO = RUC_QUERY_ERRORS["NOT_FOUND"]["text"]
+INVALIDO = RUC_QUERY_ERRORS["INVALID_FORMAT"]["text"]
+FILAS = [
+    ("10123456781", 10123456781, "PÉREZ GÓMEZ JUAN", "ACTIVO", "HABIDO"),
+    ("20999999990", "20999999990", NO_ENCONTRADO, "-", "-"),
+    ("ABC", "ABC", INVALIDO, "-", "-"),
+]
+
+
+def leer(ruta):
+    if ruta.suffix == ".csv":
+        return pd.read_csv(ruta, dtype={"RUC Validado": "Int64"})
+    if ruta.suffix == ".parquet":
+        return pd.read_parquet(ruta)
+    return pd.read_feather(ruta)
+
+
+@pytest.fixture(params=[".csv", ".parquet", ".feather"])
+def extension(request):
+    if request.param != ".csv":
+        pytest.importorskip("pyarrow")
+    return request.param
+
+
+def test_exportador_columnar(tmp_path, extension):
+    salida = tmp_path / f"salida{extension}"
+
+    with processing.crear_exportador(salida) as exportador:
+        exportador.escribir_filas(FILAS)
+        exportador.escribir_filas(FILAS[:1])
+
+    df = leer(salida)
+    assert df.columns.tolist() == HEADER_RESULTADOS + [COLUMNA_ERROR]
+    assert df["RUC Validado"].tolist()[:2] == [10123456781, 20999999990]
+    assert df["RUC Validado"].isna().tolist() == [False, False, True, False]
+    assert df[COLUMNA_ERROR].tolist()[1:3] == [NO_ENCONTRADO, INVALIDO]
+    # en las filas con error no quedan los "-" del Excel
+    assert df["Estado de contribuyente"].isna().tolist() == [False, True, True, False]
+    if extension != ".csv":
+        assert df["RUC Validado"].dtype == "Int64"
+        assert df["Estado de contribuyente"].dtype == "category"
+        assert df[COLUMNA_ERROR].dtype == "category"
+
+
+def test_error_no_deja_archivo(tmp_path, extension):
+    salida = tmp_path / f"salida{extension}"
+
+    with pytest.raises(RuntimeError):
+        with processing.crear_exportador(salida) as exportador:
+            exportador.escribir_filas(FILAS)
+            raise RuntimeError("fallo la consulta")
+
+    assert not salida.exists()
+
+
+def test_procesar_archivo_en_parquet(padron_db, tmp_path):
+    pytest.importorskip("pyarrow")
+    clientes = tmp_path / "clientes.csv"
+    pd.DataFrame({"documento": ["10123456781", "ABC"]}).to_csv(clientes, index=False)
+
+    salida, filas = processing.procesar_archivo(
+        clientes, padron_db, "padron", log=lambda _: None, formato="parquet"
+    )
+
+    assert salida.endswith("clientes_PROCESADO.parquet") and filas == 2
+    df = pd.read_parquet(salida)
+    assert df["Nombre o razón social"].isna().tolist() == [False, True]
+    assert df[COLUMNA_ERROR].tolist()[1] == INVALIDO
+
+
+def test_feather_categorias_nuevas_en_otros_bloques(tmp_path):
+    pytest.importorskip("pyarrow")
+    salida = tmp_path / "salida.feather"
+    baja = ("20100070970", 20100070970, "SUPERMERCADOS", "BAJA DE OFICIO", "HABIDO")
+
+    with processing.crear_exportador(salida) as exportador:
+        # el primer bloque no tiene ningún estado y se escribe igual
+        exportador.escribir_filas(FILAS[1:])
+        assert exportador._writer is not None
+        exportador.escribir_filas(FILAS[:1])
+        exportador.escribir_filas([baja])
+
+    df = pd.read_feather(salida)
+    assert df["Estado de contribuyente"].tolist()[2:] == ["ACTIVO", "BAJA DE OFICIO"]
+    assert df["Estado de contribuyente"].dtype == "category"
+    assert df["Estado de contribuyente"].isna().tolist()[:2] == [True, True]
+    assert df[COLUMNA_ERROR].tolist()[:2] == [NO_ENCONTRADO, INVALIDO]
@@ -0,0 +1,155 @@
+import io
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from massruc import ruc_utils
+from massruc.progreso import OperacionCancelada, Progreso
+
+
+def crear_zip(texto):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as z:
+        z.writestr("padron.txt", texto)
+    return buffer.getvalue()
+
+
+class PadronHandler(BaseHTTPRequestHandler):
+    """Servidor local que imita al de SUNAT: ETag, 304, Range e If-Range"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.responder(cuerpo=False)
+
+    def do_GET(self):
+        self.responder(cuerpo=True)
+
+    def responder(self, cuerpo):
+        servidor = self.server
+        servidor.peticiones.append(dict(self.headers))
+        contenido, etag = servidor.contenido, servidor.etag
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        inicio, fin = 0, len(contenido) - 1
+        rango = self.headers.get("Range")
+        if rango and self.headers.get("If-Range", etag) == etag:
+            desde, hasta = rango.removeprefix("bytes=").split("-")
+            inicio, fin = int(desde), int(hasta) if hasta else fin
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{fin}/{len(contenido)}")
+        else:
+            self.send_response(200)
+
+        parte = contenido[inicio : fin + 1]
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(parte)))
+        self.end_headers()
+        if not cuerpo:
+            return
+
+        if servidor.cortar_en is not None:
+            # simula una conexión interrumpida a mitad de la transferencia
+            self.wfile.write(parte[: servidor.cortar_en])
+            servidor.cortar_en = None
+            self.close_connection = True
+            return
+        self.wfile.write(parte)
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PadronHandler)
+    httpd.contenido = crear_zip("RUC|NOMBRE\n" * 50000)
+    httpd.etag = '"v1"'
+    httpd.cortar_en = None
+    httpd.peticiones = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(servidor):
+    return f"http://127.0.0.1:{servidor.server_address[1]}/padron.zip"
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_descarga_y_no_cambio(servidor, tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(ruc_utils, "PIEZA_DESCARGA", 64 * 1024)
+    destino = tmp_path / "padron.zip"
+
+    assert ruc_utils.descargar_padron_reducido(
+        destino, url=url(servidor), workers=workers
+    )
+    assert destino.read_bytes() == servidor.contenido
+
+    # sin cambios en el servidor, responde 304 y no se descarga nada
+    assert not ruc_utils.descargar_padron_reducido(
+        destino, url=url(servidor), workers=workers
+    )
+    assert servidor.peticiones[-1]["If-None-Match"] == '"v1"'
+
+
+def test_descarga_retoma_parcial(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(ruc_utils, "CHUNK_DESCARGA", 10_000)
+    destino = tmp_path / "padron.zip"
+    servidor.cortar_en = 100_000
+
+    with pytest.raises(Exception):
+        ruc_utils.descargar_padron_reducido(destino, url=url(servidor))
+    assert not destino.exists()
+
+    assert ruc_utils.descargar_padron_reducido(destino, url=url(servidor))
+    assert servidor.peticiones[-1]["Range"] == "bytes=100000-"
+    assert destino.read_bytes() == servidor.contenido
+    assert not (tmp_path / "padron.zip.part").exists()
+
+
+def test_descarga_corrupta_no_reemplaza(servidor, tmp_path):
+    destino = tmp_path / "padron.zip"
+    destino.write_bytes(b"anterior")
+    servidor.contenido = b"no es un zip"
+
+    with pytest.raises(IOError):
+        ruc_utils.descargar_padron_reducido(destino, url=url(servidor))
+    assert destino.read_bytes() == b"anterior"
+
+
+def test_descarga_cancelada_se_retoma(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(ruc_utils, "CHUNK_DESCARGA", 10_000)
+    destino = tmp_path / "padron.zip"
+    avances = []
+
+    def cancelar_a_mitad(fraccion):
+        avances.append(fraccion)
+        if fraccion > 0.5:
+            progreso.cancelar()
+
+    progreso = Progreso(cancelar_a_mitad, intervalo=0)
+    with pytest.raises(OperacionCancelada):
+        ruc_utils.descargar_padron_reducido(
+            destino, progress_callback=progreso, url=url(servidor)
+        )
+    assert not destino.exists()
+
+    assert ruc_utils.descargar_padron_reducido(destino, url=url(servidor))
+    assert servidor.peticiones[-1]["Range"].startswith("bytes=")
+    assert destino.read_bytes() == servidor.contenido
+
+
+def test_head_rechazado_descarga_en_serie(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(PadronHandler, "do_HEAD", lambda self: self.send_error(405))
+    destino = tmp_path / "padron.zip"
+
+    assert ruc_utils.descargar_padron_reducido(destino, url=url(servidor), workers=4)
+    assert destino.read_bytes() == servidor.contenido
+    assert "Range" not in servidor.peticiones[-1]
@@ -0,0 +1,125 @@
+import pandas as pd
+import pytest
+
+from massruc import deteccion
+from massruc.processing import procesar_archivo
+
+RUCS = ["10123456781", "20100070970", "20131312955", "10000000162"]
+
+
+def test_puntuar():
+    assert deteccion.puntuar(RUCS + [None, ""]) == 1.0
+    # DNIs: se convierten a RUC 10 sin corregir nada
+    assert deteccion.puntuar(["12345678", "87654321"]) == 1.0
+    # números de 11 cifras cualquiera: se aceptan corrigiendo el dígito
+    assert deteccion.puntuar(["20600000011", "99999999990"]) == 0.5
+    # el dígito puede coincidir, pero 51 no es un prefijo de RUC
+    assert deteccion.puntuar(["51987654321"]) == 0.5
+    assert deteccion.puntuar(["JUAN", "1001", "ABC"]) == 0.0
+    assert deteccion.puntuar([None, ""]) == 0.0
+
+
+@pytest.fixture
+def libro(tmp_path):
+    ruta = tmp_path / "clientes.xlsx"
+    with pd.ExcelWriter(ruta) as writer:
+        pd.DataFrame({"Resumen": ["Clientes activos", "Total"]}).to_excel(
+            writer, sheet_name="Portada", index=False
+        )
+        pd.DataFrame(
+            {
+                "Código": ["1001", "1002", "1003", "1004"],
+                "Teléfono": ["987654321", "912345678", "", "01234567"],
+                "Nro. identificación": RUCS,
+                "Razón social": ["A", "B", "C", "D"],
+            }
+        ).to_excel(writer, sheet_name="Clientes", index=False)
+    return ruta
+
+
+def test_detecta_hoja_y_columna(libro):
+    candidatos = deteccion.detectar_columnas(libro)
+
+    assert (candidatos[0]["hoja"], candidatos[0]["columna"]) == (
+        "Clientes",
+        "Nro. identificación",
+    )
+    assert deteccion.detectar_columna(libro) == ("Clientes", "Nro. identificación", 1.0)
+
+
+def test_procesar_archivo_detecta_columna(libro, padron_db):
+    mensajes = []
+
+    salida, filas = procesar_archivo(libro, padron_db, "padron", log=mensajes.append)
+
+    assert filas == 4
+    assert "'Nro. identificación' de la hoja 'Clientes'" in mensajes[0]
+    df = pd.read_excel(salida, dtype=str)
+    assert df["RUC Validado"].tolist() == RUCS
+
+
+def test_columna_indicada(libro, padron_db):
+    _, filas = procesar_archivo(
+        libro, padron_db, "padron", columna="Código", hoja="Clientes", log=print
+    )
+    assert filas == 4
+
+    with pytest.raises(LookupError):
+        procesar_archivo(libro, padron_db, "padron", columna="Código", log=print)
+
+
+def test_sin_candidatos(tmp_path):
+    ruta = tmp_path / "nombres.csv"
+    pd.DataFrame({"nombre": ["JUAN", "ROSA"]}).to_csv(ruta, index=False)
+
+    with pytest.raises(LookupError):
+        deteccion.detectar_columna(ruta)
+
+
+def test_hoja_indicada_limita_la_deteccion(libro, padron_db):
+    with pd.ExcelWriter(libro, mode="a") as writer:
+        pd.DataFrame({"ruc": ["20100070970", "10000000162"]}).to_excel(
+            writer, sheet_name="Ventas", index=False
+        )
+
+    assert deteccion.detectar_columna(libro, hoja="Ventas") == ("Ventas", "ruc", 1.0)
+    mensajes = []
+    _, filas = procesar_archivo(
+        libro, padron_db, "padron", hoja="Ventas", log=mensajes.append
+    )
+    assert filas == 2
+    assert "de la hoja 'Ventas'" in mensajes[0]
+
+    with pytest.raises(LookupError, match="hoja"):
+        deteccion.detectar_columna(libro, hoja="Compras")
+
+
+def test_dni_gana_a_telefonos(tmp_path):
+    ruta = tmp_path / "clientes.csv"
+    pd.DataFrame(
+        {
+            "telefono": [f"5198765432{i}" for i in range(10)],
+            "documento": [f"4512345{i}" for i in range(10)],
+        }
+    ).to_csv(ruta, index=False)
+
+    assert deteccion.detectar_columna(ruta) == (None, "documento", 1.0)
+
+
+def test_nombre_exacto_gana(tmp_path):
+    ruta = tmp_path / "clientes.csv"
+    pd.DataFrame({"codigo": RUCS, "RUC": RUCS[:2] + ["ABC", "1001"]}).to_csv(
+        ruta, index=False
+    )
+
+    assert deteccion.detectar_columna(ruta)[1] == "RUC"
+
+
+def test_solo_encabezados_elige_por_nombre(tmp_path, padron_db):
+    ruta = tmp_path / "vacio.csv"
+    ruta.write_text("nombre,documento\n", encoding="utf-8")
+
+    assert deteccion.detectar_columna(ruta) == (None, "documento", 0.0)
+    salida, filas = procesar_archivo(ruta, padron_db, "padron", log=lambda _: None)
+    assert filas == 0
+    assert pd.read_excel(salida).empty
@@ -0,0 +1,27 @@
+from openpyxl import load_workbook
+
+from massruc.excel_export import HEADER_RESULTADOS, ExportadorExcel
+from massruc.ruc_utils import RUC_QUERY_ERRORS
+
+
+def test_exportador_excel(tmp_path):
+    salida = tmp_path / "salida.xlsx"
+    no_encontrado = RUC_QUERY_ERRORS["NOT_FOUND"]
+    filas = [
+        ("10123456781", 10123456781, "PÉREZ GÓMEZ JUAN", "ACTIVO", "HABIDO"),
+        ("20999999990", "20999999990", no_encontrado["text"], "-", "-"),
+    ] * 3
+
+    with ExportadorExcel(salida, filas_muestra=2) as exportador:
+        exportador.escribir_filas(filas)
+
+    worksheet = load_workbook(salida)["Resultados"]
+    valores = list(worksheet.iter_rows(values_only=True))
+    assert list(valores[0]) == HEADER_RESULTADOS
+    assert valores[1] == tuple(map(str, filas[0]))
+    assert len(valores) == len(filas) + 1
+
+    assert worksheet["A2"].fill.fill_type is None
+    assert worksheet["E3"].fill.start_color.rgb.endswith(no_encontrado["color"])
+    assert worksheet.column_dimensions["C"].width == len(HEADER_RESULTADOS[2]) + 2
+    assert worksheet.column_dimensions["A"].width == len(HEADER_RESULTADOS[0]) + 2
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from massruc.file_reader import estimar_filas, iter_documentos, muestrear_columnas
+from massruc.processing import procesar_archivo
+
+DOCUMENTOS = ["10123456781", "00000016", None, "ABC", "20100070970"]
+
+
+@pytest.fixture(params=["xlsx", "csv", "parquet"])
+def archivo_clientes(request, tmp_path):
+    ruta = tmp_path / f"clientes.{request.param}"
+    df = pd.DataFrame({"Cliente": list("abcde"), " DOCUMENTO ": DOCUMENTOS})
+    if request.param == "xlsx":
+        df.to_excel(ruta, index=False)
+    elif request.param == "csv":
+        df.to_csv(ruta, index=False, sep=";")
+    else:
+        pytest.importorskip("pyarrow")
+        df.to_parquet(ruta, index=False)
+    return ruta
+
+
+def test_iter_documentos_por_bloques(archivo_clientes):
+    bloques = list(iter_documentos(archivo_clientes, chunk_size=2))
+
+    assert [len(b) for b in bloques] == [2, 2, 1]
+    documentos = pd.concat(bloques, ignore_index=True)
+    assert documentos.where(documentos.notna(), None).tolist() == DOCUMENTOS
+
+
+def test_iter_documentos_sin_columna(archivo_clientes):
+    with pytest.raises(LookupError):
+        next(iter_documentos(archivo_clientes, columna="ruc"))
+
+
+def test_procesar_archivo(archivo_clientes, padron_db, tmp_path):
+    salida = tmp_path / "salida.xlsx"
+
+    nombre_salida, total = procesar_archivo(
+        archivo_clientes, padron_db, "padron", salida, chunk_size=2
+    )
+
+    resultado = pd.read_excel(nombre_salida, dtype=str)
+    assert total == len(DOCUMENTOS) == len(resultado)
+    assert resultado["RUC Validado"].tolist()[:2] == ["10123456781", "10000000162"]
+    assert estimar_filas(archivo_clientes) in (None, len(DOCUMENTOS))
+
+
+def test_csv_en_cp1252(tmp_path):
+    ruta = tmp_path / "clientes.csv"
+    nombres = ["PEÑA RÍOS JOSÉ", "Comercial “El Sol”", "ÁLVAREZ", "Muñoz", "IBÁÑEZ"]
+    df = pd.DataFrame({"Razón social": nombres, "Documento": DOCUMENTOS})
+    df.to_csv(ruta, index=False, sep=";", encoding="cp1252")
+
+    documentos = pd.concat(iter_documentos(ruta), ignore_index=True)
+    assert documentos.where(documentos.notna(), None).tolist() == DOCUMENTOS
+    muestra = {columna: valores for _, columna, valores in muestrear_columnas(ruta)}
+    assert muestra["Razón social"] == nombres
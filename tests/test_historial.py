@@ -0,0 +1,77 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+from conftest import escribir_padron_zip
+
+from massruc import historial
+from massruc.processing import procesar_archivo
+from massruc.txt_to_db import actualizar_incremental, convert_zip_to_sql
+
+NUEVAS_FILAS = [
+    "10123456781|PÉREZ GÓMEZ JUAN|ACTIVO|HABIDO|150101|AV.|",
+    "20100070970|SUPERMERCADOS PERUANOS S.A.|BAJA DE OFICIO|HABIDO|150131||",
+    "10000000162|ÑAÑEZ CÁCERES ROSA|BAJA DE OFICIO|NO HALLADO|040101|-|",
+    "20600000013|NUEVA EMPRESA S.A.C.|ACTIVO||150101|-|",
+]
+CLIENTES = ["10123456781", "20100070970", "20131312955", "20999999990", "ABC"]
+
+
+@pytest.mark.parametrize("compacto", [False, True])
+def test_registra_transiciones(padron_zip, tmp_path, compacto):
+    path_db = tmp_path / "padron.db"
+    convert_zip_to_sql(padron_zip, path_db, "padron", compacto=compacto)
+    assert historial.leer_cambios(path_db, "padron") is None
+
+    nuevo_zip = escribir_padron_zip(tmp_path / "nuevo.zip", NUEVAS_FILAS)
+    actualizar_incremental(nuevo_zip, path_db, "padron", version="2024-06-01")
+    cambios = historial.leer_cambios(path_db, "padron").set_index("ruc")
+
+    assert sorted(cambios.index) == [20100070970, 20131312955, 20600000013]
+    assert (cambios["version"] == "2024-06-01").all()
+    transicion = cambios.loc[20100070970, ["tipo", "estado_anterior", "estado_nuevo"]]
+    assert transicion.tolist() == ["cambio", "ACTIVO", "BAJA DE OFICIO"]
+    assert cambios.loc[20131312955, "tipo"] == "baja"
+    assert cambios.loc[20600000013, "tipo"] == "alta"
+    assert pd.isna(cambios.loc[20600000013, "condicion_nueva"])
+    assert historial.rucs_cambiados(path_db, "padron", desde="2999") == set()
+
+
+@pytest.fixture
+def salida_anterior(padron_db, tmp_path):
+    clientes = tmp_path / "clientes.csv"
+    pd.DataFrame({"documento": CLIENTES}).to_csv(clientes, index=False)
+    salida, _ = procesar_archivo(clientes, padron_db, "padron", log=lambda _: None)
+    # la salida es anterior a la actualización del padrón
+    hace_un_minuto = time.time() - 60
+    os.utime(salida, (hace_un_minuto, hace_un_minuto))
+    return salida
+
+
+def test_revalidar_salida_reporta_solo_cambios(salida_anterior, padron_db, tmp_path):
+    nuevo_zip = escribir_padron_zip(tmp_path / "nuevo.zip", NUEVAS_FILAS)
+    actualizar_incremental(nuevo_zip, padron_db, "padron")
+
+    reporte, filas, cambiadas = historial.revalidar_salida(
+        salida_anterior, padron_db, "padron", log=lambda _: None
+    )
+
+    assert (filas, cambiadas) == (5, 2)
+    df = pd.read_excel(reporte, dtype=str)
+    assert df.columns.tolist() == historial.HEADER_CAMBIOS
+    assert df[["RUC Validado", "Estado anterior", "Estado actual"]].values.tolist() == [
+        ["20100070970", "ACTIVO", "BAJA DE OFICIO"],
+        ["20131312955", "ACTIVO", "-"],
+    ]
+
+
+def test_revalidar_sin_registro_revisa_todo(salida_anterior, padron_db):
+    mensajes = []
+
+    _, filas, cambiadas = historial.revalidar_salida(
+        salida_anterior, padron_db, "padron", log=mensajes.append
+    )
+
+    assert (filas, cambiadas) == (5, 0)
+    assert "no tiene registro de cambios" in mensajes[0]
@@ -0,0 +1,84 @@
+import json
+
+import pandas as pd
+import pytest
+
+from massruc import metrics, processing
+
+
+@pytest.fixture
+def eventos():
+    recibidos = []
+    sink = metrics.agregar_sink(recibidos.append)
+    yield recibidos
+    metrics.quitar_sink(sink)
+
+
+def test_medir_emite_evento(eventos):
+    with metrics.medir("consulta", filas=100, backend="sqlite") as span:
+        span.bytes = 2048
+
+    (evento,) = eventos
+    assert evento["etapa"] == "consulta"
+    assert evento["filas"] == 100
+    assert evento["bytes"] == 2048
+    assert evento["backend"] == "sqlite"
+    assert evento["segundos"] >= 0
+    assert "error" not in evento
+
+
+def test_medir_registra_error(eventos):
+    with pytest.raises(ValueError):
+        with metrics.medir("ingesta"):
+            raise ValueError("columnas distintas")
+
+    assert eventos[0]["error"] == "ValueError: columnas distintas"
+
+
+def test_sin_sinks_no_mide():
+    assert not metrics.activo()
+    datos = [1, 2, 3]
+    assert metrics.medir_iteracion("lectura", datos) is datos
+
+
+def test_agrupar_suma_por_etapa(eventos):
+    with metrics.agrupar():
+        for bloque in metrics.medir_iteracion("lectura", [[1, 2], [3]], contar=len):
+            with metrics.medir("consulta", filas=len(bloque)):
+                pass
+        assert eventos == []
+
+    por_etapa = {e["etapa"]: e for e in eventos}
+    assert por_etapa["lectura"]["filas"] == 3
+    assert por_etapa["consulta"]["filas"] == 3
+    assert por_etapa["consulta"]["veces"] == 2
+
+
+def test_sink_jsonl(tmp_path):
+    ruta = tmp_path / "metricas.jsonl"
+    sink = metrics.agregar_sink(metrics.SinkJsonl(ruta))
+    try:
+        with metrics.medir("descarga", bytes=10):
+            pass
+    finally:
+        metrics.quitar_sink(sink)
+
+    (linea,) = ruta.read_text(encoding="utf-8").splitlines()
+    assert json.loads(linea)["etapa"] == "descarga"
+
+
+def test_procesar_archivo_mide_etapas(eventos, padron_db, tmp_path):
+    ruta = tmp_path / "clientes.csv"
+    pd.DataFrame({"documento": ["10123456781", "ABC", "00000016"]}).to_csv(
+        ruta, index=False
+    )
+
+    processing.procesar_archivo(
+        str(ruta), padron_db, "padron", chunk_size=2, log=lambda m: None
+    )
+
+    por_etapa = {e["etapa"]: e for e in eventos}
+    assert {"lectura", "limpieza", "consulta", "exportacion"} <= set(por_etapa)
+    assert por_etapa["lectura"]["filas"] == 3
+    assert por_etapa["limpieza"]["veces"] == 2
+    assert por_etapa["exportacion"]["bytes"] > 0
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+from conftest import escribir_padron_zip
+
+from massruc.cli import main
+from massruc.name_search import (
+    BuscadorNombres,
+    buscar_nombres,
+    construir_indice_nombres,
+    similitud,
+)
+from massruc.txt_to_db import actualizar_incremental, convert_zip_to_sql
+
+
+@pytest.fixture
+def padron_nombres(padron_zip, tmp_path):
+    path_db = tmp_path / "nombres.db"
+    convert_zip_to_sql(padron_zip, path_db, "padron", indice_nombres=True)
+    return path_db
+
+
+def test_buscar_nombres(padron_nombres):
+    resultados = buscar_nombres(
+        ["perez gomez juan", "SUPERMERC", "ñañez", "aduanas nacional", None],
+        padron_nombres,
+        "padron",
+    )
+
+    mejores = [candidatos[0][0] if candidatos else None for candidatos in resultados]
+    assert mejores == [10123456781, 20100070970, 10000000162, 20131312955, None]
+    assert resultados[0][0][1:] == ("PÉREZ GÓMEZ JUAN", "ACTIVO", "HABIDO", 1.0)
+
+
+@pytest.mark.parametrize("nombre", ["servicios generales", "servicios"])
+def test_mejor_candidato_entre_muchas_coincidencias(tmp_path, nombre):
+    # más coincidencias que LIMITE_FTS, todas con RUC menor que el buscado
+    filas = [
+        f"{20100000000 + i}|{nombre.upper()} DEL NORTE {i} S.A.C.|ACTIVO||150101|-|"
+        for i in range(150)
+    ]
+    filas.append(f"20600000013|{nombre.upper()}|ACTIVO||150101|-|")
+    path_db = tmp_path / "comunes.db"
+    convert_zip_to_sql(
+        escribir_padron_zip(tmp_path / "comunes.zip", filas),
+        path_db,
+        "padron",
+        indice_nombres=True,
+    )
+
+    (candidatos,) = buscar_nombres([nombre], path_db, "padron")
+    assert candidatos[0][0] == 20600000013
+    assert candidatos[0][-1] == 1.0
+
+
+def test_similitud_solo_identico_es_uno():
+    assert similitud(["perez", "juan"], ["perez", "juan"]) == 1.0
+    assert similitud(["juan", "perez"], ["perez", "juan"]) < 1.0
+    # las letras sueltas no cuentan como prefijo
+    assert similitud(["s", "a"], ["supermercados", "peruanos", "s", "a"]) <= 0.99
+
+
+def test_sin_indice_de_nombres(padron_db):
+    with pytest.raises(LookupError):
+        BuscadorNombres(sqlite3.connect(padron_db), "padron")
+
+
+@pytest.mark.parametrize("compacto", [False, True])
+def test_indice_tras_actualizar_incremental(padron_zip, tmp_path, compacto):
+    path_db = tmp_path / "padron.db"
+    convert_zip_to_sql(padron_zip, path_db, "padron", compacto=compacto)
+    construir_indice_nombres(path_db, "padron")
+    nuevo_zip = escribir_padron_zip(
+        tmp_path / "nuevo.zip",
+        ["20600000011|NUEVA EMPRESA S.A.C.|ACTIVO||150101|-|"],
+    )
+
+    actualizar_incremental(nuevo_zip, path_db, "padron")
+
+    nueva, eliminada = buscar_nombres(["nueva empresa", "perez"], path_db, "padron")
+    assert nueva[0][0] == 20600000011
+    assert eliminada == []
+
+
+def test_cli_search(padron_nombres, tmp_path, capsys):
+    archivo = tmp_path / "nombres.csv"
+    pd.DataFrame({"nombre": ["Supermercados Peruanos", "NADIE"]}).to_csv(
+        archivo, index=False
+    )
+    salida = tmp_path / "nombres.xlsx"
+    opciones = ["--db", str(padron_nombres), "--table", "padron"]
+
+    assert main(["search", "rosa ñañez", *opciones]) == 0
+    assert "10000000162 | ÑAÑEZ CÁCERES ROSA" in capsys.readouterr().out
+    codigo = main(
+        ["search", "--archivo", str(archivo), "--out", str(salida), *opciones]
+    )
+
+    assert codigo == 0
+
+    df = pd.read_excel(salida, dtype=str)
+    assert df["RUC"].tolist()[0] == "20100070970"
+    assert df["Nombre o razón social"].tolist()[-1] == "NO SE ENCONTRÓ"
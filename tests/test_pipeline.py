@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from massruc import metrics
+from massruc.pipeline import Etapa, Pipeline
+
+
+def bloques(cantidad, tamano=3):
+    return ([i] * tamano for i in range(cantidad))
+
+
+def test_entrega_en_orden_con_varios_workers():
+    escritos = []
+
+    def lento_si_par(bloque):
+        # los bloques pares tardan más: los impares terminan antes
+        time.sleep(0.02 if bloque[0] % 2 == 0 else 0)
+        return [x * 10 for x in bloque]
+
+    etapas = [Etapa("limpieza", lento_si_par, workers=3), Etapa("consulta", list)]
+    with Pipeline(bloques(10), etapas, Etapa("escritura", escritos.append)) as flujo:
+        filas = list(flujo.resultados())
+
+    assert filas == [3] * 10
+    assert [bloque[0] for bloque in escritos] == [i * 10 for i in range(10)]
+    assert [(e.nombre, e.bloques, e.filas) for e in flujo.contadores] == [
+        ("lectura", 10, 30),
+        ("limpieza", 10, 30),
+        ("consulta", 10, 30),
+        ("escritura", 10, 30),
+    ]
+
+
+@pytest.mark.parametrize("cantidad", [0, 1])
+def test_un_solo_bloque_sin_hilos(cantidad):
+    escritos = []
+    antes = threading.active_count()
+
+    etapas = [Etapa("limpieza", lambda b: [x + 1 for x in b], workers=2)]
+    with Pipeline(bloques(cantidad), etapas, Etapa("e", escritos.append)) as flujo:
+        assert threading.active_count() == antes
+        assert list(flujo.resultados()) == [3] * cantidad
+
+    assert escritos == [[1, 1, 1]] * cantidad
+    assert [e.filas for e in flujo.contadores] == [3 * cantidad] * 3
+
+
+def test_una_etapa_lenta_frena_la_lectura():
+    leidos = []
+    liberar = threading.Event()
+
+    def fuente():
+        for i in range(50):
+            leidos.append(i)
+            yield [i]
+
+    def bloqueada(bloque):
+        liberar.wait()
+        return bloque
+
+    etapas = [Etapa("consulta", bloqueada)]
+    with Pipeline(fuente(), etapas, Etapa("escritura", len), capacidad=2) as flujo:
+        time.sleep(0.2)
+        # uno en la etapa, dos en su cola de entrada y uno esperando lugar
+        assert len(leidos) <= 4
+        liberar.set()
+        assert sum(flujo.resultados()) == 50
+
+
+def test_error_en_una_etapa_se_relanza():
+    def falla(bloque):
+        if bloque[0] == 3:
+            raise RuntimeError("No se pudo consultar la base de datos")
+        return bloque
+
+    with pytest.raises(RuntimeError, match="consultar"):
+        with Pipeline(bloques(10), [Etapa("consulta", falla)], Etapa("e", len)) as f:
+            list(f.resultados())
+
+
+def test_salir_antes_detiene_los_hilos():
+    cerrada = threading.Event()
+
+    def fuente():
+        try:
+            for i in range(1000):
+                yield [i]
+        finally:
+            cerrada.set()
+
+    antes = threading.active_count()
+    with Pipeline(fuente(), [Etapa("consulta", list)], Etapa("e", len)) as flujo:
+        for i, _ in enumerate(flujo.resultados()):
+            if i == 2:
+                break
+
+    assert cerrada.is_set()
+    assert threading.active_count() == antes
+
+
+def test_metricas_de_los_hilos_van_al_grupo():
+    eventos = []
+    metrics.agregar_sink(eventos.append)
+
+    def medida(bloque):
+        with metrics.medir("limpieza", filas=len(bloque)):
+            return bloque
+
+    try:
+        with metrics.agrupar() as grupo:
+            etapas = [Etapa("limpieza", medida, workers=2)]
+            with Pipeline(bloques(4), etapas, Etapa("e", len), grupo=grupo) as f:
+                list(f.resultados())
+    finally:
+        metrics.quitar_sink(eventos.append)
+
+    limpieza = [e for e in eventos if e["etapa"] == "limpieza"]
+    assert len(limpieza) == 1
+    assert limpieza[0]["veces"] == 4 and limpieza[0]["filas"] == 12
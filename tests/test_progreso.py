@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from massruc.processing import procesar_archivo
+from massruc.progreso import OperacionCancelada, Progreso, como_progreso
+from massruc.txt_to_db import convert_zip_to_sql, sanitize_csv
+
+
+def test_progreso_limita_frecuencia():
+    avances = []
+    progreso = Progreso(avances.append, intervalo=60)
+
+    for i in range(1000):
+        progreso.reportar(i / 1000)
+    progreso.reportar(1.0)
+
+    # el primero pasa, el resto espera el intervalo; el final siempre se informa
+    assert avances == [0.0, 1.0]
+    assert como_progreso(progreso) is progreso
+
+
+def test_progreso_cancelado():
+    progreso = como_progreso(None)
+    progreso.reportar(0.5)
+    progreso.cancelar()
+
+    with pytest.raises(OperacionCancelada):
+        progreso.reportar(0.6)
+
+
+def test_ingesta_cancelada_no_deja_db(padron_zip, tmp_path):
+    progreso = Progreso()
+    progreso.cancelar()
+    destino = tmp_path / "padron.db"
+
+    with pytest.raises(OperacionCancelada):
+        convert_zip_to_sql(padron_zip, destino, "padron", progress_callback=progreso)
+    assert not destino.exists()
+
+
+def test_sanitize_cancelado_no_deja_salida(tmp_path):
+    entrada = tmp_path / "padron.txt"
+    entrada.write_text("A|B|C|D\n" * 30000, encoding="latin-1")
+    salida = tmp_path / "limpio.txt"
+    progreso = Progreso()
+    progreso.cancelar()
+
+    with pytest.raises(OperacionCancelada):
+        sanitize_csv(entrada, salida, progress_callback=progreso)
+    assert not salida.exists()
+
+
+def test_procesar_archivo_cancelado(padron_db, tmp_path):
+    archivo = tmp_path / "clientes.csv"
+    pd.DataFrame({"documento": ["10123456781"] * 10}).to_csv(archivo, index=False)
+    progreso = Progreso()
+    progreso.cancelar()
+
+    with pytest.raises(OperacionCancelada):
+        procesar_archivo(
+            str(archivo),
+            padron_db,
+            "padron",
+            log=lambda _: None,
+            progress_callback=progreso,
+        )
+    assert not (tmp_path / "clientes_PROCESADO.xlsx").exists()
@@ -1,6 +1,7 @@
+import pandas as pd
 import pytest
 
-from massruc.ruc_utils import limpiar_ruc
+from massruc.ruc_utils import limpiar_ruc, limpiar_rucs_lote
 
 
 @pytest.mark.parametrize(
@@ -28,3 +29,27 @@ def test_limpiar_ruc_exitoso(entrada, esperado):
 )
 def test_limpiar_ruc_fallido(entrada_invalida):
     assert limpiar_ruc(entrada_invalida) is None
+
+
+def test_limpiar_rucs_lote_igual_a_limpiar_ruc():
+    documentos = [
+        "10123456781",
+        " 10123456781 ",
+        "10123456780",
+        10123456781,
+        "00000016",
+        "١٢٣٤٥٦٧٨",  # dígitos no ASCII, isdigit() los acepta
+        "1234567",
+        "1012345678i",
+        "10-12345678-1",
+        "",
+        None,
+        float("nan"),
+    ]
+
+    rucs, validos, digitos = limpiar_rucs_lote(pd.Series(documentos))
+
+    esperados = [limpiar_ruc(doc) for doc in documentos]
+    assert rucs.tolist() == esperados
+    assert validos.tolist() == [ruc is not None for ruc in esperados]
+    assert digitos.tolist() == [int(r[-1]) if r else -1 for r in esperados]
@@ -0,0 +1,123 @@
+import asyncio
+import http.client
+import json
+import socket
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from massruc import ruc_utils
+from massruc.server import PoolCerrado, PoolConexiones, ServidorRuc
+
+
+@pytest.fixture
+def servicio(padron_db):
+    servidor = ServidorRuc(padron_db, "padron", conexiones=2)
+    loop = asyncio.new_event_loop()
+    tcp = loop.run_until_complete(servidor.iniciar("127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    conexion = http.client.HTTPConnection("127.0.0.1", tcp.sockets[0].getsockname()[1])
+    yield conexion
+
+    async def apagar():
+        tcp.close()
+        await tcp.wait_closed()
+        await asyncio.sleep(0.05)  # deja terminar las conexiones abiertas
+
+    conexion.close()
+    asyncio.run_coroutine_threadsafe(apagar(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    servidor.cerrar()
+
+
+def pedir(conexion, metodo, ruta, cuerpo=None):
+    conexion.request(metodo, ruta, body=None if cuerpo is None else json.dumps(cuerpo))
+    respuesta = conexion.getresponse()
+    return respuesta.status, json.loads(respuesta.read())
+
+
+def test_consulta_individual_y_lote(servicio):
+    estado, ruc = pedir(servicio, "GET", "/ruc/00000016")
+    assert estado == 200
+    assert ruc["ruc"] == "10000000162"
+    assert ruc["razon_social"] == "ÑAÑEZ CÁCERES ROSA"
+    assert ruc["error"] is None
+
+    # la misma conexión se reutiliza (keep-alive)
+    estado, lote = pedir(
+        servicio, "POST", "/rucs", {"documentos": ["ABC", "20999999990"]}
+    )
+    assert estado == 200
+    assert [r["error"] for r in lote["resultados"]] == ["INVALID_FORMAT", "NOT_FOUND"]
+
+    estado, metricas = pedir(servicio, "GET", "/metrics")
+    assert metricas["peticiones"] == 2
+    assert metricas["rucs"] == 3
+    assert metricas["p99_ms"] >= metricas["p50_ms"] > 0
+
+
+def test_errores_de_peticion(servicio):
+    assert pedir(servicio, "POST", "/rucs", {"otro": 1})[0] == 400
+    assert pedir(servicio, "GET", "/no-existe")[0] == 404
+    # JSON válido que no es un objeto
+    assert pedir(servicio, "POST", "/rucs", ["20100070970"])[0] == 400
+
+
+@pytest.mark.parametrize(
+    "peticion",
+    [
+        b"GET\r\n\r\n",
+        b"GET /health HTTP/1.1\r\nsin dos puntos\r\n\r\n",
+        b"POST /rucs HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+        b"POST /rucs HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+    ],
+)
+def test_peticion_mal_formada_responde_400(servicio, peticion):
+    with socket.create_connection((servicio.host, servicio.port), timeout=5) as s:
+        s.sendall(peticion)
+        respuesta = s.makefile("rb").read()
+
+    assert respuesta.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in respuesta
+
+
+def test_error_de_la_db_responde_500(servicio, monkeypatch):
+    def falla(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(ruc_utils, "consultar_rucs", falla)
+    assert pedir(servicio, "GET", "/ruc/20100070970")[0] == 500
+
+    # la conexión HTTP sigue sirviendo
+    monkeypatch.undo()
+    assert pedir(servicio, "GET", "/ruc/20100070970")[0] == 200
+
+
+def test_pool_cerrado_falla_enseguida(padron_db):
+    pool = PoolConexiones(padron_db, tamano=1)
+    errores = []
+
+    def esperar():
+        try:
+            with pool.conexion():
+                pass
+        except PoolCerrado as e:
+            errores.append(e)
+
+    with pool.conexion():
+        cerrar = threading.Thread(target=pool.cerrar)
+        cerrar.start()
+        time.sleep(0.05)
+    cerrar.join(timeout=2)
+    # llega después del cierre: antes quedaba bloqueada para siempre
+    tardia = threading.Thread(target=esperar)
+    tardia.start()
+    tardia.join(timeout=2)
+
+    assert not tardia.is_alive() and len(errores) == 1
+    with pytest.raises(PoolCerrado):
+        with pool.conexion(bloquear=False):
+            pass
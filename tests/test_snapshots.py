@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import time
+
+import pytest
+from conftest import escribir_padron_zip
+
+from massruc import ruc_index, server, snapshots, txt_to_db
+from massruc.server import ServidorRuc
+
+NUEVAS_FILAS = [
+    "10123456781|PÉREZ GÓMEZ JUAN|ACTIVO|HABIDO|150101|AV.|",
+    "20100070970|SUPERMERCADOS PERUANOS S.A.|BAJA DE OFICIO|HABIDO|150131||",
+    "20131312955|SUPERINTENDENCIA NACIONAL DE ADUANAS|ACTIVO|HABIDO|150101|-|",
+    "10000000162|ÑAÑEZ CÁCERES ROSA|BAJA DE OFICIO|NO HALLADO|040101|-|",
+    "20600000013|NUEVA EMPRESA S.A.C.|ACTIVO||150101|-|",
+]
+
+
+def contar(path_db):
+    con = sqlite3.connect(path_db)
+    try:
+        return con.execute("SELECT COUNT(*) FROM padron").fetchone()[0]
+    finally:
+        con.close()
+
+
+@pytest.fixture
+def publicado(padron_zip, tmp_path):
+    carpeta = tmp_path / "snapshots"
+    ruta = snapshots.construir_snapshot(
+        padron_zip, carpeta, "padron", compacto=True, bitmap=True
+    )
+    snapshots.activar_snapshot(carpeta, ruta)
+    return carpeta, ruta
+
+
+def test_snapshot_con_metadatos(publicado, padron_zip):
+    carpeta, ruta = publicado
+    info = snapshots.leer_info(ruta)
+
+    assert snapshots.ruta_activa(carpeta) == ruta
+    assert info["filas"] == "4"
+    assert info["tabla"] == "padron"
+    assert len(info["sha256_zip"]) == 64 and info["fecha_origen"]
+    assert list(carpeta.glob("*.tmp")) == []
+
+
+def test_snapshot_sin_todas_las_filas_de_la_ingesta(padron_zip, tmp_path, monkeypatch):
+    convertir = txt_to_db.convert_zip_to_sql
+
+    def pierde_una_fila(input_zip, output_db, table_name, **kwargs):
+        filas = convertir(input_zip, output_db, table_name, **kwargs)
+        con = sqlite3.connect(output_db)
+        with con:
+            con.execute(f"DELETE FROM {table_name} WHERE ruc = 20100070970")
+        con.close()
+        return filas
+
+    monkeypatch.setattr(txt_to_db, "convert_zip_to_sql", pierde_una_fila)
+    carpeta = tmp_path / "snapshots"
+
+    with pytest.raises(ValueError, match="incompleto"):
+        snapshots.construir_snapshot(padron_zip, carpeta, "padron")
+    assert snapshots.listar_snapshots(carpeta) == []
+
+
+def test_ruc_repetido_en_padron_compacto(tmp_path):
+    filas = [
+        "10123456781|PÉREZ GÓMEZ JUAN|ACTIVO|HABIDO|150101|AV.|",
+        "20100070970|SUPERMERCADOS PERUANOS|ACTIVO|HABIDO|150101|AV.|",
+        "10123456781|PÉREZ GÓMEZ JUAN|BAJA DE OFICIO|HABIDO|150101|AV.|",
+    ]
+    carpeta = tmp_path / "snapshots"
+
+    ruta = snapshots.construir_snapshot(
+        escribir_padron_zip(tmp_path / "repetido.zip", filas),
+        carpeta,
+        "padron",
+        compacto=True,
+    )
+
+    assert snapshots.leer_info(ruta)["filas"] == "2" and contar(ruta) == 2
+
+
+def test_nuevo_snapshot_no_toca_el_activo(publicado, tmp_path):
+    carpeta, primero = publicado
+    lector = sqlite3.connect(primero)
+
+    segundo = snapshots.construir_snapshot(
+        escribir_padron_zip(tmp_path / "nuevo.zip", NUEVAS_FILAS), carpeta, "padron"
+    )
+    # hasta activarlo, el activo sigue siendo el anterior
+    assert snapshots.ruta_activa(carpeta) == primero
+    snapshots.activar_snapshot(carpeta, segundo)
+
+    assert snapshots.ruta_activa(carpeta) == segundo
+    assert contar(segundo) == 5
+    # quien ya tenía abierto el anterior sigue leyendo su versión
+    assert lector.execute("SELECT COUNT(*) FROM padron").fetchone()[0] == 4
+    lector.close()
+
+    assert snapshots.rollback(carpeta) == primero
+    assert snapshots.ruta_activa(carpeta) == primero
+    with pytest.raises(LookupError):
+        snapshots.rollback(carpeta)
+
+
+def test_snapshot_truncado_no_se_publica(publicado, tmp_path):
+    carpeta, primero = publicado
+    truncado = escribir_padron_zip(tmp_path / "truncado.zip", NUEVAS_FILAS[:1])
+
+    with pytest.raises(ValueError):
+        snapshots.construir_snapshot(truncado, carpeta, "padron")
+
+    assert snapshots.listar_snapshots(carpeta) == [primero]
+    assert list(carpeta.glob("*.tmp")) == []
+
+
+def test_fallo_al_indexar_no_deja_el_snapshot(publicado, tmp_path, monkeypatch):
+    carpeta, primero = publicado
+    nuevo_zip = escribir_padron_zip(tmp_path / "nuevo.zip", NUEVAS_FILAS)
+
+    def falla(path_db, table_name):
+        open(path_db + ".keys.npy", "wb").close()
+        raise OSError("No queda espacio en el disco")
+
+    monkeypatch.setattr(ruc_index, "construir_indice", falla)
+    antes = sorted(os.listdir(carpeta))
+    with pytest.raises(OSError, match="espacio"):
+        snapshots.construir_snapshot(
+            nuevo_zip, carpeta, "padron", bitmap=True, indice_mmap=True
+        )
+
+    assert snapshots.listar_snapshots(carpeta) == [primero]
+    # ni la DB ni el bitmap ni el índice a medias del snapshot fallido
+    assert sorted(os.listdir(carpeta)) == antes
+
+
+def test_podar_snapshots(publicado, tmp_path):
+    carpeta, primero = publicado
+    nuevo_zip = escribir_padron_zip(tmp_path / "nuevo.zip", NUEVAS_FILAS)
+    for _ in range(3):
+        ruta = snapshots.construir_snapshot(nuevo_zip, carpeta, "padron", bitmap=True)
+        snapshots.activar_snapshot(carpeta, ruta)
+
+    eliminados = snapshots.podar_snapshots(carpeta, retener=1)
+
+    restantes = snapshots.listar_snapshots(carpeta)
+    assert primero in eliminados
+    assert len(restantes) == 2 and restantes[-1] == ruta
+    assert not list(carpeta.glob(os.path.basename(primero) + "*"))
+
+
+def test_servidor_sigue_al_snapshot_activo(publicado, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "INTERVALO_SNAPSHOT", 0)
+    monkeypatch.setattr(server, "PLAZO_CIERRE", 0)
+    carpeta, primero = publicado
+    servidor = ServidorRuc(primero, "padron", conexiones=2, carpeta_snapshots=carpeta)
+    try:
+        assert servidor.validar(["20600000013"])[0]["error"] == "NOT_FOUND"
+
+        segundo = snapshots.construir_snapshot(
+            escribir_padron_zip(tmp_path / "nuevo.zip", NUEVAS_FILAS),
+            carpeta,
+            "padron",
+            bitmap=True,
+        )
+        snapshots.activar_snapshot(carpeta, segundo)
+        limite = time.monotonic() + 5
+        while servidor.path_db != segundo and time.monotonic() < limite:
+            servidor.validar(["10123456781"])
+            time.sleep(0.01)
+
+        assert servidor.validar(["20600000013"])[0]["razon_social"] == (
+            "NUEVA EMPRESA S.A.C."
+        )
+    finally:
+        servidor.cerrar()
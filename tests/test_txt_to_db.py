@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+from conftest import escribir_padron_zip
+
+from massruc.txt_to_db import (
+    actualizar_incremental,
+    convert_zip_to_sql,
+    sanitize_csv,
+    sanitize_csv_paralelo,
+)
+
+
+def test_convert_zip_to_sql(padron_zip, tmp_path):
+    output_db = tmp_path / "padron.db"
+    progreso = []
+
+    filas = convert_zip_to_sql(
+        padron_zip, output_db, "padron", progress_callback=progreso.append
+    )
+
+    con = sqlite3.connect(output_db)
+    columnas = [c[1] for c in con.execute("PRAGMA table_info(padron)")]
+    fila = con.execute("SELECT * FROM padron WHERE ruc = 10000000162").fetchone()
+    con.close()
+
+    assert filas == 4
+    assert columnas == [
+        "ruc",
+        "nombre_o_razón_social",
+        "estado_del_contribuyente",
+        "condición_de_domicilio",
+    ]
+    assert fila == (10000000162, "ÑAÑEZ CÁCERES ROSA", "BAJA DE OFICIO", "NO HALLADO")
+    assert progreso[-1] == 1.0
+
+
+def test_sanitize_csv(tmp_path):
+    entrada = tmp_path / "padron.txt"
+    entrada.write_bytes("A|B|C|D|E\r\nrota\r\nÑ|2|3|4|\r\n".encode("latin-1"))
+    salida = tmp_path / "limpio.txt"
+
+    sanitize_csv(entrada, salida)
+
+    assert salida.read_text(encoding="utf-8") == "A|B|C|D\nÑ|2|3|4"
+
+
+def test_sanitize_csv_paralelo_igual_al_secuencial(tmp_path, capsys):
+    lineas = ["RUC|NOMBRE|ESTADO|CONDICION|UBIGEO"]
+    for i in range(300):
+        lineas.append("rota" if i % 37 == 0 else f"{i}|ÑANDÚ {i}|ACTIVO|HABIDO|-")
+    contenido = "\r\n".join(lineas[:150]) + "\r" + "\n".join(lineas[150:]) + "\n"
+    entrada = tmp_path / "padron.txt"
+    entrada.write_bytes(contenido.encode("latin-1"))
+
+    sanitize_csv(entrada, tmp_path / "secuencial.txt")
+    errores_secuencial = capsys.readouterr().out
+    # rangos chicos para forzar muchos cortes
+    sanitize_csv_paralelo(
+        entrada, tmp_path / "paralelo.txt", workers=2, tamano_rango=500
+    )
+    errores_paralelo = capsys.readouterr().out
+
+    assert (tmp_path / "paralelo.txt").read_bytes() == (
+        tmp_path / "secuencial.txt"
+    ).read_bytes()
+    assert errores_paralelo == errores_secuencial
+    assert errores_secuencial.count("Error en linea") == 9
+    assert list(tmp_path.glob("*.part")) == []
+
+
+def test_convert_zip_to_sql_compacto(padron_zip, padron_db, tmp_path):
+    compacta = tmp_path / "compacta.db"
+
+    filas = convert_zip_to_sql(padron_zip, compacta, "padron", compacto=True)
+
+    con = sqlite3.connect(compacta)
+    tablas = dict(con.execute("SELECT name, sql FROM sqlite_master"))
+    estados = con.execute("SELECT COUNT(*) FROM padron_valores").fetchone()[0]
+    consulta = "SELECT * FROM padron ORDER BY ruc"
+    assert con.execute(consulta).fetchall() == (
+        sqlite3.connect(padron_db).execute(consulta).fetchall()
+    )
+    con.close()
+
+    assert filas == 4
+    assert tablas["padron_datos"].endswith("WITHOUT ROWID")
+    assert tablas["padron"].startswith("CREATE VIEW")
+    # ACTIVO, BAJA DE OFICIO, HABIDO y NO HALLADO
+    assert estados == 4
+
+
+@pytest.mark.parametrize("compacto", [False, True])
+def test_actualizar_incremental(padron_zip, tmp_path, compacto):
+    padron_db = tmp_path / "padron.db"
+    convert_zip_to_sql(padron_zip, padron_db, "padron", compacto=compacto)
+    nuevas_filas = [
+        "10123456781|PÉREZ GÓMEZ JUAN|ACTIVO|HABIDO|150101|AV.|",  # sin cambios
+        "20100070970|SUPERMERCADOS PERUANOS S.A.|BAJA DE OFICIO|HABIDO|150131||",
+        "10000000162|ÑAÑEZ CÁCERES ROSA|BAJA DE OFICIO|NO HALLADO|040101|-|",
+        "10123456781|PÉREZ GÓMEZ JUAN|ACTIVO|HABIDO|150101|AV.|",  # repetido
+        "20600000011|NUEVA EMPRESA S.A.C.|ACTIVO||150101|-|",
+    ]
+    nuevo_zip = escribir_padron_zip(tmp_path / "nuevo.zip", nuevas_filas)
+    reconstruida = tmp_path / "reconstruida.db"
+    convert_zip_to_sql(
+        escribir_padron_zip(
+            tmp_path / "sin_repetidos.zip", nuevas_filas[:3] + nuevas_filas[4:]
+        ),
+        reconstruida,
+        "padron",
+    )
+
+    conteos = actualizar_incremental(nuevo_zip, padron_db, "padron")
+
+    assert conteos == {
+        "insertados": 1,
+        "actualizados": 1,
+        "eliminados": 1,
+        "sin_cambios": 2,
+    }
+    consulta = "SELECT * FROM padron ORDER BY ruc"
+    esperado = sqlite3.connect(reconstruida).execute(consulta).fetchall()
+    assert sqlite3.connect(padron_db).execute(consulta).fetchall() == esperado
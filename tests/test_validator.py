@@ -0,0 +1,41 @@
+import os
+import shutil
+
+from massruc import Validator
+from massruc.ruc_utils import buscar_rucs
+
+DOCUMENTOS = ["10123456781", "00000016", "20999999990", "ABC", "10123456781"]
+
+
+def test_validator_igual_a_buscar_rucs(padron_db):
+    with Validator(padron_db, "padron") as validator:
+        assert validator.validar(DOCUMENTOS) == buscar_rucs(
+            DOCUMENTOS, padron_db, "padron"
+        )
+
+
+def test_validator_cache_lru(padron_db):
+    with Validator(padron_db, "padron", cache_size=2) as validator:
+        validator.validar(DOCUMENTOS)
+        assert validator.estadisticas()["misses"] == 3
+        assert validator.estadisticas()["en_cache"] == 2
+
+        validator.validar(["20999999990"])  # no encontrado, pero en caché
+        assert validator.hits == 1
+
+
+def test_validator_invalida_cache_si_cambia_db(padron_db, tmp_path):
+    with Validator(padron_db, "padron") as validator:
+        validator.validar(["10123456781"])
+
+        otra = tmp_path / "otra.db"
+        shutil.copy(padron_db, otra)
+        os.replace(otra, padron_db)
+
+        validator.validar(["10123456781"])
+        assert validator.estadisticas() == {
+            "hits": 0,
+            "misses": 2,
+            "hit_ratio": 0.0,
+            "en_cache": 1,
+        }